@@ -1,4 +1,5 @@
 import os
+import time
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
@@ -18,12 +19,19 @@ db = SQLAlchemy(model_class=Base)
 socketio = SocketIO()
 
 def create_app():
+    """Create and configure the app without opening connections (see app.services.warmup)"""
+    start = time.perf_counter()
+    
     # Create Flask app
     app = Flask(__name__)
     
     # Configure app
     app.config.from_object('app.config.Config')
     
+    # Encode JSON with the configured provider (orjson when available)
+    from app.utils.json_provider import json_provider_class
+    app.json = json_provider_class(app.config['JSON_PROVIDER'])(app)
+    
     # Set secret key from environment variable
     app.secret_key = os.environ.get("SESSION_SECRET", "helix-dev-secret-key")
     
@@ -32,18 +40,28 @@ def create_app():
     
     # Initialize extensions with app
     db.init_app(app)
-    socketio.init_app(app, cors_allowed_origins="*")
+    from app.services.message_queue import socketio_queue_options
+    socketio.init_app(
+        app,
+        cors_allowed_origins="*",
+        async_mode=app.config['SOCKETIO_ASYNC_MODE'],
+        **socketio_queue_options(app.config['SOCKETIO_MESSAGE_QUEUE'])
+    )
     
     with app.app_context():
-        # Import models
-        from app.models import user, message, sequence
+        # Import models (the schema itself is managed by migrate.py at deploy time)
+        from app.models import user, message, sequence, generation_cache, conversation_summary
         
-        # Create all tables
-        db.create_all()
+        from app.services.admission import admission
+        from app.services.ai import ai_service
+        admission.init_app(app)
+        ai_service.init_app(app)
         
         # Register blueprints
-        from app.routes import chat, sequences
+        from app.routes import chat, sequences, metrics
         app.register_blueprint(chat.bp)
         app.register_blueprint(sequences.bp)
-        
-        return app
+        app.register_blueprint(metrics.bp)
+    
+    app.extensions['startup'] = {'create_app_ms': round((time.perf_counter() - start) * 1000, 1)}
+    return app
@@ -22,5 +22,78 @@ class Config:
     DEBUG = True
     TESTING = False
     
+    # Worker warm-up before the first request (see app.services.warmup)
+    STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "true").lower() == "true"
+    STARTUP_DB_CONNECTIONS = int(os.environ.get("STARTUP_DB_CONNECTIONS", 4))
+    STARTUP_AI_TIMEOUT = float(os.environ.get("STARTUP_AI_TIMEOUT", 5))  # seconds
+    
+    # JSON encoding: 'auto' (orjson if installed), 'orjson', 'default', or a provider class import path
+    JSON_PROVIDER = os.environ.get("JSON_PROVIDER", "auto")
+    
     # Socket.IO settings
-    SOCKETIO_ASYNC_MODE = 'threading'
+    # 'threading' for the dev server, 'gevent' under gunicorn (set by wsgi.py)
+    SOCKETIO_ASYNC_MODE = os.environ.get("SOCKETIO_ASYNC_MODE", "threading")
+    # Shared channel for emits when running several workers (see app.services.message_queue)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get("SOCKETIO_MESSAGE_QUEUE", "")
+    
+    # AI provider settings (see app.services.llm_client)
+    # Base URL for the Messages API, e.g. a local fake server; empty uses ANTHROPIC_BASE_URL or Anthropic's API
+    AI_BASE_URL = os.environ.get("AI_BASE_URL", "")
+    # Deadlines in seconds for a whole call, retries included
+    AI_TIMEOUT = float(os.environ.get("AI_TIMEOUT", 60))
+    AI_SEQUENCE_TIMEOUT = float(os.environ.get("AI_SEQUENCE_TIMEOUT", 120))
+    AI_CONNECT_TIMEOUT = float(os.environ.get("AI_CONNECT_TIMEOUT", 5))
+    AI_MAX_ATTEMPTS = int(os.environ.get("AI_MAX_ATTEMPTS", 3))
+    AI_RETRY_BASE_DELAY = float(os.environ.get("AI_RETRY_BASE_DELAY", 0.5))  # seconds
+    AI_RETRY_MAX_DELAY = float(os.environ.get("AI_RETRY_MAX_DELAY", 8))  # seconds
+    # Consecutive failures that open the circuit breaker, and seconds it stays open
+    AI_BREAKER_THRESHOLD = int(os.environ.get("AI_BREAKER_THRESHOLD", 5))
+    AI_BREAKER_RESET = float(os.environ.get("AI_BREAKER_RESET", 30))
+    
+    # Model routing (see app.services.model_router); rules are "kind=route,..." over the defaults
+    AI_FAST_MODEL = os.environ.get("AI_FAST_MODEL", "claude-haiku-4-5")
+    AI_FULL_MODEL = os.environ.get("AI_FULL_MODEL", "claude-3-5-sonnet-20241022")
+    AI_ROUTING_RULES = os.environ.get("AI_ROUTING_RULES", "")
+    
+    # AI admission control (see app.services.admission); a rate of 0 turns that limit off
+    AI_MAX_CONCURRENT = int(os.environ.get("AI_MAX_CONCURRENT", 8))
+    AI_RATE_PER_MINUTE = float(os.environ.get("AI_RATE_PER_MINUTE", 0))
+    AI_RATE_BURST = int(os.environ.get("AI_RATE_BURST", 0))
+    AI_USER_RATE_PER_MINUTE = float(os.environ.get("AI_USER_RATE_PER_MINUTE", 0))
+    AI_USER_RATE_BURST = int(os.environ.get("AI_USER_RATE_BURST", 0))
+    AI_QUEUE_MAX_DEPTH = int(os.environ.get("AI_QUEUE_MAX_DEPTH", 200))
+    # Longest queue wait in seconds before a call is shed with 429, by priority
+    AI_QUEUE_MAX_WAIT_INTERACTIVE = float(os.environ.get("AI_QUEUE_MAX_WAIT_INTERACTIVE", 10))
+    AI_QUEUE_MAX_WAIT_STANDARD = float(os.environ.get("AI_QUEUE_MAX_WAIT_STANDARD", 30))
+    AI_QUEUE_MAX_WAIT_BULK = float(os.environ.get("AI_QUEUE_MAX_WAIT_BULK", 60))
+    
+    # Chat settings
+    # Stream assistant replies to the client as 'message_delta' events
+    CHAT_STREAMING = os.environ.get("CHAT_STREAMING", "true").lower() == "true"
+    # Return 202 from POST /api/chat and generate the reply in the job pool
+    CHAT_BACKGROUND = os.environ.get("CHAT_BACKGROUND", "false").lower() == "true"
+    # Estimated tokens of history (summary included) sent with each message
+    CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get("CHAT_CONTEXT_TOKEN_BUDGET", 6000))
+    CHAT_CONTEXT_MAX_MESSAGES = int(os.environ.get("CHAT_CONTEXT_MAX_MESSAGES", 50))
+    # Length limit for the summary that older turns are folded into
+    CHAT_SUMMARY_MAX_TOKENS = int(os.environ.get("CHAT_SUMMARY_MAX_TOKENS", 500))
+    
+    # Background job pool settings
+    JOB_WORKER_POOL_SIZE = int(os.environ.get("JOB_WORKER_POOL_SIZE", 8))
+    JOB_QUEUE_DEPTH = int(os.environ.get("JOB_QUEUE_DEPTH", 64))
+    JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", 600))  # seconds
+    
+    # Generated sequence cache settings
+    SEQUENCE_CACHE_TTL = int(os.environ.get("SEQUENCE_CACHE_TTL", 7 * 24 * 3600))  # seconds
+    SEQUENCE_CACHE_MEMORY_SIZE = int(os.environ.get("SEQUENCE_CACHE_MEMORY_SIZE", 256))
+    SEQUENCE_CACHE_MAX_ENTRIES = int(os.environ.get("SEQUENCE_CACHE_MAX_ENTRIES", 10000))
+    
+    # Pagination settings
+    SEQUENCES_PAGE_SIZE = int(os.environ.get("SEQUENCES_PAGE_SIZE", 50))
+    SEQUENCES_MAX_PAGE_SIZE = int(os.environ.get("SEQUENCES_MAX_PAGE_SIZE", 200))
+    MESSAGES_PAGE_SIZE = int(os.environ.get("MESSAGES_PAGE_SIZE", 50))
+    MESSAGES_MAX_PAGE_SIZE = int(os.environ.get("MESSAGES_MAX_PAGE_SIZE", 200))
+    
+    # Batch sequence generation settings
+    SEQUENCE_BATCH_CONCURRENCY = int(os.environ.get("SEQUENCE_BATCH_CONCURRENCY", 4))
+    SEQUENCE_BATCH_MAX_ITEMS = int(os.environ.get("SEQUENCE_BATCH_MAX_ITEMS", 100))
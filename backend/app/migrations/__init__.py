@@ -0,0 +1,124 @@
+"""
+Schema migrations, applied at deploy time with `python migrate.py`
+
+Each migration is a module in this package named `mNNNN_description.py` that
+defines `upgrade(conn)`. Migrations run in revision order and each one is
+recorded in the `schema_migrations` table once applied. A migration that sets
+`transactional = False` runs on an autocommit connection, which PostgreSQL
+needs for `CREATE INDEX CONCURRENTLY`. The initial migration creates a frozen
+baseline schema, and every later change to the models needs its own migration.
+Migrations should be idempotent, since databases created by earlier versions of
+the initial migration may already have some of their changes.
+"""
+import importlib
+import logging
+import pkgutil
+import re
+from datetime import datetime
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE = 'schema_migrations'
+
+_MODULE_PATTERN = re.compile(r'^m(\d{4})_\w+$')
+
+
+def discover():
+    """Get all migration modules in this package as (revision, module), in order"""
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        match = _MODULE_PATTERN.match(info.name)
+        if match:
+            module = importlib.import_module(f'{__name__}.{info.name}')
+            migrations.append((int(match.group(1)), module))
+    return sorted(migrations, key=lambda m: m[0])
+
+
+def applied_revisions(engine):
+    """Get the set of revisions already applied to the database"""
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+            "revision INTEGER PRIMARY KEY, "
+            "name VARCHAR(200) NOT NULL, "
+            "applied_at TIMESTAMP NOT NULL)"
+        ))
+        rows = conn.execute(text(f"SELECT revision FROM {MIGRATIONS_TABLE}"))
+        return {row[0] for row in rows}
+
+
+def pending(engine):
+    """Get the migrations that have not been applied yet"""
+    applied = applied_revisions(engine)
+    return [(revision, module) for revision, module in discover() if revision not in applied]
+
+
+def unapplied_revisions(conn):
+    """Get the revisions not applied yet, without creating the migrations table (for startup checks)"""
+    revisions = [revision for revision, _ in discover()]
+    if not inspect(conn).has_table(MIGRATIONS_TABLE):
+        return revisions
+    applied = {row[0] for row in conn.execute(text(f"SELECT revision FROM {MIGRATIONS_TABLE}"))}
+    return [revision for revision in revisions if revision not in applied]
+
+
+def migrate(engine):
+    """
+    Apply all pending migrations in order
+
+    Returns:
+        list: Names of the migrations that were applied
+    """
+    applied = []
+    for revision, module in pending(engine):
+        name = module.__name__.rsplit('.', 1)[-1]
+        logger.info(f"Applying migration {name}")
+
+        if getattr(module, 'transactional', True):
+            with engine.begin() as conn:
+                module.upgrade(conn)
+                _record(conn, revision, name)
+        else:
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                module.upgrade(conn)
+                _record(conn, revision, name)
+
+        applied.append(name)
+    return applied
+
+
+def _record(conn, revision, name):
+    conn.execute(
+        text(f"INSERT INTO {MIGRATIONS_TABLE} (revision, name, applied_at) VALUES (:revision, :name, :applied_at)"),
+        {'revision': revision, 'name': name, 'applied_at': datetime.utcnow()}
+    )
+
+
+def create_index(conn, name, table, columns, unique=False):
+    """
+    Create an index if it does not exist, without blocking writes on PostgreSQL
+
+    On PostgreSQL this must run on an autocommit connection (`transactional = False`).
+    An invalid index left behind by an interrupted concurrent build is rebuilt.
+    """
+    column_list = ', '.join(columns)
+    unique_sql = 'UNIQUE ' if unique else ''
+
+    if conn.dialect.name == 'postgresql':
+        invalid = conn.execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {'name': name}).first()
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        conn.execute(text(
+            f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column_list})"
+        ))
+    else:
+        conn.execute(text(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({column_list})"))
+
+
+def column_exists(conn, table, column):
+    """Check whether a table already has a column"""
+    return any(c['name'] == column for c in inspect(conn).get_columns(table))
@@ -0,0 +1,56 @@
+"""Create the application tables (a no-op for databases created by the old db.create_all())"""
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text
+
+# The schema as the old db.create_all() built it, frozen here so that later
+# changes to the models are made by their own migrations
+metadata = MetaData()
+
+Table(
+    'users', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('email', String(100), unique=True, nullable=False),
+    Column('created_at', DateTime)
+)
+
+Table(
+    'messages', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('content', Text, nullable=False),
+    Column('role', String(20), nullable=False),
+    Column('timestamp', DateTime)
+)
+
+Table(
+    'sequences', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('title', String(200), nullable=False),
+    Column('created_at', DateTime)
+)
+
+Table(
+    'sequence_steps', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('sequence_id', Integer, ForeignKey('sequences.id'), nullable=False),
+    Column('step_number', Integer, nullable=False),
+    Column('content', Text, nullable=False),
+    Column('type', String(50), nullable=False)
+)
+
+Table(
+    'generation_cache', metadata,
+    Column('key', String(64), primary_key=True),
+    Column('job_title', String(200), nullable=False),
+    Column('company_name', String(200), nullable=False),
+    Column('model', String(100), nullable=False),
+    Column('prompt_version', Integer, nullable=False),
+    Column('payload', Text, nullable=False),
+    Column('created_at', DateTime),
+    Index('ix_generation_cache_created_at', 'created_at')
+)
+
+
+def upgrade(conn):
+    metadata.create_all(bind=conn, checkfirst=True)
@@ -0,0 +1,11 @@
+"""Composite indexes for the hot query shapes of the chat and sequence routes"""
+from app.migrations import create_index
+
+# Concurrent index builds cannot run inside a transaction
+transactional = False
+
+
+def upgrade(conn):
+    create_index(conn, 'ix_messages_user_timestamp_id', 'messages', ['user_id', 'timestamp', 'id'])
+    create_index(conn, 'ix_sequences_user_created_id', 'sequences', ['user_id', 'created_at', 'id'])
+    create_index(conn, 'ix_sequence_steps_sequence_step', 'sequence_steps', ['sequence_id', 'step_number'])
@@ -0,0 +1,15 @@
+"""Renumber every sequence's steps densely (1..n) so step numbers can be made unique"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    # Earlier code could leave duplicate or sparse step numbers. Rank steps by
+    # (step_number, id) within each sequence, going through negative numbers so
+    # no two rows share a number mid-update.
+    conn.execute(text(
+        "UPDATE sequence_steps SET step_number = -ranked.position "
+        "FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY sequence_id ORDER BY step_number, id) AS position "
+        "FROM sequence_steps) AS ranked "
+        "WHERE sequence_steps.id = ranked.id"
+    ))
+    conn.execute(text("UPDATE sequence_steps SET step_number = -step_number WHERE step_number < 0"))
@@ -0,0 +1,15 @@
+"""Replace the (sequence_id, step_number) index with a unique one"""
+from sqlalchemy import text
+from app.migrations import create_index
+
+# Concurrent index builds cannot run inside a transaction
+transactional = False
+
+
+def upgrade(conn):
+    create_index(conn, 'uq_sequence_steps_sequence_step', 'sequence_steps', ['sequence_id', 'step_number'], unique=True)
+
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_sequence_steps_sequence_step"))
+    else:
+        conn.execute(text("DROP INDEX IF EXISTS ix_sequence_steps_sequence_step"))
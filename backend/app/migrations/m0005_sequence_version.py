@@ -0,0 +1,8 @@
+"""Add a version counter to sequences for realtime patch ordering"""
+from sqlalchemy import text
+from app.migrations import column_exists
+
+
+def upgrade(conn):
+    if not column_exists(conn, 'sequences', 'version'):
+        conn.execute(text("ALTER TABLE sequences ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
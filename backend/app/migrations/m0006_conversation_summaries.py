@@ -0,0 +1,12 @@
+"""Store per-message token counts and add the conversation summary table"""
+from sqlalchemy import text
+from app.migrations import column_exists
+
+
+def upgrade(conn):
+    from app.models.conversation_summary import ConversationSummary
+
+    if not column_exists(conn, 'messages', 'token_count'):
+        # Left NULL on existing rows; the context builder fills them in as it reads them
+        conn.execute(text("ALTER TABLE messages ADD COLUMN token_count INTEGER"))
+    ConversationSummary.__table__.create(bind=conn, checkfirst=True)
@@ -0,0 +1,17 @@
+from app import db
+from datetime import datetime
+
+class ConversationSummary(db.Model):
+    """Running summary of a user's older chat turns, maintained by app.services.context"""
+    __tablename__ = 'conversation_summaries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), unique=True, nullable=False)
+    content = db.Column(db.Text, nullable=False, default='')
+    # Every message with an id up to this one is folded into the summary
+    covered_through_id = db.Column(db.Integer, nullable=False, default=0)
+    token_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ConversationSummary {self.user_id}: through {self.covered_through_id}>'
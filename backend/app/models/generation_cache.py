@@ -0,0 +1,17 @@
+from app import db
+from datetime import datetime
+
+class GenerationCache(db.Model):
+    """Cached AI-generated outreach sequences, keyed by a hash of the normalized request"""
+    __tablename__ = 'generation_cache'
+    
+    key = db.Column(db.String(64), primary_key=True)
+    job_title = db.Column(db.String(200), nullable=False)
+    company_name = db.Column(db.String(200), nullable=False)
+    model = db.Column(db.String(100), nullable=False)
+    prompt_version = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON list of generated steps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<GenerationCache {self.key[:12]}: {self.job_title} at {self.company_name}>'
@@ -1,6 +1,10 @@
 from app import db
+from app.utils.helpers import estimate_tokens
 from datetime import datetime
 
+def _estimate_content_tokens(context):
+    return estimate_tokens(context.get_current_parameters()['content'])
+
 class Message(db.Model):
     """Message model for chat history"""
     __tablename__ = 'messages'
@@ -10,6 +14,13 @@ class Message(db.Model):
     content = db.Column(db.Text, nullable=False)
     role = db.Column(db.String(20), nullable=False)  # 'user', 'assistant', 'system'
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Estimated once on insert so context building never re-counts the history
+    token_count = db.Column(db.Integer, default=_estimate_content_tokens)
+    
+    __table_args__ = (
+        # Serves the keyset page reads and the latest-N history read as ordered range scans
+        db.Index('ix_messages_user_timestamp_id', 'user_id', 'timestamp', 'id'),
+    )
     
     def __repr__(self):
         return f'<Message {self.id}: {self.role}>'
@@ -9,9 +9,20 @@ class Sequence(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # bumped on every change
+    
+    __table_args__ = (
+        db.Index('ix_sequences_user_created_id', 'user_id', 'created_at', 'id'),
+    )
     
     # Relationships
-    steps = db.relationship('SequenceStep', backref='sequence', lazy=True, cascade='all, delete-orphan')
+    steps = db.relationship(
+        'SequenceStep',
+        backref='sequence',
+        lazy=True,
+        cascade='all, delete-orphan',
+        order_by='SequenceStep.step_number'
+    )
     
     def __repr__(self):
         return f'<Sequence {self.id}: {self.title}>'
@@ -21,7 +32,8 @@ class Sequence(db.Model):
             'id': self.id,
             'user_id': self.user_id,
             'title': self.title,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'version': self.version
         }
         
         if include_steps:
@@ -40,6 +52,10 @@ class SequenceStep(db.Model):
     content = db.Column(db.Text, nullable=False)
     type = db.Column(db.String(50), nullable=False, default='email')  # 'email', 'message', 'call', 'other'
     
+    __table_args__ = (
+        db.Index('uq_sequence_steps_sequence_step', 'sequence_id', 'step_number', unique=True),
+    )
+    
     def __repr__(self):
         return f'<SequenceStep {self.id}: Step {self.step_number}>'
     
@@ -1,13 +1,19 @@
 from flask import Blueprint, request, jsonify, current_app
 from app import db, socketio
 from app.models.message import Message
+from app.models.conversation_summary import ConversationSummary
 from app.models.user import User
-from app.models.sequence import Sequence, SequenceStep
 from app.services.ai import ai_service
+from app.services.llm_client import AIServiceError
+from app.services.socket import user_room
+from app.services.jobs import job_runner, JobQueueFull
+from app.services.actions import process_ai_action_blocks
+from app.services.context import build_chat_context, schedule_fold
+from app.services.reads import select_messages, message_payload
+from app.utils.helpers import encode_cursor, decode_cursor, parse_page_size
 from datetime import datetime
-import json
 import logging
-import re
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -24,10 +30,54 @@ def get_default_user():
 
 @bp.route('', methods=['GET'])
 def get_messages():
-    """Get chat message history"""
+    """
+    Get a page of chat message history in chronological order
+    
+    Without a cursor the most recent messages are returned.
+    
+    Query params:
+        before: Cursor for the page of messages older than it (see X-Prev-Cursor)
+        after: Cursor for the page of messages newer than it (see X-Next-Cursor)
+        limit: Page size (capped by MESSAGES_MAX_PAGE_SIZE)
+    """
     user = get_default_user()
-    messages = Message.query.filter_by(user_id=user.id).order_by(Message.timestamp).all()
-    return jsonify([message.to_dict() for message in messages])
+    limit = parse_page_size(
+        request.args.get('limit'),
+        current_app.config['MESSAGES_PAGE_SIZE'],
+        current_app.config['MESSAGES_MAX_PAGE_SIZE']
+    )
+    
+    key = db.tuple_(Message.timestamp, Message.id)
+    criteria = [Message.user_id == user.id]
+    before, after = request.args.get('before'), request.args.get('after')
+    
+    try:
+        if after:
+            criteria.append(key > decode_cursor(after))
+        elif before:
+            criteria.append(key < decode_cursor(before))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Fetch one extra row to know whether another page follows
+    if after:
+        rows = select_messages(*criteria, order_by=(Message.timestamp, Message.id), limit=limit + 1)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    else:
+        rows = select_messages(*criteria, order_by=(Message.timestamp.desc(), Message.id.desc()), limit=limit + 1)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+    
+    headers = {}
+    if rows:
+        if has_more and after:
+            headers['X-Next-Cursor'] = encode_cursor(rows[-1].timestamp, rows[-1].id)
+        elif has_more:
+            headers['X-Prev-Cursor'] = encode_cursor(rows[0].timestamp, rows[0].id)
+    
+    return jsonify([message_payload(row) for row in rows]), 200, headers
 
 @bp.route('', methods=['POST'])
 def send_message():
@@ -37,6 +87,13 @@ def send_message():
     if not data or 'content' not in data:
         return jsonify({'error': 'Message content is required'}), 400
     
+    # An optional model override: a route name ('fast', 'full') or a configured model id
+    model = data.get('model')
+    try:
+        ai_service.router.check_override(model)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     user = get_default_user()
     
     # Save user message
@@ -50,35 +107,112 @@ def send_message():
     db.session.commit()
     
     # Emit the user message via WebSocket
-    socketio.emit('message', user_message.to_dict())
+    socketio.emit('message', user_message.to_dict(), room=user_room(user.id))
     
-    try:
-        # Get recent chat history for context
-        recent_messages = Message.query.filter_by(user_id=user.id) \
-            .order_by(Message.timestamp.desc()) \
-            .limit(10) \
-            .all()
-        
-        # Reverse to get chronological order
-        recent_messages.reverse()
+    stream = data.get('stream', current_app.config['CHAT_STREAMING'])
+    background = data.get('background', current_app.config['CHAT_BACKGROUND'])
+    
+    if background:
+        # Hand the AI round trip to the job pool; the reply arrives over Socket.IO
+        try:
+            job_id = job_runner.submit(
+                'chat_reply',
+                generate_assistant_reply,
+                user.id,
+                user_message.id,
+                data['content'],
+                stream,
+                raise_errors=True,
+                model=model
+            )
+        except JobQueueFull:
+            return jsonify({'error': 'Server is busy, please retry shortly'}), 503
         
-        # Format messages for the AI service
-        chat_history = [
-            {"role": msg.role, "content": msg.content}
-            for msg in recent_messages
-            if msg.id != user_message.id  # Exclude the current message
-        ]
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'message': user_message.to_dict()
+        }), 202
+    
+    try:
+        generate_assistant_reply(user.id, user_message.id, data['content'], stream, raise_errors=True, model=model)
+    except AIServiceError as e:
+        # The user's message is saved; the client may resend it once the assistant is back
+        return jsonify({**e.to_dict(), 'user_message': user_message.to_dict()}), e.http_status, e.response_headers()
+    
+    return jsonify(user_message.to_dict()), 201
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status of a background chat job (for clients that reconnect)"""
+    job = job_runner.get(job_id)
+    
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job)
+
+def generate_assistant_reply(user_id, user_message_id, content, stream=False, raise_errors=False, model=None):
+    """
+    Get the assistant's reply to a saved user message, apply its actions and save it
+    
+    If no reply can be produced, nothing is saved. The user's room gets a
+    'message_error' event instead, carrying the error kind and a message to show.
+    
+    Args:
+        user_id (int): The current user ID
+        user_message_id (int): ID of the saved user message being answered
+        content (str): The user message text
+        stream (bool): Emit the reply incrementally as 'message_delta' events
+        raise_errors (bool): Raise the AIServiceError after emitting it, instead of returning its payload
+        model (str, optional): Route name or model id overriding the routing rules
+    
+    Returns:
+        dict: The saved assistant message, or the error payload if there is no reply
+    """
+    provisional_id = None
+    
+    try:
+        # Recent history within the token budget, plus the summary of everything before it
+        summary, chat_history, fold_through_id = build_chat_context(user_id, exclude_message_id=user_message_id)
         
         # Call the AI service to get a response
-        logger.info(f"Sending message to Anthropic API: {data['content']}")
-        ai_response = ai_service.get_chat_response(data['content'], chat_history)
+        logger.info(f"Sending message to Anthropic API: {content}")
+        
+        if stream:
+            # Stream fragments to the user's room under a provisional id until
+            # the finished message is saved and gets its real id
+            provisional_id = uuid.uuid4().hex
+            room = user_room(user_id)
+            socketio.emit('message_start', {'id': provisional_id, 'role': 'assistant'}, room=room)
+            try:
+                ai_response = ai_service.stream_chat_response(
+                    content,
+                    chat_history,
+                    on_text=lambda text: socketio.emit(
+                        'message_delta', {'id': provisional_id, 'delta': text}, room=room
+                    ),
+                    summary=summary,
+                    user_id=user_id,
+                    model=model
+                )
+            except AIServiceError as e:
+                if not e.partial:
+                    raise
+                # Keep whatever was already shown to the user
+                logger.warning(f"Chat reply cut short ({e.kind}): {str(e)}")
+                ai_response = e.partial
+        else:
+            ai_response = ai_service.get_chat_response(
+                content, chat_history, summary=summary, user_id=user_id, model=model
+            )
         
         # Check for action blocks in the response
-        processed_response, action_performed = process_ai_action_blocks(ai_response, user.id)
+        processed_response, action_performed = process_ai_action_blocks(ai_response, user_id)
         
         # Save the assistant's response
         assistant_message = Message(
-            user_id=user.id,
+            user_id=user_id,
             content=processed_response,
             role='assistant',
             timestamp=datetime.utcnow()
@@ -87,215 +221,35 @@ def send_message():
         db.session.commit()
         
         # Emit the assistant message via WebSocket
-        socketio.emit('message', assistant_message.to_dict())
+        message_data = assistant_message.to_dict()
+        if provisional_id:
+            message_data['provisional_id'] = provisional_id
+        socketio.emit('message', message_data, room=user_room(user_id))
+        
+        # Fold the turns that no longer fit into the summary, off the reply's path
+        schedule_fold(user_id, fold_through_id)
+        
+        return message_data
         
     except Exception as e:
         logger.error(f"Error processing message with AI service: {str(e)}")
+        db.session.rollback()
         
-        # Create an error response
-        error_message = Message(
-            user_id=user.id,
-            content="I apologize, but I encountered an error processing your request. Please try again.",
-            role='assistant',
-            timestamp=datetime.utcnow()
-        )
-        db.session.add(error_message)
-        db.session.commit()
+        error = e if isinstance(e, AIServiceError) else AIServiceError('error', str(e))
+        payload = {**error.to_dict(), 'reply_to': user_message_id}
+        if provisional_id:
+            payload['provisional_id'] = provisional_id
+        socketio.emit('message_error', payload, room=user_room(user_id))
         
-        # Emit the error message via WebSocket
-        socketio.emit('message', error_message.to_dict())
-    
-    return jsonify(user_message.to_dict()), 201
-
-def process_ai_action_blocks(response, user_id):
-    """
-    Process special action blocks in the AI response to perform workspace actions
-    
-    Args:
-        response (str): The AI response text
-        user_id (int): The current user ID
-    
-    Returns:
-        tuple: (processed_response, action_performed)
-    """
-    # Define regex patterns for action blocks
-    create_pattern = r'---ACTION: CREATE_SEQUENCE---(.*?)---END ACTION---'
-    add_pattern = r'---ACTION: ADD_STEP---(.*?)---END ACTION---'
-    update_pattern = r'---ACTION: UPDATE_STEP---(.*?)---END ACTION---'
-    delete_pattern = r'---ACTION: DELETE_STEP---(.*?)---END ACTION---'
-    
-    # Process CREATE_SEQUENCE actions
-    create_match = re.search(create_pattern, response, re.DOTALL)
-    if create_match:
-        try:
-            # Extract and parse JSON
-            json_str = create_match.group(1).strip()
-            data = json.loads(json_str)
-            
-            # Create sequence
-            sequence = Sequence(
-                user_id=user_id,
-                title=data.get('title', 'New Sequence'),
-                created_at=datetime.utcnow()
-            )
-            db.session.add(sequence)
-            db.session.commit()
-            
-            # Add steps
-            for step_data in data.get('steps', []):
-                step = SequenceStep(
-                    sequence_id=sequence.id,
-                    step_number=step_data.get('step_number', 1),
-                    content=step_data.get('content', ''),
-                    type=step_data.get('type', 'email')
-                )
-                db.session.add(step)
-            
-            db.session.commit()
-            
-            # Emit sequence update event
-            socketio.emit('sequence_update', sequence.to_dict())
-            
-            # Remove action block from response
-            processed_response = re.sub(create_pattern, '', response, flags=re.DOTALL).strip()
-            
-            return processed_response, True
-        except Exception as e:
-            logger.error(f"Error processing CREATE_SEQUENCE action: {str(e)}")
-    
-    # Process ADD_STEP actions
-    add_match = re.search(add_pattern, response, re.DOTALL)
-    if add_match:
-        try:
-            # Extract and parse JSON
-            json_str = add_match.group(1).strip()
-            data = json.loads(json_str)
-            
-            # Get the current sequence (most recent one)
-            sequence = Sequence.query.filter_by(user_id=user_id).order_by(Sequence.created_at.desc()).first()
-            
-            if not sequence:
-                # If no sequence exists, create a new one
-                sequence = Sequence(
-                    user_id=user_id,
-                    title='New Sequence',
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(sequence)
-                db.session.commit()
-            
-            # Add new step
-            step = SequenceStep(
-                sequence_id=sequence.id,
-                step_number=data.get('step_number', 1),
-                content=data.get('content', ''),
-                type=data.get('type', 'email')
-            )
-            db.session.add(step)
-            db.session.commit()
-            
-            # Reorder steps
-            steps = SequenceStep.query.filter_by(sequence_id=sequence.id).order_by(SequenceStep.step_number).all()
-            for i, s in enumerate(steps, 1):
-                s.step_number = i
-            
-            db.session.commit()
-            
-            # Emit sequence update event
-            socketio.emit('sequence_update', sequence.to_dict())
-            
-            # Remove action block from response
-            processed_response = re.sub(add_pattern, '', response, flags=re.DOTALL).strip()
-            
-            return processed_response, True
-        except Exception as e:
-            logger.error(f"Error processing ADD_STEP action: {str(e)}")
-    
-    # Process UPDATE_STEP actions
-    update_match = re.search(update_pattern, response, re.DOTALL)
-    if update_match:
-        try:
-            # Extract and parse JSON
-            json_str = update_match.group(1).strip()
-            data = json.loads(json_str)
-            
-            # Get the current sequence
-            sequence = Sequence.query.filter_by(user_id=user_id).order_by(Sequence.created_at.desc()).first()
-            
-            if sequence:
-                # Find the step by step_number
-                step = SequenceStep.query.filter_by(
-                    sequence_id=sequence.id,
-                    step_number=data.get('step_number')
-                ).first()
-                
-                if step:
-                    # Update step
-                    if 'content' in data:
-                        step.content = data['content']
-                    if 'type' in data:
-                        step.type = data['type']
-                    
-                    db.session.commit()
-                    
-                    # Emit sequence update event
-                    socketio.emit('sequence_update', sequence.to_dict())
-            
-            # Remove action block from response
-            processed_response = re.sub(update_pattern, '', response, flags=re.DOTALL).strip()
-            
-            return processed_response, True
-        except Exception as e:
-            logger.error(f"Error processing UPDATE_STEP action: {str(e)}")
-    
-    # Process DELETE_STEP actions
-    delete_match = re.search(delete_pattern, response, re.DOTALL)
-    if delete_match:
-        try:
-            # Extract and parse JSON
-            json_str = delete_match.group(1).strip()
-            data = json.loads(json_str)
-            
-            # Get the current sequence
-            sequence = Sequence.query.filter_by(user_id=user_id).order_by(Sequence.created_at.desc()).first()
-            
-            if sequence:
-                # Find the step by step_number
-                step = SequenceStep.query.filter_by(
-                    sequence_id=sequence.id,
-                    step_number=data.get('step_number')
-                ).first()
-                
-                if step:
-                    # Delete step
-                    db.session.delete(step)
-                    db.session.commit()
-                    
-                    # Reorder remaining steps
-                    steps = SequenceStep.query.filter_by(sequence_id=sequence.id).order_by(SequenceStep.step_number).all()
-                    for i, s in enumerate(steps, 1):
-                        s.step_number = i
-                    
-                    db.session.commit()
-                    
-                    # Emit sequence update event
-                    socketio.emit('sequence_update', sequence.to_dict())
-            
-            # Remove action block from response
-            processed_response = re.sub(delete_pattern, '', response, flags=re.DOTALL).strip()
-            
-            return processed_response, True
-        except Exception as e:
-            logger.error(f"Error processing DELETE_STEP action: {str(e)}")
-    
-    # If no action blocks found or processed
-    return response, False
-
+        if raise_errors:
+            raise error
+        return payload
 
 @bp.route('', methods=['DELETE'])
 def clear_chat():
     """Clear chat history"""
     user = get_default_user()
     Message.query.filter_by(user_id=user.id).delete()
+    ConversationSummary.query.filter_by(user_id=user.id).delete()
     db.session.commit()
     return jsonify({'message': 'Chat history cleared'})
@@ -0,0 +1,18 @@
+from flask import Blueprint, jsonify, current_app
+from app.services.admission import admission
+from app.services.ai import ai_service
+from app.services.cache import sequence_cache
+
+bp = Blueprint('metrics', __name__, url_prefix='/api/metrics')
+
+@bp.route('', methods=['GET'])
+def get_metrics():
+    """Get runtime counters for the backend's caches and AI usage, and this worker's startup timings"""
+    return jsonify({
+        'sequence_cache': sequence_cache.stats(),
+        'ai_usage': ai_service.get_usage_stats(),
+        'ai_client': ai_service.resilient.stats(),
+        'ai_admission': admission.stats(),
+        'ai_routing': ai_service.router.stats(),
+        'startup': current_app.extensions.get('startup', {})
+    })
@@ -1,10 +1,24 @@
-from flask import Blueprint, request, jsonify
-from app import db, socketio
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from app import db
 from app.models.sequence import Sequence, SequenceStep
 from app.models.user import User
+from app.services.admission import BULK
 from app.services.ai import ai_service
+from app.services.cache import sequence_cache
+from app.services.llm_client import AIServiceError
+from app.services.materialize import materialize_sequence, materialize_sequences
+from app.services.ordering import insert_step, remove_step, move_step
+from app.services.reads import select_sequences, select_steps, sequence_payload, step_payload
+from app.services.realtime import (
+    bump_version, publish_created, publish_deleted, publish_draft_failed, publish_draft_step, publish_patch,
+    sequence_updated, step_added, step_removed, step_updated, steps_reordered
+)
+from app.utils.helpers import encode_cursor, decode_cursor, parse_page_size, parse_step_number
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
+import json
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -21,10 +35,50 @@ def get_default_user():
 
 @bp.route('/sequences', methods=['GET'])
 def get_sequences():
-    """Get all sequences for the current user"""
+    """
+    Get a page of the current user's sequences, newest first
+    
+    Query params:
+        include_steps: 'false' to return summaries without steps
+        limit: Page size (capped by SEQUENCES_MAX_PAGE_SIZE)
+        cursor: The X-Next-Cursor value from the previous page
+    """
     user = get_default_user()
-    sequences = Sequence.query.filter_by(user_id=user.id).order_by(Sequence.created_at.desc()).all()
-    return jsonify([sequence.to_dict() for sequence in sequences])
+    include_steps = request.args.get('include_steps', 'true').lower() != 'false'
+    limit = parse_page_size(
+        request.args.get('limit'),
+        current_app.config['SEQUENCES_PAGE_SIZE'],
+        current_app.config['SEQUENCES_MAX_PAGE_SIZE']
+    )
+    
+    criteria = [Sequence.user_id == user.id]
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            created_at, sequence_id = decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        criteria.append(db.tuple_(Sequence.created_at, Sequence.id) < (created_at, sequence_id))
+    
+    # Fetch one extra row to know whether another page follows
+    rows = select_sequences(
+        *criteria,
+        order_by=(Sequence.created_at.desc(), Sequence.id.desc()),
+        limit=limit + 1
+    )
+    
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers['X-Next-Cursor'] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    
+    if not include_steps:
+        return jsonify([sequence_payload(row) for row in rows]), 200, headers
+    
+    # Load every page's steps in one extra query instead of one per sequence
+    steps = select_steps([row.id for row in rows])
+    return jsonify([sequence_payload(row, steps[row.id]) for row in rows]), 200, headers
 
 @bp.route('/sequences/<int:sequence_id>', methods=['GET'])
 def get_sequence(sequence_id):
@@ -57,7 +111,7 @@ def create_sequence():
     db.session.commit()
     
     # Emit sequence creation event
-    socketio.emit('sequence_update', sequence.to_dict())
+    publish_created(sequence)
     
     return jsonify(sequence.to_dict()), 201
 
@@ -75,10 +129,12 @@ def update_sequence(sequence_id):
     if 'title' in data:
         sequence.title = data['title']
     
+    ops = [sequence_updated(sequence, [field for field in ('title',) if field in data])]
+    bump_version(sequence)
     db.session.commit()
     
     # Emit sequence update event
-    socketio.emit('sequence_update', sequence.to_dict())
+    publish_patch(sequence, ops)
     
     return jsonify(sequence.to_dict())
 
@@ -94,6 +150,9 @@ def delete_sequence(sequence_id):
     db.session.delete(sequence)
     db.session.commit()
     
+    # Emit sequence deletion event
+    publish_deleted(sequence_id, user.id)
+    
     return jsonify({'message': 'Sequence deleted'})
 
 @bp.route('/sequences/<int:sequence_id>/steps', methods=['GET'])
@@ -105,8 +164,8 @@ def get_steps(sequence_id):
     if not sequence:
         return jsonify({'error': 'Sequence not found'}), 404
     
-    steps = SequenceStep.query.filter_by(sequence_id=sequence_id).order_by(SequenceStep.step_number).all()
-    return jsonify([step.to_dict() for step in steps])
+    steps = select_steps([sequence_id])[sequence_id]
+    return jsonify([step_payload(step) for step in steps])
 
 @bp.route('/sequences/<int:sequence_id>/steps', methods=['POST'])
 def add_step(sequence_id):
@@ -122,22 +181,24 @@ def add_step(sequence_id):
     if not data or 'content' not in data:
         return jsonify({'error': 'Step content is required'}), 400
     
-    # Get the next step number
-    max_step = db.session.query(db.func.max(SequenceStep.step_number)).filter_by(sequence_id=sequence_id).scalar() or 0
-    next_step_number = max_step + 1
+    try:
+        step_number = parse_step_number(data.get('step_number'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    step = SequenceStep(
-        sequence_id=sequence_id,
-        step_number=data.get('step_number', next_step_number),
+    # Insert at the requested position (or append), shifting later steps down
+    step = insert_step(
+        sequence_id,
         content=data['content'],
-        type=data.get('type', 'email')
+        type=data.get('type', 'email'),
+        step_number=step_number
     )
-    
-    db.session.add(step)
+    ops = [step_added(step), steps_reordered(sequence_id)]
+    bump_version(sequence)
     db.session.commit()
     
     # Emit sequence update event
-    socketio.emit('sequence_update', sequence.to_dict())
+    publish_patch(sequence, ops)
     
     return jsonify(step.to_dict()), 201
 
@@ -157,19 +218,28 @@ def update_step(sequence_id, step_id):
     
     data = request.get_json()
     
+    try:
+        step_number = parse_step_number(data.get('step_number'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     if 'content' in data:
         step.content = data['content']
     
     if 'type' in data:
         step.type = data['type']
     
-    if 'step_number' in data:
-        step.step_number = data['step_number']
+    ops = [step_updated(step, [field for field in ('content', 'type') if field in data])]
+    
+    if step_number is not None:
+        move_step(step, step_number)
+        ops.append(steps_reordered(sequence_id))
     
+    bump_version(sequence)
     db.session.commit()
     
     # Emit sequence update event
-    socketio.emit('sequence_update', sequence.to_dict())
+    publish_patch(sequence, ops)
     
     return jsonify(step.to_dict())
 
@@ -190,18 +260,14 @@ def delete_step(step_id):
     if not sequence:
         return jsonify({'error': 'Sequence not found'}), 404
     
-    db.session.delete(step)
-    db.session.commit()
-    
-    # Reorder remaining steps
-    steps = SequenceStep.query.filter_by(sequence_id=sequence_id).order_by(SequenceStep.step_number).all()
-    for i, s in enumerate(steps, 1):
-        s.step_number = i
-    
+    # Delete the step and close the gap in one unit of work
+    remove_step(step)
+    ops = [step_removed(step_id), steps_reordered(sequence_id)]
+    bump_version(sequence)
     db.session.commit()
     
     # Emit sequence update event
-    socketio.emit('sequence_update', sequence.to_dict())
+    publish_patch(sequence, ops)
     
     return jsonify({'message': 'Step deleted'})
 
@@ -217,44 +283,182 @@ def generate_sequence():
     company_name = data['company_name']
     details = data.get('details', '')
     
+    bypass_cache = (request.args.get('cache') or data.get('cache')) == 'bypass'
+    
+    model = data.get('model')
+    try:
+        ai_service.router.check_override(model)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     user = get_default_user()
+    title = f"{job_title} at {company_name}"
+    
+    # Steps are shown in the owner's workspace as they stream in, under this id until the sequence is saved
+    generation_id = uuid.uuid4().hex
+    steps_shown = []
+    
+    def on_step(index, step):
+        steps_shown.append(index)
+        publish_draft_step(user.id, generation_id, title, index, step)
     
     try:
-        # Generate sequence steps using AI
+        # Generate sequence steps using AI (or reuse a cached generation)
         logger.info(f"Generating sequence for {job_title} at {company_name}")
-        sequence_steps = ai_service.generate_outreach_sequence(job_title, company_name, details)
+        sequence_steps, cache_status = sequence_cache.get_or_generate(
+            job_title, company_name, details, bypass=bypass_cache, user_id=user.id, model=model,
+            on_step=on_step
+        )
         
         if not sequence_steps:
             return jsonify({'error': 'Failed to generate sequence'}), 500
         
-        # Create a new sequence
-        sequence_title = f"{job_title} at {company_name}"
-        sequence = Sequence(
-            user_id=user.id,
-            title=sequence_title,
-            created_at=datetime.utcnow()
-        )
-        
-        db.session.add(sequence)
-        db.session.commit()
-        
-        # Add steps to the sequence
-        for i, step_data in enumerate(sequence_steps, 1):
-            step = SequenceStep(
-                sequence_id=sequence.id,
-                step_number=i,
-                content=step_data['content'],
-                type=step_data['type']
-            )
-            db.session.add(step)
-        
+        # Save the sequence and all its steps in one transaction
+        sequence_data = materialize_sequence(user.id, title, sequence_steps)
         db.session.commit()
+        sequence_data['generation_id'] = generation_id
         
         # Emit sequence creation event
-        socketio.emit('sequence_update', sequence.to_dict())
+        publish_created(sequence_data)
         
-        return jsonify(sequence.to_dict()), 201
+        return jsonify(sequence_data), 201, {'X-Cache': cache_status}
+    
+    except AIServiceError as e:
+        logger.error(f"Error generating sequence ({e.kind}): {str(e)}")
+        db.session.rollback()
+        if steps_shown:
+            publish_draft_failed(user.id, generation_id, e)
+        return jsonify(e.to_dict()), e.http_status, e.response_headers()
         
     except Exception as e:
         logger.error(f"Error generating sequence: {str(e)}")
+        db.session.rollback()
+        if steps_shown:
+            publish_draft_failed(user.id, generation_id, AIServiceError('error', str(e)))
         return jsonify({'error': f"Failed to generate sequence: {str(e)}"}), 500
+
+@bp.route('/sequences/generate/batch', methods=['POST'])
+def generate_sequence_batch():
+    """
+    Generate outreach sequences for many roles concurrently
+    
+    Accepts a list of {job_title, company_name, details} (or {"items": [...]}) and
+    streams one NDJSON line per item as soon as its sequence is generated and saved.
+    """
+    data = request.get_json()
+    items = data.get('items') if isinstance(data, dict) else data
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'A non-empty list of items is required'}), 400
+    
+    max_items = current_app.config['SEQUENCE_BATCH_MAX_ITEMS']
+    if len(items) > max_items:
+        return jsonify({'error': f'At most {max_items} items can be generated per batch'}), 400
+    
+    bypass_cache = request.args.get('cache') == 'bypass' or (
+        isinstance(data, dict) and data.get('cache') == 'bypass'
+    )
+    
+    model = data.get('model') if isinstance(data, dict) else None
+    try:
+        ai_service.router.check_override(model)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    user = get_default_user()
+    user_id = user.id
+    app = current_app._get_current_object()
+    
+    def generate_item(item):
+        # Runs in a pool thread; the cache needs its own app context and session
+        with app.app_context():
+            # Batch items queue behind interactive chat and single generations
+            return sequence_cache.get_or_generate(
+                item['job_title'], item['company_name'], item.get('details', ''),
+                bypass=bypass_cache, user_id=user_id, priority=BULK, model=model
+            )
+    
+    def results():
+        pending = {}
+        executor = ThreadPoolExecutor(
+            max_workers=min(current_app.config['SEQUENCE_BATCH_CONCURRENCY'], len(items)),
+            thread_name_prefix='helix-batch'
+        )
+        
+        try:
+            for index, item in enumerate(items):
+                if not isinstance(item, dict) or not item.get('job_title') or not item.get('company_name'):
+                    yield _ndjson({'index': index, 'status': 'error', 'error': 'Job title and company name are required'})
+                    continue
+                pending[executor.submit(generate_item, item)] = (index, item)
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                
+                # Everything that finished together is saved in one transaction
+                finished = []
+                for future in done:
+                    index, item = pending.pop(future)
+                    try:
+                        steps, cache_status = future.result()
+                    except AIServiceError as e:
+                        logger.error(f"Error generating sequence for batch item {index} ({e.kind}): {str(e)}")
+                        yield _ndjson({'index': index, 'status': 'error', 'error': e.user_message, 'kind': e.kind})
+                        continue
+                    except Exception as e:
+                        logger.error(f"Error generating sequence for batch item {index}: {str(e)}")
+                        yield _ndjson({'index': index, 'status': 'error', 'error': str(e)})
+                        continue
+                    
+                    if not steps:
+                        yield _ndjson({'index': index, 'status': 'error', 'error': 'Failed to generate sequence'})
+                        continue
+                    
+                    finished.append((index, item, steps, cache_status))
+                
+                if not finished:
+                    continue
+                
+                try:
+                    saved = _save_generated_sequences(user_id, finished)
+                except Exception as e:
+                    logger.error(f"Error saving batch of generated sequences: {str(e)}")
+                    db.session.rollback()
+                    for index, _, _, _ in finished:
+                        yield _ndjson({'index': index, 'status': 'error', 'error': 'Failed to save sequence'})
+                    continue
+                
+                for index, sequence_data, cache_status in saved:
+                    publish_created(sequence_data)
+                    yield _ndjson({'index': index, 'status': 'ok', 'cache': cache_status, 'sequence': sequence_data})
+        
+        finally:
+            # Stop queued generations if the client went away early
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+    
+    return Response(stream_with_context(results()), mimetype='application/x-ndjson')
+
+def _save_generated_sequences(user_id, finished):
+    """
+    Save several generated sequences and their steps in a single transaction
+    
+    Args:
+        finished (list): Tuples of (index, item, steps, cache_status)
+    
+    Returns:
+        list: Tuples of (index, sequence payload, cache_status)
+    """
+    payloads = materialize_sequences(user_id, [
+        (f"{item['job_title']} at {item['company_name']}", steps)
+        for _, item, steps, _ in finished
+    ])
+    db.session.commit()
+    return [
+        (index, sequence_data, cache_status)
+        for (index, _, _, cache_status), sequence_data in zip(finished, payloads)
+    ]
+
+def _ndjson(record):
+    return json.dumps(record) + '\n'
@@ -0,0 +1,230 @@
+"""
+Workspace actions embedded in assistant replies
+
+The assistant edits the workspace by writing action blocks into its reply:
+
+    ---ACTION: UPDATE_STEP---
+    {"step_number": 2, "content": "..."}
+    ---END ACTION---
+
+A reply is scanned once with a single compiled pattern, which yields every
+block in order and the reply text with the blocks removed. All the actions are
+then applied as one unit of work: a single commit, and a single realtime event
+per affected sequence once it has committed. Actions after a CREATE_SEQUENCE
+apply to the sequence it created; otherwise they apply to the user's most
+recent sequence.
+"""
+import json
+import logging
+import re
+from app import db
+from app.models.sequence import Sequence, SequenceStep
+from app.services.materialize import materialize_sequence
+from app.services.ordering import insert_step, remove_step
+from app.services.realtime import (
+    bump_version, publish_created, publish_patch, step_added, step_removed, step_updated, steps_reordered
+)
+from app.utils.helpers import parse_step_number
+
+logger = logging.getLogger(__name__)
+
+ACTION_BLOCK_PATTERN = re.compile(
+    r'---ACTION:\s*(CREATE_SEQUENCE|ADD_STEP|UPDATE_STEP|DELETE_STEP)\s*---(.*?)---END ACTION---',
+    re.DOTALL
+)
+
+STEP_FIELDS = ('content', 'type')
+
+
+def parse_action_blocks(text):
+    """
+    Extract every action block from a reply in one pass
+
+    Blocks whose body is not a JSON object are dropped from the text and skipped.
+
+    Returns:
+        tuple: (list of (action, data) in reply order, text with the blocks removed)
+    """
+    actions = []
+    kept = []
+    position = 0
+
+    for match in ACTION_BLOCK_PATTERN.finditer(text):
+        kept.append(text[position:match.start()])
+        position = match.end()
+
+        action, body = match.groups()
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            logger.error(f"Skipping {action} action with invalid JSON: {str(e)}")
+            continue
+        if not isinstance(data, dict):
+            logger.error(f"Skipping {action} action whose body is not an object")
+            continue
+        actions.append((action, data))
+
+    kept.append(text[position:])
+    return actions, ''.join(kept).strip()
+
+
+def _step_number(data):
+    """An action's step number, or None if it is missing or not a whole number"""
+    try:
+        return parse_step_number(data.get('step_number'))
+    except ValueError as e:
+        logger.warning(f"Ignoring step number in AI action: {str(e)}")
+        return None
+
+
+class ActionBatch:
+    """
+    Applies a reply's actions to the session and collects the events they produce
+
+    Nothing is committed here. The caller commits once and then calls `publish`.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._sequence = None
+        self._sequence_id = None
+        self._created = {}  # sequence id -> payload, or None once a later action changed it
+        self._ops = {}  # sequence id -> patch ops, for sequences that existed before this batch
+        self._reordered = set()
+        self._sequences = {}
+
+    def apply(self, action, data):
+        """
+        Apply one action
+
+        Returns:
+            bool: Whether the action changed anything
+        """
+        handler = getattr(self, f'_{action.lower()}')
+        return handler(data)
+
+    def finish(self):
+        """Complete each touched sequence's patch and bump its version, ready to commit"""
+        for sequence_id, ops in self._ops.items():
+            if sequence_id in self._reordered:
+                ops.append(steps_reordered(sequence_id))
+            bump_version(self._sequences[sequence_id])
+
+    def publish(self):
+        """Emit one event per sequence the committed batch touched"""
+        for sequence_id, payload in self._created.items():
+            # The user asked for it in the chat, so it replaces whatever they have open;
+            # the next reply's actions then apply to the sequence they are looking at
+            publish_created(payload or db.session.get(Sequence, sequence_id), focus=True)
+        for sequence_id, ops in self._ops.items():
+            publish_patch(self._sequences[sequence_id], ops)
+
+    def _current_sequence(self, create=False):
+        if self._sequence is None:
+            if self._sequence_id is not None:
+                self._sequence = db.session.get(Sequence, self._sequence_id)
+            else:
+                self._sequence = Sequence.query.filter_by(user_id=self.user_id) \
+                    .order_by(Sequence.created_at.desc(), Sequence.id.desc()) \
+                    .first()
+        if self._sequence is None and create:
+            self._new_sequence('New Sequence', [])
+            return self._current_sequence()
+        return self._sequence
+
+    def _new_sequence(self, title, steps):
+        payload = materialize_sequence(self.user_id, title, steps)
+        self._created[payload['id']] = payload
+
+        # Later actions in the same reply refer to the new sequence
+        self._sequence, self._sequence_id = None, payload['id']
+
+    def _record(self, sequence, *ops, reordered=False):
+        if sequence.id in self._created:
+            # Its owner gets the whole sequence once it is committed
+            self._created[sequence.id] = None
+            return
+        self._sequences[sequence.id] = sequence
+        self._ops.setdefault(sequence.id, []).extend(ops)
+        if reordered:
+            self._reordered.add(sequence.id)
+
+    def _find_step(self, data):
+        sequence = self._current_sequence()
+        number = _step_number(data)
+        if sequence is None or number is None:
+            return sequence, None
+        step = SequenceStep.query.filter_by(sequence_id=sequence.id, step_number=number).first()
+        return sequence, step
+
+    def _create_sequence(self, data):
+        # Number steps densely in the order the model gave them; unnumbered steps keep their place first
+        steps = sorted(data.get('steps', []), key=lambda step_data: _step_number(step_data) or 0)
+        self._new_sequence(data.get('title', 'New Sequence'), steps)
+        return True
+
+    def _add_step(self, data):
+        sequence = self._current_sequence(create=True)
+        step = insert_step(
+            sequence.id,
+            content=data.get('content', ''),
+            type=data.get('type', 'email'),
+            # Without a usable position the step goes at the end
+            step_number=_step_number(data)
+        )
+        self._record(sequence, step_added(step), reordered=True)
+        return True
+
+    def _update_step(self, data):
+        sequence, step = self._find_step(data)
+        if step is None:
+            return False
+
+        fields = [field for field in STEP_FIELDS if field in data]
+        for field in fields:
+            setattr(step, field, data[field])
+        self._record(sequence, step_updated(step, fields))
+        return True
+
+    def _delete_step(self, data):
+        sequence, step = self._find_step(data)
+        if step is None:
+            return False
+
+        step_id = step.id
+        remove_step(step)
+        self._record(sequence, step_removed(step_id), reordered=True)
+        return True
+
+
+def process_ai_action_blocks(response, user_id):
+    """
+    Apply the action blocks in an AI response and strip them from its text
+
+    Either every action is applied or, if one fails, none are.
+
+    Args:
+        response (str): The AI response text
+        user_id (int): The current user ID
+
+    Returns:
+        tuple: (processed_response, action_performed)
+    """
+    actions, processed_response = parse_action_blocks(response)
+    if not actions:
+        return processed_response, False
+
+    batch = ActionBatch(user_id)
+    try:
+        performed = False
+        for action, data in actions:
+            performed = batch.apply(action, data) or performed
+        batch.finish()
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error applying {len(actions)} AI actions: {str(e)}")
+        db.session.rollback()
+        return processed_response, False
+
+    batch.publish()
+    return processed_response, performed
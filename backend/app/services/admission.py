@@ -0,0 +1,278 @@
+"""
+Admission control for AI provider calls
+
+Every call into AnthropicAI is admitted here first. There are three limits:
+
+- At most AI_MAX_CONCURRENT calls are in flight at once.
+- A global token bucket caps the call rate toward the provider
+  (AI_RATE_PER_MINUTE, bursting to AI_RATE_BURST).
+- A bucket per user caps each user's call rate
+  (AI_USER_RATE_PER_MINUTE, bursting to AI_USER_RATE_BURST).
+
+A call that can't start right away waits in a priority queue. Interactive
+chat goes first, single sequence generations next, and bulk work (batch
+generation, conversation summaries) last. Within a priority, calls are
+served in arrival order.
+
+Rather than let requests pile up, calls are shed with an AIServiceError of
+kind 'throttled', which routes turn into 429 with Retry-After, when:
+
+- the user's own bucket is empty;
+- the queue is full;
+- the wait would pass the priority's limit (AI_QUEUE_MAX_WAIT_*).
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from app.services.llm_client import AIServiceError
+from app.utils.helpers import percentile
+
+logger = logging.getLogger(__name__)
+
+# Lower values are admitted first
+INTERACTIVE = 0
+STANDARD = 1
+BULK = 2
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', STANDARD: 'standard', BULK: 'bulk'}
+
+# Per-user buckets kept in memory; the least recently used are dropped beyond this
+MAX_USER_BUCKETS = 10000
+
+# Recent queue waits kept for the percentiles in stats()
+WAIT_SAMPLES = 1000
+
+
+class TokenBucket:
+    """Allows `rate` events per second on average, and up to `burst` at once"""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self):
+        """
+        Take one token if there is one
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available
+        """
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def refund(self):
+        self._tokens = min(self.burst, self._tokens + 1)
+
+    @property
+    def tokens(self):
+        self._refill()
+        return self._tokens
+
+
+class AdmissionController:
+    """Concurrency limit, global and per-user rate limits, and a priority queue for AI calls"""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._sequence = itertools.count()
+        self._queue = []  # heap of waiters: [priority, arrival order]
+        self._active = 0
+        self._user_buckets = OrderedDict()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._hold_seconds = 1.0  # moving average of how long an admitted call runs
+        self._counters = {'admitted': 0, 'rejected': {}}
+        self.configure()
+
+    def init_app(self, app):
+        """Apply the app's AI_* admission settings"""
+        config = app.config
+        self.configure(
+            max_concurrent=config['AI_MAX_CONCURRENT'],
+            rate_per_minute=config['AI_RATE_PER_MINUTE'],
+            burst=config['AI_RATE_BURST'],
+            user_rate_per_minute=config['AI_USER_RATE_PER_MINUTE'],
+            user_burst=config['AI_USER_RATE_BURST'],
+            max_queue=config['AI_QUEUE_MAX_DEPTH'],
+            max_wait={
+                INTERACTIVE: config['AI_QUEUE_MAX_WAIT_INTERACTIVE'],
+                STANDARD: config['AI_QUEUE_MAX_WAIT_STANDARD'],
+                BULK: config['AI_QUEUE_MAX_WAIT_BULK']
+            }
+        )
+
+    def configure(self, max_concurrent=8, rate_per_minute=0, burst=0, user_rate_per_minute=0, user_burst=0,
+                  max_queue=200, max_wait=None):
+        """
+        Set the limits; a rate of 0 turns that bucket off
+
+        Args:
+            max_concurrent (int): Calls in flight at once
+            rate_per_minute (float): Average calls per minute across all users
+            burst (int): Calls that may start at once after an idle spell (defaults to a tenth of a minute's rate)
+            user_rate_per_minute (float): Average calls per minute for each user
+            user_burst (int): Per-user burst (defaults to a tenth of a minute's rate)
+            max_queue (int): Calls that may wait at once before new ones are shed
+            max_wait (dict): Longest queue wait in seconds for each priority
+        """
+        with self._cond:
+            self.max_concurrent = max(1, max_concurrent)
+            self.max_queue = max_queue
+            self.max_wait = {INTERACTIVE: 10.0, STANDARD: 30.0, BULK: 60.0, **(max_wait or {})}
+            self._global_bucket = self._bucket(rate_per_minute, burst)
+            self._user_rate = (user_rate_per_minute, user_burst)
+            self._user_buckets.clear()
+            self._cond.notify_all()
+
+    def _bucket(self, rate_per_minute, burst):
+        if not rate_per_minute:
+            return None
+        return TokenBucket(rate_per_minute / 60, burst or max(1, rate_per_minute // 10), clock=self._clock)
+
+    def _user_bucket(self, user_id):
+        rate_per_minute, burst = self._user_rate
+        if user_id is None or not rate_per_minute:
+            return None
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            bucket = self._bucket(rate_per_minute, burst)
+            self._user_buckets[user_id] = bucket
+            if len(self._user_buckets) > MAX_USER_BUCKETS:
+                self._user_buckets.popitem(last=False)
+        else:
+            self._user_buckets.move_to_end(user_id)
+        return bucket
+
+    @contextmanager
+    def admit(self, user_id=None, priority=INTERACTIVE):
+        """
+        Hold an admission for the duration of the block
+
+        Raises:
+            AIServiceError: With kind 'throttled' if the call was shed
+        """
+        self.acquire(user_id, priority)
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.release(self._clock() - start)
+
+    def acquire(self, user_id=None, priority=INTERACTIVE):
+        """
+        Wait for a slot, in priority order
+
+        Raises:
+            AIServiceError: With kind 'throttled' if the call was shed
+        """
+        arrived = self._clock()
+        with self._cond:
+            user_bucket = self._user_bucket(user_id)
+            if user_bucket is not None:
+                wait = user_bucket.try_take()
+                if wait:
+                    self._reject('user_rate', priority, f"Too many AI requests for user {user_id}", wait)
+
+            # Only calls that would have to wait count against the queue's depth
+            must_wait = bool(self._queue) or self._active >= self.max_concurrent
+            if must_wait and len(self._queue) >= self.max_queue:
+                self._refund(user_bucket)
+                self._reject('queue_full', priority, "The AI request queue is full", self._estimated_wait())
+
+            waiter = [priority, next(self._sequence)]
+            heapq.heappush(self._queue, waiter)
+            deadline = arrived + self.max_wait.get(priority, self.max_wait[BULK])
+
+            while True:
+                now = self._clock()
+                timeout = deadline - now
+                if self._queue[0] is waiter and self._active < self.max_concurrent:
+                    wait = self._global_bucket.try_take() if self._global_bucket is not None else 0.0
+                    if not wait:
+                        heapq.heappop(self._queue)
+                        self._active += 1
+                        self._counters['admitted'] += 1
+                        self._waits.append(now - arrived)
+                        # The next waiter may be able to start as well
+                        self._cond.notify_all()
+                        return
+                    if wait > timeout:
+                        self._withdraw(waiter, user_bucket)
+                        self._reject('rate', priority, "The AI request rate limit is reached", wait)
+                    timeout = wait
+
+                if timeout <= 0:
+                    self._withdraw(waiter, user_bucket)
+                    self._reject('queue_timeout', priority, "Waited too long for an AI request slot",
+                                 self._estimated_wait())
+                self._cond.wait(timeout)
+
+    def release(self, held_seconds=None):
+        """Give back a slot taken by `acquire`"""
+        with self._cond:
+            self._active -= 1
+            if held_seconds is not None:
+                self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * held_seconds
+            self._cond.notify_all()
+
+    def _withdraw(self, waiter, user_bucket):
+        self._queue.remove(waiter)
+        heapq.heapify(self._queue)
+        self._refund(user_bucket)
+        self._cond.notify_all()
+
+    @staticmethod
+    def _refund(bucket):
+        if bucket is not None:
+            bucket.refund()
+
+    def _estimated_wait(self):
+        """Rough seconds until a newly queued call would start"""
+        return max(1.0, self._hold_seconds * (len(self._queue) + 1) / self.max_concurrent)
+
+    def _reject(self, reason, priority, message, retry_after):
+        rejected = self._counters['rejected']
+        rejected[reason] = rejected.get(reason, 0) + 1
+        logger.warning(f"Shed {PRIORITY_NAMES.get(priority, priority)} AI call ({reason}), retry after {retry_after:.1f}s")
+        raise AIServiceError('throttled', message, retry_after=retry_after)
+
+    def stats(self):
+        """Queue depth per priority, in-flight calls, counters and recent queue wait percentiles"""
+        with self._cond:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._queue:
+                depth[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            waits = sorted(self._waits)
+            global_tokens = self._global_bucket.tokens if self._global_bucket is not None else None
+            stats = {
+                'active': self._active,
+                'max_concurrent': self.max_concurrent,
+                'queue_depth': depth,
+                'admitted': self._counters['admitted'],
+                'rejected': dict(self._counters['rejected']),
+                'global_tokens': round(global_tokens, 1) if global_tokens is not None else None,
+                'tracked_users': len(self._user_buckets)
+            }
+
+        waits_ms = [round(wait * 1000, 1) for wait in waits]
+        stats['wait_ms'] = {'p50': percentile(waits_ms, 50), 'p95': percentile(waits_ms, 95),
+                            'p99': percentile(waits_ms, 99), 'max': waits_ms[-1] if waits_ms else None}
+        return stats
+
+
+# Shared by every AI call in this process
+admission = AdmissionController()
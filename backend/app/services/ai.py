@@ -1,31 +1,79 @@
 import os
 import sys
+import json
 import logging
-import anthropic
-from anthropic import Anthropic
+import re
+import textwrap
+import threading
+import time
 from flask import current_app
+from app.services.admission import admission, BULK, INTERACTIVE, STANDARD
+from app.services.llm_client import AIServiceError, CircuitBreaker, ResilientClient, classify
+from app.services.model_router import FAST, FULL, ModelRouter, chat_kind, parse_rules
+from app.utils.json_stream import ArrayItemStream
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the sequence generation prompt changes so cached sequences are regenerated
+SEQUENCE_PROMPT_VERSION = 2
+
+# Marks a prompt prefix for provider-side caching
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# Sampling settings go in the request body, since newer SDK releases no longer take `temperature` as an argument
+CHAT_SAMPLING = {"temperature": 0.7}
+SUMMARY_SAMPLING = {"temperature": 0}
+
+# Sequences come back as this tool's input, so the API enforces the shape and the
+# steps can be parsed while they stream in
+SEQUENCE_TOOL = {
+    "name": "save_sequence",
+    "description": "Save a recruiting outreach sequence to the user's workspace.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "steps": {
+                "type": "array",
+                "description": "The steps in the order they are sent",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "type": {"type": "string", "enum": ["email", "message", "call", "other"]},
+                        "content": {"type": "string", "description": "The full text of the step"}
+                    },
+                    "required": ["type", "content"]
+                }
+            }
+        },
+        "required": ["steps"]
+    }
+}
+
+def compact_prompt(text):
+    """Strip source indentation, trailing spaces and repeated blank lines from a prompt"""
+    text = textwrap.dedent(text).strip()
+    text = re.sub(r'[ \t]+\n', '\n', text)
+    return re.sub(r'\n{3,}', '\n\n', text)
+
 class AnthropicAI:
     """Integration with Anthropic's Claude models for AI chat functionality"""
     
     def __init__(self):
-        # Initialize the Anthropic client
-        self.anthropic_key = os.environ.get('ANTHROPIC_API_KEY')
-        if not self.anthropic_key:
-            logger.error("ANTHROPIC_API_KEY environment variable is not set")
-            raise ValueError("ANTHROPIC_API_KEY environment variable must be set")
+        # The Anthropic client is created on first use (see `client`), so importing
+        # this module is cheap and does not need ANTHROPIC_API_KEY
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.base_url = None
         
-        self.client = Anthropic(
-            api_key=self.anthropic_key,
-        )
+        # Deadlines, retries and the circuit breaker for every call (set from the app config by init_app)
+        self.resilient = ResilientClient(lambda: self.client)
+        self.sequence_timeout = 120.0
         
-        # The newest Anthropic model is "claude-3-5-sonnet-20241022" which was released October 22, 2024
-        self.model = "claude-3-5-sonnet-20241022" 
+        # Which model each call goes to: cheap turns to the fast model, generations to the full one
+        self.router = ModelRouter()
         
-        # System prompt for the recruiting assistant
-        self.system_prompt = """
+        # System prompt for the recruiting assistant (compacted once here, since it is sent on every call)
+        self.system_prompt = compact_prompt("""
         You are Helix, an agentic recruiting assistant designed to help with outreach and engagement for hiring candidates.
         
         Your main functions are:
@@ -109,57 +157,372 @@ class AnthropicAI:
         ---END ACTION---
         
         After performing any action, briefly describe what you did and ask if the user wants to make any other changes.
+        """)
+        
+        # Prompt template for sequence generation, compacted once at load
+        self.sequence_prompt = compact_prompt("""
+        Create a recruiting outreach sequence for a {job_title} role at {company_name}.
+        
+        Additional details:
+        {details}
+        
+        Please provide a complete sequence with:
+        1. Initial outreach email
+        2. Follow-up message
+        3. Final connection attempt
+        
+        Give each step the appropriate type (email, message, call) and its full content. Start emails with
+        a "Subject:" line, and write {{name}} where the candidate's name goes.
+        
+        Save the sequence with the save_sequence tool.
+        """)
+        
+        # Prompt for folding older chat turns into the running conversation summary
+        self.summary_prompt = compact_prompt("""
+        You maintain a running summary of a conversation between a recruiter and Helix, their recruiting assistant.
+        
+        Current summary:
+        {summary}
+        
+        New messages:
+        {transcript}
+        
+        Write the updated summary. Keep the roles, companies, candidate details, preferences and decisions
+        that later turns may rely on, and note which sequences were created or changed. Leave out pleasantries.
+        Reply with the summary only.
+        """)
+        
+        # The system prompt never changes, so mark it as a cacheable prefix
+        self.system_blocks = [
+            {"type": "text", "text": self.system_prompt, "cache_control": CACHE_CONTROL}
+        ]
+        
+        # Token usage per call type, including prompt cache reads and writes
+        self.usage_stats = {}
+        self._usage_lock = threading.Lock()
+        
+    def init_app(self, app):
+        """Apply the app's AI_* settings; the client itself is still created on first use"""
+        config = app.config
+        self.configure(
+            base_url=config['AI_BASE_URL'] or None,
+            timeout=config['AI_TIMEOUT'],
+            sequence_timeout=config['AI_SEQUENCE_TIMEOUT'],
+            connect_timeout=config['AI_CONNECT_TIMEOUT'],
+            max_attempts=config['AI_MAX_ATTEMPTS'],
+            retry_base_delay=config['AI_RETRY_BASE_DELAY'],
+            retry_max_delay=config['AI_RETRY_MAX_DELAY'],
+            breaker_threshold=config['AI_BREAKER_THRESHOLD'],
+            breaker_reset=config['AI_BREAKER_RESET']
+        )
+        self.router.configure(
+            models={FAST: config['AI_FAST_MODEL'], FULL: config['AI_FULL_MODEL']},
+            rules=parse_rules(config['AI_ROUTING_RULES'])
+        )
+    
+    @property
+    def model(self):
+        """The full model, used for any call kind without a routing rule"""
+        return self.router.models[FULL]
+    
+    def configure(self, base_url=None, timeout=60.0, sequence_timeout=120.0, connect_timeout=5.0,
+                  max_attempts=3, retry_base_delay=0.5, retry_max_delay=8.0,
+                  breaker_threshold=5, breaker_reset=30.0):
         """
+        Set where calls go and how they are bounded
         
-    def get_chat_response(self, user_message, chat_history=None):
+        Args:
+            base_url (str, optional): API base URL, e.g. a local fake server
+                (defaults to ANTHROPIC_BASE_URL, then Anthropic's API)
+            timeout (float): Deadline in seconds for a chat or summary call, retries included
+            sequence_timeout (float): Deadline in seconds for a sequence generation call
+            connect_timeout (float): Longest wait in seconds to connect on any attempt
+            max_attempts (int): Attempts per call, the first one included
+            retry_base_delay (float): Backoff ceiling in seconds after the first failure
+            retry_max_delay (float): Largest backoff ceiling in seconds
+            breaker_threshold (int): Consecutive failures that open the circuit breaker
+            breaker_reset (float): Seconds the open circuit fails calls before trying one again
+        """
+        with self._client_lock:
+            if base_url != self.base_url:
+                self._client = None
+            self.base_url = base_url
+        
+        self.sequence_timeout = sequence_timeout
+        self.resilient = ResilientClient(
+            lambda: self.client,
+            timeout=timeout,
+            connect_timeout=connect_timeout,
+            max_attempts=max_attempts,
+            base_delay=retry_base_delay,
+            max_delay=retry_max_delay,
+            breaker=CircuitBreaker(failure_threshold=breaker_threshold, reset_timeout=breaker_reset)
+        )
+    
+    @property
+    def client(self):
+        """
+        The Anthropic client, created on first use
+        
+        Raises:
+            ValueError: If ANTHROPIC_API_KEY is not set
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+    
+    def _create_client(self):
+        # The SDK takes about a second to import, so a worker only pays for it when it first needs it
+        from anthropic import Anthropic
+        
+        anthropic_key = os.environ.get('ANTHROPIC_API_KEY')
+        if not anthropic_key:
+            logger.error("ANTHROPIC_API_KEY environment variable is not set")
+            raise ValueError("ANTHROPIC_API_KEY environment variable must be set")
+        
+        # Retries are handled by self.resilient, not the SDK
+        return Anthropic(api_key=anthropic_key, base_url=self.base_url, max_retries=0)
+    
+    def warm_up(self, timeout=5):
+        """
+        Create the client and open its HTTPS connection to the API ahead of the first request
+        
+        Makes one models list request, which costs no tokens. The connection is kept in
+        the client's pool, so the first chat call skips the DNS lookup and TLS handshake.
+        
+        Returns:
+            bool: Whether a connection to the API is open
+        """
+        try:
+            from anthropic import APIStatusError
+            client = self.client
+        except Exception as e:
+            logger.warning(f"Anthropic client not warmed up: {str(e)}")
+            return False
+        
+        try:
+            client.with_options(max_retries=0, timeout=timeout).models.list(limit=1)
+        except APIStatusError as e:
+            # An error status still came back over an open connection
+            logger.warning(f"Anthropic warm-up request returned {e.status_code}")
+        except Exception as e:
+            logger.warning(f"Anthropic warm-up request failed: {str(e)}")
+            return False
+        return True
+    
+    def get_chat_response(self, user_message, chat_history=None, summary=None, user_id=None, model=None):
         """
         Get a response from Claude based on the user message and chat history
         
         Args:
             user_message (str): The most recent user message
             chat_history (list, optional): List of previous messages as dicts with 'role' and 'content'
+            summary (str, optional): Summary of the conversation before chat_history
+            user_id (int, optional): The user the call is for, for per-user admission limits
+            model (str, optional): Route name or model id to use instead of the routing rules
         
         Returns:
             str: The assistant's response text
+        
+        Raises:
+            AIServiceError: If the call failed or was shed (see app.services.llm_client and app.services.admission)
         """
-        try:
-            # Format the messages for the Anthropic API
-            messages = []
-            
-            # Add chat history if provided
-            if chat_history:
-                for message in chat_history:
-                    # Skip system messages as they should be in the system parameter
-                    if message["role"] == "system":
-                        continue
-                    messages.append({
-                        "role": message["role"],
-                        "content": message["content"]
-                    })
-            
-            # Add the current user message
-            messages.append({
-                "role": "user",
-                "content": user_message
-            })
-            
-            # Call the Anthropic API
-            response = self.client.messages.create(
-                model=self.model,
+        messages = self._build_messages(user_message, chat_history)
+        route = self.router.route(chat_kind(user_message, chat_history), override=model)
+        
+        # Call the Anthropic API
+        start = time.monotonic()
+        with admission.admit(user_id, INTERACTIVE):
+            response = self.resilient.call(lambda client, timeout: client.messages.create(
+                model=route.model,
                 messages=messages,
-                system=self.system_prompt,  # Use system parameter instead of a system message
+                system=self._system_blocks(summary),  # Use system parameter instead of a system message
                 max_tokens=1000,
-                temperature=0.7
-            )
+                extra_body=CHAT_SAMPLING,
+                timeout=timeout
+            ))
+        elapsed_ms = (time.monotonic() - start) * 1000
+        self._record_usage('chat', response.usage)
+        self.router.record(route, elapsed_ms, response.usage)
+        logger.info(f"Chat response ({route.kind} via {route.name}) completed in {elapsed_ms:.0f}ms")
+        
+        # Extract and return the assistant's response
+        return response.content[0].text
+    
+    def stream_chat_response(self, user_message, chat_history=None, on_text=None, summary=None, user_id=None,
+                             model=None):
+        """
+        Stream a response from Claude, reporting each text fragment as it arrives
+        
+        Args:
+            user_message (str): The most recent user message
+            chat_history (list, optional): List of previous messages as dicts with 'role' and 'content'
+            on_text (callable, optional): Called with each text fragment as it is received
+            summary (str, optional): Summary of the conversation before chat_history
+            user_id (int, optional): The user the call is for, for per-user admission limits
+            model (str, optional): Route name or model id to use instead of the routing rules
+        
+        Returns:
+            str: The complete assistant's response text
+        
+        Raises:
+            AIServiceError: If the call failed. If part of the reply was already
+                streamed, that text is in the error's `partial`.
+        """
+        messages = self._build_messages(user_message, chat_history)
+        route = self.router.route(chat_kind(user_message, chat_history), override=model)
+        start = time.monotonic()
+        deadline = start + self.resilient.timeout
+        first_token_at = None
+        fragments = []
+        
+        def attempt(client, timeout):
+            nonlocal first_token_at
+            try:
+                with client.messages.stream(
+                    model=route.model,
+                    messages=messages,
+                    system=self._system_blocks(summary),
+                    max_tokens=1000,
+                    extra_body=CHAT_SAMPLING,
+                    timeout=timeout
+                ) as stream:
+                    for text in stream.text_stream:
+                        if first_token_at is None:
+                            first_token_at = time.monotonic()
+                        fragments.append(text)
+                        if on_text:
+                            on_text(text)
+                        # The HTTP timeout only bounds each read, so check the whole reply's deadline too
+                        if time.monotonic() > deadline:
+                            raise AIServiceError('timeout', 'The reply did not finish in time', retryable=True)
+                    
+                    return stream.get_final_message()
             
-            # Extract and return the assistant's response
-            return response.content[0].text
+            except Exception as e:
+                if not fragments:
+                    raise
+                # Part of the reply was already shown, so the call cannot be retried
+                error = classify(e)
+                error.partial = ''.join(fragments)
+                if error is e:
+                    raise
+                raise error from e
         
-        except Exception as e:
-            logger.error(f"Error calling Anthropic API: {str(e)}")
-            return f"I apologize, but I encountered an error processing your request. Please try again. (Error: {str(e)})"
+        with admission.admit(user_id, INTERACTIVE):
+            final_message = self.resilient.call(attempt)
+        total_ms = (time.monotonic() - start) * 1000
+        ttft_ms = (first_token_at - start) * 1000 if first_token_at else total_ms
+        self._record_usage('chat', final_message.usage)
+        self.router.record(route, total_ms, final_message.usage, first_token_ms=ttft_ms)
+        logger.info(
+            f"Chat response ({route.kind} via {route.name}) streamed: "
+            f"time to first token {ttft_ms:.0f}ms, total {total_ms:.0f}ms"
+        )
+        
+        return ''.join(fragments)
+    
+    def summarize_conversation(self, summary, messages, max_tokens=500, user_id=None):
+        """
+        Fold chat messages into a running summary of the conversation
+        
+        Args:
+            summary (str): The summary so far, or an empty string
+            messages (list): The messages to fold in, oldest first, as dicts with 'role' and 'content'
+            max_tokens (int): Length limit for the new summary
+            user_id (int, optional): The user the call is for, for per-user admission limits
+        
+        Returns:
+            str: The updated summary
+        """
+        transcript = "\n\n".join(f"{message['role'].upper()}: {message['content']}" for message in messages)
+        prompt = self.summary_prompt.format(
+            summary=summary or 'None yet.',
+            transcript=transcript
+        )
+        
+        route = self.router.route('summary')
+        start = time.monotonic()
+        with admission.admit(user_id, BULK):
+            response = self.resilient.call(lambda client, timeout: client.messages.create(
+                model=route.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                extra_body=SUMMARY_SAMPLING,
+                timeout=timeout
+            ))
+        self._record_usage('summary', response.usage)
+        self.router.record(route, (time.monotonic() - start) * 1000, response.usage)
+        return response.content[0].text.strip()
+    
+    def _system_blocks(self, summary=None):
+        """System prompt blocks, with the conversation summary after the cached prefix"""
+        if not summary:
+            return self.system_blocks
+        return self.system_blocks + [
+            {"type": "text", "text": f"Summary of the earlier conversation with this user:\n{summary}"}
+        ]
+    
+    def _build_messages(self, user_message, chat_history=None):
+        """Format the chat history and current user message for the Anthropic API"""
+        messages = []
+        
+        # Add chat history if provided
+        if chat_history:
+            for message in chat_history:
+                # Skip system messages as they should be in the system parameter
+                if message["role"] == "system":
+                    continue
+                messages.append({
+                    "role": message["role"],
+                    "content": message["content"]
+                })
+        
+        # The history was already sent last turn, so cache everything up to its end
+        if messages and messages[-1]["content"]:
+            messages[-1] = {
+                "role": messages[-1]["role"],
+                "content": [
+                    {"type": "text", "text": messages[-1]["content"], "cache_control": CACHE_CONTROL}
+                ]
+            }
+        
+        # Add the current user message
+        messages.append({
+            "role": "user",
+            "content": user_message
+        })
+        
+        return messages
     
-    def generate_outreach_sequence(self, job_title, company_name, details=None):
+    def _record_usage(self, kind, usage):
+        """Log one call's token usage and add it to the running totals for its call type"""
+        counts = {
+            'input_tokens': usage.input_tokens or 0,
+            'output_tokens': usage.output_tokens or 0,
+            'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', None) or 0,
+            'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', None) or 0
+        }
+        logger.info(
+            f"Anthropic {kind} usage: input={counts['input_tokens']} output={counts['output_tokens']} "
+            f"cache_read={counts['cache_read_input_tokens']} cache_write={counts['cache_creation_input_tokens']}"
+        )
+        
+        with self._usage_lock:
+            totals = self.usage_stats.setdefault(kind, {'calls': 0, **{k: 0 for k in counts}})
+            totals['calls'] += 1
+            for k, v in counts.items():
+                totals[k] += v
+    
+    def get_usage_stats(self):
+        """Get a copy of the running token usage totals per call type"""
+        with self._usage_lock:
+            return {kind: dict(totals) for kind, totals in self.usage_stats.items()}
+    
+    def generate_outreach_sequence(self, job_title, company_name, details=None, user_id=None, priority=STANDARD,
+                                   model=None, on_step=None):
         """
         Generate a complete outreach sequence for a recruiting scenario
         
@@ -167,89 +530,100 @@ class AnthropicAI:
             job_title (str): The job title for the role
             company_name (str): The company name
             details (str, optional): Additional details about the role and requirements
+            user_id (int, optional): The user the call is for, for per-user admission limits
+            priority (int): Admission priority; batch generation passes BULK
+            model (str, optional): Route name or model id to use instead of the routing rules
+            on_step (callable, optional): Called as on_step(index, step) as soon as each step has streamed in
         
         Returns:
             list: A list of sequence steps with type and content
+        
+        Raises:
+            AIServiceError: If the call failed or was shed, or its reply was not a JSON list of steps
         """
-        try:
-            prompt = f"""
-            Create a recruiting outreach sequence for a {job_title} role at {company_name}.
-            
-            Additional details:
-            {details if details else 'No additional details provided.'}
-            
-            Please provide a complete sequence with:
-            1. Initial outreach email
-            2. Follow-up message
-            3. Final connection attempt
-            
-            For each step, include the appropriate type (email, message, call) and content.
-            Format the response as a valid JSON array with 'type' and 'content' fields for each step.
-            Format your ENTIRE response as valid JSON:
-
-            ```json
-            [
-                {{
-                    "type": "email",
-                    "content": "Subject: Opportunity at Company\\n\\nHi {{name}},\\n\\n[Email content]"
-                }},
-                {{
-                    "type": "message",
-                    "content": "Follow-up content here"
-                }},
-                {{
-                    "type": "call",
-                    "content": "Final call script here"
-                }}
-            ]
-            ```
-
-            Do not include any explanations or text outside of the JSON structure. The entire response must be valid JSON that can be parsed with json.loads().
-            """
-            
-            # Call the Anthropic API
-            response = self.client.messages.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                system=self.system_prompt,
-                max_tokens=2000,
-                temperature=0.7
-            )
-            
-            # Extract and parse the JSON response
-            import json
-            import re
-            
-            # Extract JSON content
-            assistant_response = response.content[0].text
-            
-            # Try to extract JSON array
-            json_str = assistant_response
-            
-            # Look for JSON code blocks
-            match = re.search(r'```(?:json)?\s*(\[[\s\S]*?\])\s*```', assistant_response)
-            if match:
-                json_str = match.group(1)
-            else:
-                # Try to find array directly
-                match = re.search(r'(\[[\s\S]*?\])', assistant_response)
-                if match:
-                    json_str = match.group(1)
-                    
-            logger.debug(f"Extracted JSON string: {json_str}")
-            
-            # Clean up the string - remove any comments
-            json_str = re.sub(r'//.*?\n', '\n', json_str)
+        prompt = self.sequence_prompt.format(
+            job_title=job_title,
+            company_name=company_name,
+            details=details if details else 'No additional details provided.'
+        )
+        
+        route = self.router.route('sequence', override=model)
+        start = time.monotonic()
+        deadline = start + self.sequence_timeout
+        first_step_at = None
+        
+        def attempt(client, timeout):
+            nonlocal first_step_at
+            parser = ArrayItemStream('steps')
+            usage = None
+            stop_reason = None
+            try:
+                # Raw events, so the tool input is scanned once as it arrives rather than reparsed on every delta
+                with client.messages.create(
+                    model=route.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    system=self.system_blocks,
+                    tools=[SEQUENCE_TOOL],
+                    tool_choice={"type": "tool", "name": SEQUENCE_TOOL["name"]},
+                    max_tokens=2000,
+                    extra_body=CHAT_SAMPLING,
+                    stream=True,
+                    timeout=timeout
+                ) as stream:
+                    for event in stream:
+                        if event.type == 'message_start':
+                            usage = event.message.usage
+                        elif event.type == 'content_block_delta' and event.delta.type == 'input_json_delta':
+                            emitted = len(parser.items)
+                            for index, step in enumerate(parser.feed(event.delta.partial_json), emitted):
+                                if first_step_at is None:
+                                    first_step_at = time.monotonic()
+                                if on_step:
+                                    on_step(index, step)
+                        elif event.type == 'message_delta':
+                            stop_reason = event.delta.stop_reason
+                            if usage is not None and event.usage is not None:
+                                usage.output_tokens = event.usage.output_tokens
+                        if time.monotonic() > deadline:
+                            raise AIServiceError('timeout', 'The sequence did not finish in time', retryable=True)
             
-            # Parse JSON
-            sequence_steps = json.loads(json_str)
-            return sequence_steps
+            except Exception as e:
+                if not (on_step and parser.items):
+                    raise
+                # Steps were already shown, so the call cannot be retried
+                error = classify(e)
+                error.partial = json.dumps(parser.items)
+                if error is e:
+                    raise
+                raise error from e
             
-        except Exception as e:
-            logger.error(f"Error generating outreach sequence: {str(e)}")
-            return None
+            return parser, usage, stop_reason
+        
+        with admission.admit(user_id, priority):
+            parser, usage, stop_reason = self.resilient.call(attempt, timeout=self.sequence_timeout)
+        
+        total_ms = (time.monotonic() - start) * 1000
+        first_step_ms = (first_step_at - start) * 1000 if first_step_at else None
+        if usage is not None:
+            self._record_usage('sequence', usage)
+            self.router.record(route, total_ms, usage, first_token_ms=first_step_ms)
+        logger.info(
+            f"Sequence generated via {route.name} in {total_ms:.0f}ms"
+            + (f", first step after {first_step_ms:.0f}ms" if first_step_ms is not None else '')
+        )
+        
+        try:
+            sequence = parser.close()
+        except ValueError as e:
+            reason = 'was cut off at the token limit' if stop_reason == 'max_tokens' else f'was not valid JSON: {e}'
+            raise AIServiceError('bad_response', f"Generated sequence {reason}")
+        
+        steps = sequence.get('steps') if isinstance(sequence, dict) else None
+        if not isinstance(steps, list) or not all(
+            isinstance(step, dict) and isinstance(step.get('content'), str) for step in steps
+        ):
+            raise AIServiceError('bad_response', 'Generated sequence was not a list of steps')
+        return steps
 
 # Create a singleton instance
 ai_service = AnthropicAI()
\ No newline at end of file
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models.generation_cache import GenerationCache
+from app.services.admission import STANDARD
+from app.services.ai import ai_service, SEQUENCE_PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(value):
+    """Normalize free text so trivially different requests share a cache entry"""
+    return re.sub(r'\s+', ' ', (value or '').strip().lower())
+
+
+class SequenceCache:
+    """Two-tier cache for generated outreach sequences: an in-process LRU in front of a DB table"""
+
+    def __init__(self):
+        self._memory = OrderedDict()  # key -> (stored_at, steps)
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'db_hits': 0,
+            'misses': 0,
+            'bypasses': 0,
+            'evictions': 0
+        }
+
+    def make_key(self, job_title, company_name, details=None, model=None, prompt_version=SEQUENCE_PROMPT_VERSION):
+        """Build the cache key for a normalized generation request"""
+        parts = [
+            normalize_text(job_title),
+            normalize_text(company_name),
+            normalize_text(details),
+            model or ai_service.router.route('sequence').model,
+            str(prompt_version)
+        ]
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Look up cached steps, checking memory first and then the database
+
+        Returns:
+            list: The cached steps, or None on a miss
+        """
+        ttl = current_app.config['SEQUENCE_CACHE_TTL']
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[0] < ttl:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return entry[1]
+            if entry:
+                del self._memory[key]
+
+        row = db.session.get(GenerationCache, key)
+        if row and row.created_at > datetime.utcnow() - timedelta(seconds=ttl):
+            steps = json.loads(row.payload)
+            stored_at = now - (datetime.utcnow() - row.created_at).total_seconds()
+            self._remember(key, steps, stored_at)
+            with self._lock:
+                self._stats['db_hits'] += 1
+            return steps
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, key, steps, job_title, company_name, model=None):
+        """Store generated steps in both tiers and evict expired or excess rows"""
+        self._remember(key, steps, time.time())
+
+        row = GenerationCache(
+            key=key,
+            job_title=job_title,
+            company_name=company_name,
+            model=model or ai_service.router.route('sequence').model,
+            prompt_version=SEQUENCE_PROMPT_VERSION,
+            payload=json.dumps(steps),
+            created_at=datetime.utcnow()
+        )
+        db.session.merge(row)
+        self._evict_rows()
+        db.session.commit()
+
+    def get_or_generate(self, job_title, company_name, details=None, bypass=False, user_id=None, priority=STANDARD,
+                        model=None, on_step=None):
+        """
+        Return sequence steps for a request, generating them only on a cache miss
+
+        Args:
+            bypass (bool): Skip the lookup and regenerate (the fresh result is still stored)
+            user_id (int, optional): The requesting user, for AI admission limits on a miss
+            priority (int): AI admission priority on a miss (see app.services.admission)
+            model (str, optional): Route name or model id overriding the routing rules; it is part of the key
+            on_step (callable, optional): Called with each step as it streams in on a miss (see generate_outreach_sequence)
+
+        Returns:
+            tuple: (steps or None, cache status 'HIT', 'MISS' or 'BYPASS')
+        """
+        # Generations from different models are cached separately
+        model_id = ai_service.router.route('sequence', override=model).model
+        key = self.make_key(job_title, company_name, details, model=model_id)
+
+        if bypass:
+            with self._lock:
+                self._stats['bypasses'] += 1
+            status = 'BYPASS'
+        else:
+            steps = self.get(key)
+            if steps is not None:
+                return steps, 'HIT'
+            status = 'MISS'
+
+        steps = ai_service.generate_outreach_sequence(
+            job_title, company_name, details, user_id=user_id, priority=priority, model=model_id,
+            on_step=on_step
+        )
+        if steps:
+            try:
+                self.put(key, steps, job_title, company_name, model=model_id)
+            except Exception as e:
+                logger.error(f"Error storing generated sequence in cache: {str(e)}")
+                db.session.rollback()
+
+        return steps, status
+
+    def stats(self):
+        """Get hit/miss counters and the current in-memory size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['db_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key, steps, stored_at):
+        max_entries = current_app.config['SEQUENCE_CACHE_MEMORY_SIZE']
+        with self._lock:
+            self._memory[key] = (stored_at, steps)
+            self._memory.move_to_end(key)
+            while len(self._memory) > max_entries:
+                self._memory.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def _evict_rows(self):
+        """Delete expired rows and trim the table to its size limit, oldest first"""
+        ttl = current_app.config['SEQUENCE_CACHE_TTL']
+        max_rows = current_app.config['SEQUENCE_CACHE_MAX_ENTRIES']
+
+        expired = GenerationCache.query.filter(
+            GenerationCache.created_at < datetime.utcnow() - timedelta(seconds=ttl)
+        ).delete(synchronize_session=False)
+
+        db.session.flush()
+        excess = GenerationCache.query.count() - max_rows
+        trimmed = 0
+        if excess > 0:
+            oldest = db.session.query(GenerationCache.key) \
+                .order_by(GenerationCache.created_at) \
+                .limit(excess) \
+                .subquery()
+            trimmed = GenerationCache.query.filter(
+                GenerationCache.key.in_(db.select(oldest.c.key))
+            ).delete(synchronize_session=False)
+
+        if expired or trimmed:
+            with self._lock:
+                self._stats['evictions'] += expired + trimmed
+
+
+# Create a singleton instance
+sequence_cache = SequenceCache()
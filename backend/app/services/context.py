@@ -0,0 +1,191 @@
+"""
+Chat history context for the assistant
+
+Each turn sends as much recent history as fits in CHAT_CONTEXT_TOKEN_BUDGET,
+filled newest first. Older turns are not dropped. They are folded into a
+persisted per-user conversation summary, which goes to the model as an extra
+system block and counts against the same budget.
+
+Folding runs as a background job after the reply is saved. It goes back far
+enough to free half the budget (or half of CHAT_CONTEXT_MAX_MESSAGES, when the
+message count is what overflows), so the summary is rewritten once every few
+turns rather than on every turn. Token counts are estimated once per message
+and stored on the row.
+"""
+import logging
+import threading
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models.conversation_summary import ConversationSummary
+from app.models.message import Message
+from app.services.ai import ai_service
+from app.services.jobs import job_runner, JobQueueFull
+from app.utils.helpers import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Per-message framing (role, separators) on top of the content's own tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Most history sent to the model in one summarization call
+SUMMARY_INPUT_TOKENS = 8000
+
+# Users whose summary is being rewritten in this process
+_folding = set()
+_folding_lock = threading.Lock()
+
+
+def message_tokens(message):
+    """Get a message's token cost, estimating and storing it if the row predates token counts"""
+    if message.token_count is None:
+        message.token_count = estimate_tokens(message.content)
+    return message.token_count + MESSAGE_OVERHEAD_TOKENS
+
+
+def build_chat_context(user_id, exclude_message_id=None):
+    """
+    Select the summary and recent history to send with a user's next message
+
+    Args:
+        user_id (int): The current user ID
+        exclude_message_id (int, optional): The message being answered, which is sent separately
+
+    Returns:
+        tuple: (summary text or None, history as dicts with 'role' and 'content' oldest first,
+                id of the newest message that should be folded into the summary, or None)
+    """
+    config = current_app.config
+    budget = config['CHAT_CONTEXT_TOKEN_BUDGET']
+    max_messages = config['CHAT_CONTEXT_MAX_MESSAGES']
+
+    summary = ConversationSummary.query.filter_by(user_id=user_id).first()
+    covered_through_id = summary.covered_through_id if summary else 0
+    if summary and summary.content:
+        budget -= summary.token_count
+
+    # One row past the limit shows whether there is unsummarized history left over
+    messages = Message.query \
+        .filter(Message.user_id == user_id, Message.id > covered_through_id) \
+        .order_by(Message.timestamp.desc(), Message.id.desc()) \
+        .limit(max_messages + 2) \
+        .all()
+
+    selected = []
+    used = 0
+    fold_candidate_id = None
+    overflow = False
+
+    for message in messages:
+        if message.id == exclude_message_id:
+            continue
+        cost = message_tokens(message)
+
+        # Folding stops at the newest message past half the budget or half the message cap, so a
+        # history that overflows by message count is folded too, not just dropped from the prompt
+        if fold_candidate_id is None and (used + cost > budget // 2 or len(selected) >= max_messages // 2):
+            fold_candidate_id = message.id
+
+        if len(selected) >= max_messages or used + cost > budget:
+            overflow = True
+            break
+        selected.append(message)
+        used += cost
+
+    selected.reverse()
+
+    # The model expects the conversation to open with a user turn
+    while selected and selected[0].role != 'user':
+        selected.pop(0)
+
+    # Persist any token counts filled in above
+    if db.session.dirty:
+        db.session.commit()
+
+    history = [{'role': message.role, 'content': message.content} for message in selected]
+    fold_through_id = fold_candidate_id if overflow else None
+    return (summary.content if summary and summary.content else None), history, fold_through_id
+
+
+def schedule_fold(user_id, through_id):
+    """Fold a user's older messages into their summary in the background, unless one is already queued"""
+    if through_id is None:
+        return
+    try:
+        job_runner.submit('chat_summary', fold_history, user_id, through_id)
+    except JobQueueFull:
+        # The next turn will ask again
+        logger.warning(f"Skipped conversation summary for user {user_id}: job queue is full")
+
+
+def fold_history(user_id, through_id):
+    """
+    Fold a user's messages up to through_id into their conversation summary
+
+    Long stretches of history are summarized in chunks of about
+    SUMMARY_INPUT_TOKENS, each one folded into the result of the last.
+
+    Returns:
+        bool: Whether the summary was updated
+    """
+    with _folding_lock:
+        if user_id in _folding:
+            return False
+        _folding.add(user_id)
+
+    try:
+        summary = ConversationSummary.query.filter_by(user_id=user_id).first()
+        covered_through_id = summary.covered_through_id if summary else 0
+        content = summary.content if summary else ''
+        if covered_through_id >= through_id:
+            return False
+
+        while covered_through_id < through_id:
+            messages = Message.query \
+                .filter(
+                    Message.user_id == user_id,
+                    Message.id > covered_through_id,
+                    Message.id <= through_id
+                ) \
+                .order_by(Message.timestamp, Message.id) \
+                .limit(200) \
+                .all()
+
+            chunk = []
+            tokens = 0
+            for message in messages:
+                tokens += message_tokens(message)
+                if chunk and tokens > SUMMARY_INPUT_TOKENS:
+                    break
+                chunk.append(message)
+            if not chunk:
+                break
+
+            content = ai_service.summarize_conversation(
+                content,
+                [{'role': message.role, 'content': message.content} for message in chunk],
+                max_tokens=current_app.config['CHAT_SUMMARY_MAX_TOKENS'],
+                user_id=user_id
+            )
+            covered_through_id = chunk[-1].id
+
+        if summary is None:
+            summary = ConversationSummary(user_id=user_id)
+            db.session.add(summary)
+        summary.content = content
+        summary.covered_through_id = covered_through_id
+        summary.token_count = estimate_tokens(content)
+        summary.updated_at = datetime.utcnow()
+        db.session.commit()
+
+        logger.info(f"Folded chat history for user {user_id} through message {covered_through_id}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error summarizing chat history for user {user_id}: {str(e)}")
+        db.session.rollback()
+        return False
+
+    finally:
+        with _folding_lock:
+            _folding.discard(user_id)
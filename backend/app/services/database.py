@@ -2,6 +2,7 @@ from app import db
 from app.models.user import User
 from app.models.sequence import Sequence, SequenceStep
 from app.models.message import Message
+from app.models.conversation_summary import ConversationSummary
 
 def init_db():
     """Initialize the database with default data"""
@@ -22,5 +23,6 @@ def clear_db():
     SequenceStep.query.delete()
     Sequence.query.delete()
     Message.query.delete()
+    ConversationSummary.query.delete()
     User.query.delete()
     db.session.commit()
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when the worker pool has no room for another job"""
+
+
+class JobRunner:
+    """Bounded background worker pool for work that should not hold a request thread"""
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def _ensure_started(self, app):
+        """Create the pool on first use, sized from the app config"""
+        with self._lock:
+            if self._executor is None:
+                pool_size = app.config['JOB_WORKER_POOL_SIZE']
+                queue_depth = app.config['JOB_QUEUE_DEPTH']
+                self._executor = ThreadPoolExecutor(
+                    max_workers=pool_size,
+                    thread_name_prefix='helix-job'
+                )
+                # Running plus waiting jobs may never exceed this many
+                self._slots = threading.BoundedSemaphore(pool_size + queue_depth)
+                logger.info(f"Started job pool with {pool_size} workers and queue depth {queue_depth}")
+
+    def submit(self, kind, func, *args, **kwargs):
+        """
+        Queue a function to run in the background inside an app context
+
+        Args:
+            kind (str): Short label for the job type, e.g. 'chat_reply'
+            func (callable): The work to run; its return value becomes the job result
+
+        Returns:
+            str: The job id
+
+        Raises:
+            JobQueueFull: If the pool and its queue are both full
+        """
+        app = current_app._get_current_object()
+        self._ensure_started(app)
+
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull('Too many background jobs are queued')
+
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune(app.config['JOB_RESULT_TTL'])
+            self._jobs[job_id] = {
+                'id': job_id,
+                'kind': kind,
+                'status': 'queued',
+                'result': None,
+                'error': None,
+                'created_at': time.time(),
+                'finished_at': None
+            }
+
+        try:
+            self._executor.submit(self._run, app, job_id, func, args, kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+
+        return job_id
+
+    def get(self, job_id):
+        """Get a copy of a job's state, or None if it is unknown or expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _run(self, app, job_id, func, args, kwargs):
+        self._update(job_id, status='running')
+        try:
+            with app.app_context():
+                result = func(*args, **kwargs)
+            self._update(job_id, status='completed', result=result, finished_at=time.time())
+        except Exception as e:
+            logger.error(f"Background job {job_id} failed: {str(e)}")
+            self._update(job_id, status='failed', error=str(e), finished_at=time.time())
+        finally:
+            self._slots.release()
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _prune(self, ttl):
+        """Forget finished jobs older than the result TTL (caller holds the lock)"""
+        cutoff = time.time() - ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] and job['finished_at'] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+# Create a singleton instance
+job_runner = JobRunner()
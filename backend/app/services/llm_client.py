@@ -0,0 +1,357 @@
+"""
+Resilient calls to the AI provider
+
+Every Anthropic call goes through `ResilientClient.call`, which gives it:
+
+- A deadline for the whole call, retries included. Each attempt's HTTP
+  timeout is whatever time the deadline has left, and connecting is capped
+  separately, so an unreachable provider fails in seconds.
+- Bounded retries with full jitter on errors that may succeed on a second
+  try: timeouts, dropped connections, 429, 5xx and 529 overloaded. A
+  Retry-After from the provider is honoured when the deadline allows it.
+- A circuit breaker. After `failure_threshold` retryable failures in a row
+  it fails calls immediately for `reset_timeout` seconds. It then lets one
+  probe call through. It closes again once the provider answers a probe, even
+  with a client error. A probe that fails locally (e.g. in a callback) lets the
+  next call probe instead.
+
+Failures are raised as `AIServiceError`, whose `kind` says what went wrong.
+Callers decide what the user sees, and error text never becomes a reply.
+"""
+import logging
+import math
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# HTTP status a route should answer with when an AI call fails with each kind of error
+ERROR_STATUS = {
+    'timeout': 504,
+    'connection': 503,
+    'rate_limited': 503,
+    'overloaded': 503,
+    'server_error': 503,
+    'circuit_open': 503,
+    'throttled': 429,
+    'auth': 502,
+    'bad_request': 502,
+    'bad_response': 502,
+    'not_configured': 502,
+    'error': 500,
+}
+
+# What the user is told for each kind of error
+USER_MESSAGES = {
+    'timeout': "The assistant took too long to respond. Please try again.",
+    'rate_limited': "The assistant is handling too many requests right now. Please try again in a moment.",
+    'overloaded': "The assistant is overloaded right now. Please try again in a moment.",
+    'circuit_open': "The assistant is temporarily unavailable. Please try again in a moment.",
+    'throttled': "Too many requests are waiting for the assistant. Please try again shortly.",
+}
+DEFAULT_USER_MESSAGE = "The assistant could not respond to your message. Please try again."
+
+
+class AIServiceError(Exception):
+    """
+    A failed call to the AI provider
+
+    Attributes:
+        kind (str): What went wrong, one of the keys of ERROR_STATUS
+        retryable (bool): Whether the same call may succeed if repeated
+        status_code (int): The provider's HTTP status, if it answered
+        retry_after (float): Seconds the caller should wait before trying again, if known
+        partial (str): Text already streamed to the user before the failure, if any
+    """
+
+    def __init__(self, kind, message, retryable=False, status_code=None, retry_after=None, partial=None):
+        super().__init__(message)
+        self.kind = kind
+        self.retryable = retryable
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.partial = partial
+
+    @property
+    def http_status(self):
+        return ERROR_STATUS.get(self.kind, 500)
+
+    @property
+    def user_message(self):
+        return USER_MESSAGES.get(self.kind, DEFAULT_USER_MESSAGE)
+
+    def response_headers(self):
+        """HTTP headers for an error response: Retry-After, when it is known"""
+        if self.retry_after is None:
+            return {}
+        return {'Retry-After': str(math.ceil(self.retry_after))}
+
+    def to_dict(self):
+        """The error as an API or Socket.IO payload"""
+        data = {'error': self.kind, 'message': self.user_message}
+        if self.retry_after is not None:
+            data['retry_after'] = round(self.retry_after, 1)
+        return data
+
+
+def classify(error):
+    """Convert an exception raised by an Anthropic call into an AIServiceError"""
+    if isinstance(error, AIServiceError):
+        return error
+
+    # The SDK is already imported by the time one of its calls has failed
+    from anthropic import APIConnectionError, APIStatusError, APITimeoutError
+
+    if isinstance(error, APITimeoutError):
+        return AIServiceError('timeout', 'The AI provider did not respond in time', retryable=True)
+    if isinstance(error, APIConnectionError):
+        return AIServiceError('connection', f"Could not reach the AI provider: {error}", retryable=True)
+    if isinstance(error, APIStatusError):
+        status = error.status_code
+        retry_after = _retry_after(error.response)
+        if status == 429:
+            kind, retryable = 'rate_limited', True
+        elif status == 529:
+            kind, retryable = 'overloaded', True
+        elif status >= 500:
+            kind, retryable = 'server_error', True
+        elif status in (401, 403):
+            kind, retryable = 'auth', False
+        else:
+            kind, retryable = 'bad_request', False
+        return AIServiceError(
+            kind,
+            f"AI provider returned {status}: {error.message}",
+            retryable=retryable,
+            status_code=status,
+            retry_after=retry_after
+        )
+    if isinstance(error, ValueError) and 'ANTHROPIC_API_KEY' in str(error):
+        return AIServiceError('not_configured', str(error))
+    return AIServiceError('error', f"AI call failed: {error}")
+
+
+def _retry_after(response):
+    try:
+        return max(0.0, float(response.headers.get('retry-after')))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Fails calls fast after repeated provider failures, then lets one probe through after a cool-down"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._times_opened = 0
+        self._rejected = 0
+
+    def before_call(self):
+        """
+        Check whether a call may go to the provider now
+
+        Raises:
+            AIServiceError: With kind 'circuit_open' while the circuit is open
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+
+            if self._state == self.OPEN:
+                remaining = self._opened_at + self.reset_timeout - self._clock()
+                if remaining > 0:
+                    self._rejected += 1
+                    raise AIServiceError(
+                        'circuit_open',
+                        'AI provider calls are paused after repeated failures',
+                        retry_after=remaining
+                    )
+                self._state = self.HALF_OPEN
+
+            # Half open: one probe at a time decides whether to close again
+            if self._probing:
+                self._rejected += 1
+                raise AIServiceError(
+                    'circuit_open',
+                    'AI provider calls are paused while a probe call is in flight',
+                    retry_after=1.0
+                )
+            self._probing = True
+
+    def record_success(self):
+        """The provider answered (even with a client error), so it is not degraded"""
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self._state = self.CLOSED
+
+    def release_probe(self):
+        """The call failed before the provider answered it, so it says nothing about the provider's health"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        """The provider failed in a way that suggests it is degraded"""
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._times_opened += 1
+                    logger.warning(f"AI circuit breaker opened after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'times_opened': self._times_opened,
+                'rejected_calls': self._rejected
+            }
+
+
+class ResilientClient:
+    """
+    Runs Anthropic calls under a deadline, with jittered retries and a circuit breaker
+
+    Args:
+        client_factory (callable): Returns the Anthropic client (called on each attempt, so it may be lazy)
+        timeout (float): Default deadline in seconds for a call, retries included
+        connect_timeout (float): Longest wait for a connection on any attempt
+        max_attempts (int): Attempts per call, the first one included
+        base_delay (float): Backoff ceiling in seconds after the first failure; it doubles after each one
+        max_delay (float): Largest backoff ceiling in seconds
+        breaker (CircuitBreaker, optional): Shared breaker; a default one is created if not given
+    """
+
+    def __init__(self, client_factory, timeout=60.0, connect_timeout=5.0, max_attempts=3,
+                 base_delay=0.5, max_delay=8.0, breaker=None, sleep=time.sleep, clock=time.monotonic):
+        self.client_factory = client_factory
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker(clock=clock)
+        self._sleep = sleep
+        self._clock = clock
+        self._stats_lock = threading.Lock()
+        self._stats = {'calls': 0, 'retries': 0, 'failures': {}}
+
+    def call(self, operation, timeout=None):
+        """
+        Run an Anthropic call, retrying it while its deadline allows
+
+        Args:
+            operation (callable): Called as operation(client, request_timeout) to make one attempt
+            timeout (float, optional): Deadline in seconds for the whole call (defaults to `self.timeout`)
+
+        Returns:
+            The operation's result
+
+        Raises:
+            AIServiceError: If the call failed, timed out or was refused by the circuit breaker
+        """
+        from anthropic import Timeout
+
+        deadline = self._clock() + (timeout or self.timeout)
+        attempt = 0
+        with self._stats_lock:
+            self._stats['calls'] += 1
+
+        while True:
+            attempt += 1
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                error = AIServiceError('timeout', 'The AI call ran out of time before it could be sent')
+                self._count_failure(error)
+                raise error
+
+            try:
+                self.breaker.before_call()
+            except AIServiceError as e:
+                self._count_failure(e)
+                raise
+
+            try:
+                result = operation(
+                    self.client_factory(),
+                    Timeout(remaining, connect=min(remaining, self.connect_timeout))
+                )
+            except Exception as e:
+                error = classify(e)
+                if error.retryable:
+                    self.breaker.record_failure()
+                elif error.status_code is not None:
+                    # A client error is still an answer from the provider
+                    self.breaker.record_success()
+                else:
+                    # A local failure, e.g. in a callback, leaves the breaker as it was
+                    self.breaker.release_probe()
+
+                delay = self._backoff(attempt, error.retry_after)
+                can_retry = (
+                    error.retryable
+                    and error.partial is None  # Text was already shown, so the call cannot be repeated
+                    and attempt < self.max_attempts
+                    and self._clock() + delay < deadline
+                )
+                if not can_retry:
+                    self._count_failure(error)
+                    if error is e:
+                        raise
+                    raise error from e
+
+                logger.warning(
+                    f"AI call attempt {attempt} failed ({error.kind}: {str(error)}), retrying in {delay:.2f}s"
+                )
+                with self._stats_lock:
+                    self._stats['retries'] += 1
+                self._sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    def _backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, never shorter than the provider's Retry-After"""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _count_failure(self, error):
+        with self._stats_lock:
+            failures = self._stats['failures']
+            failures[error.kind] = failures.get(error.kind, 0) + 1
+
+    def stats(self):
+        """Call, retry and failure counters, and the circuit breaker's state"""
+        with self._stats_lock:
+            stats = {
+                'calls': self._stats['calls'],
+                'retries': self._stats['retries'],
+                'failures': dict(self._stats['failures'])
+            }
+        stats['circuit'] = self.breaker.stats()
+        return stats
@@ -0,0 +1,83 @@
+"""
+Saving AI-generated sequences
+
+Generated sequences arrive complete: a title and an ordered list of steps.
+They are written with bulk INSERT ... RETURNING statements, one for all the
+sequences and one for all their steps, instead of flushing ORM objects one at
+a time. The ids come back from the inserts, so the response and realtime
+payloads are built from the inserted values without reading anything back.
+
+Nothing here commits; callers commit once for the whole unit of work.
+"""
+from datetime import datetime
+from sqlalchemy import insert
+from app import db
+from app.models.sequence import Sequence, SequenceStep
+
+
+def materialize_sequences(user_id, drafts):
+    """
+    Insert several sequences and all their steps
+
+    Args:
+        user_id (int): Owner of the new sequences
+        drafts (list): (title, steps) pairs, where steps is an ordered list of
+            dicts with 'content' and optionally 'type'; steps are numbered 1..n
+
+    Returns:
+        list: One payload per draft, in the same shape as `Sequence.to_dict()`
+    """
+    if not drafts:
+        return []
+
+    # Ordered RETURNING maps each id back to its draft; databases that cannot
+    # guarantee the order (SQLite) get one statement per sequence instead
+    created_at = datetime.utcnow()
+    sequence_ids = db.session.scalars(
+        insert(Sequence).returning(Sequence.id, sort_by_parameter_order=True),
+        [
+            {'user_id': user_id, 'title': title, 'created_at': created_at, 'version': 1}
+            for title, _ in drafts
+        ]
+    ).all()
+
+    step_rows = [
+        [
+            {
+                'sequence_id': sequence_id,
+                'step_number': i,
+                'content': step.get('content', ''),
+                'type': step.get('type') or 'email'
+            }
+            for i, step in enumerate(steps, 1)
+        ]
+        for sequence_id, (_, steps) in zip(sequence_ids, drafts)
+    ]
+    all_rows = [row for rows in step_rows for row in rows]
+
+    # Steps are matched to their ids by (sequence_id, step_number), which is unique,
+    # so the insert does not need ordered RETURNING and is batched on every database
+    step_ids = {}
+    if all_rows:
+        returned = db.session.execute(
+            insert(SequenceStep).returning(SequenceStep.id, SequenceStep.sequence_id, SequenceStep.step_number),
+            all_rows
+        )
+        step_ids = {(sequence_id, step_number): step_id for step_id, sequence_id, step_number in returned}
+
+    return [
+        {
+            'id': sequence_id,
+            'user_id': user_id,
+            'title': title,
+            'created_at': created_at.isoformat(),
+            'version': 1,
+            'steps': [{'id': step_ids[row['sequence_id'], row['step_number']], **row} for row in rows]
+        }
+        for sequence_id, (title, _), rows in zip(sequence_ids, drafts, step_rows)
+    ]
+
+
+def materialize_sequence(user_id, title, steps):
+    """Insert one sequence and its steps, returning its payload (see `materialize_sequences`)"""
+    return materialize_sequences(user_id, [(title, steps)])[0]
@@ -0,0 +1,243 @@
+"""
+Message queue backends for Socket.IO
+
+With more than one backend worker, an emit made in one process has to reach
+clients connected to the others. Socket.IO handles this with a pub/sub client
+manager: every emit is published to a shared channel and each worker delivers
+it to its own clients. `SOCKETIO_MESSAGE_QUEUE` selects the channel:
+
+- empty: no queue, a single worker only
+- `local://host:port`: the `MessageBroker` below, a small TCP fan-out server
+  that needs no external service (started by `run.py --workers N`, or by tests)
+- anything else (`redis://`, `amqp://`, `kafka://`, ...): handed to
+  Flask-SocketIO, which picks the matching python-socketio manager
+"""
+import logging
+import socket
+import struct
+import threading
+import time
+from urllib.parse import urlsplit
+import socketio
+
+logger = logging.getLogger(__name__)
+
+LOCAL_SCHEME = 'local'
+
+# Every frame is a 4-byte big-endian length followed by a JSON payload
+_HEADER = struct.Struct('>I')
+
+# Sent once by a client right after connecting
+ROLE_PUBLISHER = b'P'
+ROLE_SUBSCRIBER = b'S'
+
+RECONNECT_DELAY = 1  # seconds
+
+
+def socketio_queue_options(url):
+    """
+    Get the keyword arguments that attach `socketio` to a message queue
+
+    Args:
+        url (str): The SOCKETIO_MESSAGE_QUEUE setting, may be empty
+
+    Returns:
+        dict: Options for `socketio.init_app`
+    """
+    if not url:
+        return {}
+    if urlsplit(url).scheme == LOCAL_SCHEME:
+        return {'client_manager': LocalSocketManager(url)}
+    return {'message_queue': url}
+
+
+def parse_local_url(url):
+    """Get the (host, port) a local:// queue URL points to"""
+    parts = urlsplit(url)
+    if parts.scheme != LOCAL_SCHEME or not parts.port:
+        raise ValueError(f"Expected a local://host:port URL, got {url!r}")
+    return parts.hostname or '127.0.0.1', parts.port
+
+
+def send_frame(sock, payload):
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def recv_frame(sock):
+    """Read one frame, or return None once the peer has closed the connection"""
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    return _recv_exactly(sock, _HEADER.unpack(header)[0])
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _shutdown(sock):
+    """Close a socket, waking up any thread blocked on it"""
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    sock.close()
+
+
+class LocalSocketManager(socketio.PubSubManager):
+    """
+    Socket.IO client manager that shares emits through a `MessageBroker`
+
+    Publishing and listening use separate connections, so a blocked listener
+    never holds up an emit. Both reconnect on their own if the broker restarts;
+    messages published while it is down are dropped, as with Redis pub/sub.
+    """
+    name = 'local'
+
+    def __init__(self, url, channel='socketio', write_only=False, logger=None, json=None):
+        self.address = parse_local_url(url)
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+
+    def _connect(self, role):
+        sock = socket.create_connection(self.address)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.sendall(role)
+        return sock
+
+    def _publish(self, data):
+        payload = self.json.dumps(data).encode('utf-8')
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = self._connect(ROLE_PUBLISHER)
+                    send_frame(self._publisher, payload)
+                    return
+                except OSError as e:
+                    self._close_publisher()
+                    if attempt:
+                        self._get_logger().error(f"Could not publish to Socket.IO message broker: {str(e)}")
+
+    def _close_publisher(self):
+        if self._publisher is not None:
+            try:
+                self._publisher.close()
+            except OSError:
+                pass
+            self._publisher = None
+
+    def _listen(self):
+        while True:
+            try:
+                sock = self._connect(ROLE_SUBSCRIBER)
+            except OSError as e:
+                self._get_logger().warning(f"Socket.IO message broker unavailable: {str(e)}")
+                time.sleep(RECONNECT_DELAY)
+                continue
+
+            try:
+                while True:
+                    frame = recv_frame(sock)
+                    if frame is None:
+                        break
+                    yield frame.decode('utf-8')
+            except OSError as e:
+                self._get_logger().warning(f"Lost connection to Socket.IO message broker: {str(e)}")
+            finally:
+                sock.close()
+            time.sleep(RECONNECT_DELAY)
+
+
+class MessageBroker:
+    """
+    Fan-out server behind `LocalSocketManager`
+
+    Every frame received from a publisher is forwarded unchanged to every
+    connected subscriber. Frames are not inspected, stored or acknowledged.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self._server = socket.create_server((host, port))
+        self.host, self.port = self._server.getsockname()[:2]
+        self._connections = set()
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        # Held while writing a frame, so frames from concurrent publishers never interleave
+        self._send_lock = threading.Lock()
+        self._thread = None
+        self._closed = threading.Event()
+
+    @property
+    def url(self):
+        return f"{LOCAL_SCHEME}://{self.host}:{self.port}"
+
+    def start(self):
+        """Serve in a daemon thread and return immediately"""
+        self._thread = threading.Thread(target=self.serve_forever, name='socketio-broker', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        logger.info(f"Socket.IO message broker listening on {self.host}:{self.port}")
+        while not self._closed.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def stop(self):
+        self._closed.set()
+        _shutdown(self._server)
+        with self._lock:
+            connections = list(self._connections)
+            self._subscribers.clear()
+        for conn in connections:
+            _shutdown(conn)
+
+    def _handle(self, conn):
+        with self._lock:
+            self._connections.add(conn)
+        try:
+            role = conn.recv(1)
+            if role == ROLE_SUBSCRIBER:
+                with self._lock:
+                    self._subscribers.add(conn)
+                # Subscribers never send anything; wait here until they disconnect
+                while conn.recv(1):
+                    pass
+            elif role == ROLE_PUBLISHER:
+                while True:
+                    frame = recv_frame(conn)
+                    if frame is None:
+                        break
+                    self._broadcast(frame)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._connections.discard(conn)
+                self._subscribers.discard(conn)
+            conn.close()
+
+    def _broadcast(self, payload):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        with self._send_lock:
+            for conn in subscribers:
+                try:
+                    send_frame(conn, payload)
+                except OSError:
+                    with self._lock:
+                        self._subscribers.discard(conn)
+                    conn.close()
@@ -0,0 +1,216 @@
+"""
+Model routing for AI calls
+
+Each call is classified by kind, and a rule maps every kind to a route. A
+route is a named model, either 'fast' or 'full'. The kinds are:
+
+- clarify: a chat turn that asks for a new sequence. Under the system
+  prompt's two-step workflow, the reply is a one-line follow-up question.
+- step_edit: a chat turn that adds, updates or deletes a single step.
+- chat: any other chat turn, including every turn that answers a question
+  from the assistant. That turn can get the full sequence back, even when it
+  also mentions a step.
+- summary: folding older turns into the conversation summary.
+- sequence: generating a complete sequence.
+
+Rules come from AI_ROUTING_RULES ("clarify=fast,step_edit=fast,..."). Kinds
+that are not listed keep their default. A request may override the route
+with `model`, given either as a route name or as one of the configured
+model ids.
+
+Latency and token usage are recorded per route, so the two models can be
+compared in /api/metrics.
+"""
+import re
+import threading
+from collections import deque, namedtuple
+from app.utils.helpers import percentile
+
+FAST = 'fast'
+FULL = 'full'
+
+DEFAULT_MODELS = {
+    FAST: 'claude-haiku-4-5',
+    FULL: 'claude-3-5-sonnet-20241022',
+}
+
+DEFAULT_RULES = {
+    'clarify': FAST,
+    'step_edit': FAST,
+    'chat': FULL,
+    'summary': FAST,
+    'sequence': FULL,
+}
+
+# Recent latencies kept per route for the percentiles in stats()
+LATENCY_SAMPLES = 1000
+
+# A request for a new sequence ("create a sequence for a backend engineer at ...")
+SEQUENCE_REQUEST = re.compile(
+    r'\b(create|generate|make|build|write|draft|need|want)\b.{0,80}\b(sequence|outreach|campaign)\b',
+    re.IGNORECASE | re.DOTALL
+)
+
+# A change to one step ("update step 2 to be shorter", "delete the last step")
+STEP_EDIT = re.compile(
+    r'\b(add|insert|append|delete|remove|drop|update|change|edit|rewrite|reword|shorten|lengthen|swap)\b'
+    r'.{0,40}\bsteps?\b',
+    re.IGNORECASE | re.DOTALL
+)
+
+Route = namedtuple('Route', 'name model kind')
+
+
+def parse_rules(text):
+    """
+    Parse routing rules written as "kind=route,kind=route"
+
+    Raises:
+        ValueError: If an entry is not of the form kind=route
+    """
+    rules = {}
+    for entry in (text or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        kind, sep, route = entry.partition('=')
+        if not sep or not kind.strip() or not route.strip():
+            raise ValueError(f"Invalid routing rule {entry!r}, expected kind=route")
+        rules[kind.strip()] = route.strip()
+    return rules
+
+
+def chat_kind(user_message, chat_history=None):
+    """
+    Classify a chat turn as 'clarify', 'step_edit' or 'chat'
+
+    Args:
+        user_message (str): The message being answered
+        chat_history (list, optional): Earlier messages as dicts with 'role' and 'content', oldest first
+    """
+    last_reply = next(
+        (message['content'] for message in reversed(chat_history or []) if message['role'] == 'assistant'),
+        ''
+    )
+    # An answer to the assistant's question may produce the full sequence, even if it also mentions
+    # a step, so it goes to the full model
+    if last_reply.rstrip().endswith('?'):
+        return 'chat'
+    if STEP_EDIT.search(user_message):
+        return 'step_edit'
+    if SEQUENCE_REQUEST.search(user_message):
+        return 'clarify'
+    return 'chat'
+
+
+class ModelRouter:
+    """Picks the model for each AI call and keeps latency and token stats per route"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.configure()
+
+    def configure(self, models=None, rules=None):
+        """
+        Set the models and routing rules
+
+        Args:
+            models (dict, optional): Model id for each route name, merged over DEFAULT_MODELS
+            rules (dict, optional): Route name for each call kind, merged over DEFAULT_RULES
+
+        Raises:
+            ValueError: If a rule names a route that has no model
+        """
+        models = {**DEFAULT_MODELS, **{name: model for name, model in (models or {}).items() if model}}
+        rules = {**DEFAULT_RULES, **(rules or {})}
+        for kind, route in rules.items():
+            if route not in models:
+                raise ValueError(f"Routing rule {kind}={route} names an unknown route")
+
+        with self._lock:
+            self.models = models
+            self.rules = rules
+            self._stats = {name: self._empty_stats() for name in models}
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            'calls': 0,
+            'kinds': {},
+            'input_tokens': 0,
+            'output_tokens': 0,
+            'latency': deque(maxlen=LATENCY_SAMPLES),  # milliseconds, like first_token
+            'first_token': deque(maxlen=LATENCY_SAMPLES)
+        }
+
+    def check_override(self, override):
+        """
+        Validate a per-request `model` override
+
+        Returns:
+            str: The route name it selects, or None if there is no override
+
+        Raises:
+            ValueError: If it is neither a route name nor a configured model id
+        """
+        if override is None or override == '':
+            return None
+        if override in self.models:
+            return override
+        for name, model in self.models.items():
+            if model == override:
+                return name
+        choices = ', '.join(sorted(self.models) + sorted(set(self.models.values())))
+        raise ValueError(f"Unknown model {override!r}; expected one of: {choices}")
+
+    def route(self, kind, override=None):
+        """
+        Pick the route for a call
+
+        Args:
+            kind (str): The call kind (see the module docstring)
+            override (str, optional): A route name or configured model id from the request
+
+        Returns:
+            Route: The route name, its model id and the call kind
+        """
+        name = self.check_override(override) or self.rules.get(kind, FULL)
+        return Route(name, self.models[name], kind)
+
+    def record(self, route, latency_ms, usage=None, first_token_ms=None):
+        """Add one finished call to its route's stats"""
+        with self._lock:
+            stats = self._stats.setdefault(route.name, self._empty_stats())
+            stats['calls'] += 1
+            stats['kinds'][route.kind] = stats['kinds'].get(route.kind, 0) + 1
+            stats['latency'].append(latency_ms)
+            if first_token_ms is not None:
+                stats['first_token'].append(first_token_ms)
+            if usage is not None:
+                stats['input_tokens'] += usage.input_tokens or 0
+                stats['output_tokens'] += usage.output_tokens or 0
+
+    def stats(self):
+        """Models, rules, and per-route call counts, tokens and latency percentiles in milliseconds"""
+        with self._lock:
+            routes = {
+                name: {
+                    **{key: stats[key] for key in ('calls', 'input_tokens', 'output_tokens')},
+                    'model': self.models.get(name),
+                    'kinds': dict(stats['kinds']),
+                    'latency': sorted(stats['latency']),
+                    'first_token': sorted(stats['first_token'])
+                }
+                for name, stats in self._stats.items()
+            }
+            rules = dict(self.rules)
+
+        for stats in routes.values():
+            for key in ('latency', 'first_token'):
+                samples = [round(value, 1) for value in stats.pop(key)]
+                stats[f'{key}_ms'] = {
+                    'p50': percentile(samples, 50),
+                    'p95': percentile(samples, 95),
+                    'p99': percentile(samples, 99)
+                }
+        return {'rules': rules, 'routes': routes}
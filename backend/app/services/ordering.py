@@ -0,0 +1,101 @@
+"""
+Step ordering for sequences
+
+Step numbers within a sequence are kept dense (1..n) and unique. Inserting,
+removing or moving a step shifts the affected range of its neighbours with
+set-based UPDATE statements instead of renumbering rows one at a time. Each
+shift first moves the affected rows to negative numbers and then flips them
+back, so the unique (sequence_id, step_number) index never sees a transient
+duplicate, whatever order the database applies the rows in.
+
+None of these functions commit; callers commit once for the whole unit of work.
+"""
+from sqlalchemy import case, func, update
+from app import db
+from app.models.sequence import Sequence, SequenceStep
+
+
+def insert_step(sequence_id, content, type='email', step_number=None):
+    """
+    Insert a step at a position, shifting later steps down by one
+
+    Args:
+        step_number (int, optional): 1-based position; appended at the end if omitted or out of range
+
+    Returns:
+        SequenceStep: The new (flushed) step
+    """
+    count = _step_count(sequence_id)
+    if not step_number or step_number < 1 or step_number > count + 1:
+        step_number = count + 1
+
+    if step_number <= count:
+        _shift(sequence_id, step_number, count, 1)
+
+    step = SequenceStep(sequence_id=sequence_id, step_number=step_number, content=content, type=type)
+    db.session.add(step)
+    db.session.flush()
+    return step
+
+
+def remove_step(step):
+    """Delete a step and close the gap it leaves"""
+    sequence_id, step_number = step.sequence_id, step.step_number
+    db.session.delete(step)
+    db.session.flush()
+
+    count = _step_count(sequence_id)
+    if step_number <= count:
+        _shift(sequence_id, step_number + 1, count + 1, -1)
+
+
+def move_step(step, step_number):
+    """Move a step to a new position, shifting the steps in between by one"""
+    count = _step_count(step.sequence_id)
+    step_number = max(1, min(step_number, count))
+    current = step.step_number
+
+    if step_number < current:
+        _shift(step.sequence_id, step_number, current - 1, 1, moved=(step.id, step_number))
+    elif step_number > current:
+        _shift(step.sequence_id, current + 1, step_number, -1, moved=(step.id, step_number))
+
+
+def _step_count(sequence_id):
+    return db.session.query(func.count(SequenceStep.id)).filter_by(sequence_id=sequence_id).scalar()
+
+
+def _shift(sequence_id, first, last, delta, moved=None):
+    """
+    Add delta to the step numbers in [first, last] (optionally placing one moved step)
+
+    Args:
+        moved (tuple, optional): (step_id, step_number) of a step to place at an exact position
+    """
+    in_range = SequenceStep.step_number.between(first, last)
+    new_number = SequenceStep.step_number + delta
+
+    if moved:
+        step_id, target = moved
+        in_range = in_range | (SequenceStep.id == step_id)
+        new_number = case((SequenceStep.id == step_id, target), else_=new_number)
+
+    db.session.execute(
+        update(SequenceStep)
+        .where(SequenceStep.sequence_id == sequence_id, in_range)
+        .values(step_number=-new_number),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.execute(
+        update(SequenceStep)
+        .where(SequenceStep.sequence_id == sequence_id, SequenceStep.step_number < 0)
+        .values(step_number=-SequenceStep.step_number),
+        execution_options={'synchronize_session': False}
+    )
+
+    # Loaded steps of this sequence (and its ordered steps list) are now stale
+    for obj in list(db.session.identity_map.values()):
+        if isinstance(obj, SequenceStep) and obj.sequence_id == sequence_id:
+            db.session.expire(obj, ['step_number'])
+        elif isinstance(obj, Sequence) and obj.id == sequence_id:
+            db.session.expire(obj, ['steps'])
@@ -0,0 +1,83 @@
+"""
+Column-tuple read path for the list endpoints
+
+The list endpoints return long pages of rows that are only read and encoded
+straight back out, so they skip the ORM. Each page is a Core select of the
+columns `to_dict()` would read. The rows come back as plain tuples, without
+identity-map bookkeeping, attribute instrumentation or lazy-load state, and
+are turned into the same dicts `to_dict()` builds.
+
+The select helpers return the tuples, since the routes build their
+pagination cursors from them. The `*_payload` helpers produce the response
+dicts.
+"""
+from sqlalchemy import select
+from app import db
+from app.models.message import Message
+from app.models.sequence import Sequence, SequenceStep
+
+MESSAGE_COLUMNS = (Message.id, Message.user_id, Message.content, Message.role, Message.timestamp)
+SEQUENCE_COLUMNS = (Sequence.id, Sequence.user_id, Sequence.title, Sequence.created_at, Sequence.version)
+STEP_COLUMNS = (SequenceStep.id, SequenceStep.sequence_id, SequenceStep.step_number, SequenceStep.content, SequenceStep.type)
+
+STEP_KEYS = ('id', 'sequence_id', 'step_number', 'content', 'type')
+
+
+def select_messages(*criteria, order_by, limit):
+    """Get (id, user_id, content, role, timestamp) tuples for the matching messages"""
+    statement = select(*MESSAGE_COLUMNS).where(*criteria).order_by(*order_by).limit(limit)
+    return db.session.execute(statement).all()
+
+
+def message_payload(row):
+    """Build a message's `Message.to_dict()` from its column tuple"""
+    message_id, user_id, content, role, timestamp = row
+    return {
+        'id': message_id,
+        'user_id': user_id,
+        'content': content,
+        'role': role,
+        'timestamp': timestamp.isoformat() if timestamp else None
+    }
+
+
+def select_sequences(*criteria, order_by, limit):
+    """Get (id, user_id, title, created_at, version) tuples for the matching sequences"""
+    statement = select(*SEQUENCE_COLUMNS).where(*criteria).order_by(*order_by).limit(limit)
+    return db.session.execute(statement).all()
+
+
+def select_steps(sequence_ids):
+    """Get step column tuples for several sequences, grouped by sequence id in step order"""
+    steps = {sequence_id: [] for sequence_id in sequence_ids}
+    if not steps:
+        return steps
+
+    statement = select(*STEP_COLUMNS) \
+        .where(SequenceStep.sequence_id.in_(steps)) \
+        .order_by(SequenceStep.sequence_id, SequenceStep.step_number)
+    for row in db.session.execute(statement):
+        steps[row[1]].append(row)
+    return steps
+
+
+def step_payload(row):
+    """Build a step's `SequenceStep.to_dict()` from its column tuple"""
+    return dict(zip(STEP_KEYS, row))
+
+
+def sequence_payload(row, steps=None):
+    """Build a sequence's `Sequence.to_dict()` from its column tuple, with steps if given"""
+    sequence_id, user_id, title, created_at, version = row
+    data = {
+        'id': sequence_id,
+        'user_id': user_id,
+        'title': title,
+        'created_at': created_at.isoformat() if created_at else None,
+        'version': version
+    }
+
+    if steps is not None:
+        data['steps'] = [step_payload(step) for step in steps]
+
+    return data
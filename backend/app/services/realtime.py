@@ -0,0 +1,105 @@
+"""
+Realtime sequence events
+
+Changes to a sequence are published as compact, versioned patches to the
+`sequence_{id}` room, so only clients viewing that sequence receive them.
+Every committed change bumps `Sequence.version` by one; a client that sees a
+version gap asks for a full snapshot with the `sync_sequence` event.
+"""
+from app import db, socketio
+from app.models.sequence import Sequence, SequenceStep
+from app.services.socket import user_room
+
+
+def sequence_room(sequence_id):
+    """Name of the room for clients viewing a sequence"""
+    return f'sequence_{sequence_id}'
+
+
+def bump_version(sequence):
+    """Increment a sequence's version atomically as part of the current transaction"""
+    sequence.version = Sequence.version + 1
+
+
+def step_added(step):
+    return {'op': 'step_added', 'step': step.to_dict()}
+
+
+def step_updated(step, fields):
+    """Patch op carrying only the fields of a step that changed"""
+    changes = {field: getattr(step, field) for field in fields}
+    return {'op': 'step_updated', 'step': {'id': step.id, **changes}}
+
+
+def step_removed(step_id):
+    return {'op': 'step_removed', 'step_id': step_id}
+
+
+def steps_reordered(sequence_id):
+    """Patch op giving the new order of a sequence's steps as a list of step ids"""
+    order = db.session.query(SequenceStep.id) \
+        .filter_by(sequence_id=sequence_id) \
+        .order_by(SequenceStep.step_number) \
+        .all()
+    return {'op': 'steps_reordered', 'order': [step_id for step_id, in order]}
+
+
+def sequence_updated(sequence, fields):
+    changes = {field: getattr(sequence, field) for field in fields}
+    return {'op': 'sequence_updated', 'sequence': changes}
+
+
+def publish_patch(sequence, ops):
+    """Emit one versioned patch with all of a commit's ops to a sequence's viewers (call after commit)"""
+    socketio.emit('sequence_patch', {
+        'sequence_id': sequence.id,
+        'version': sequence.version,
+        'ops': ops
+    }, room=sequence_room(sequence.id))
+
+
+def publish_created(sequence, focus=False):
+    """
+    Tell the owner's clients about a new sequence (nobody is viewing it yet)
+
+    Args:
+        sequence (Sequence or dict): The sequence, or its already built `to_dict()` payload
+        focus (bool): Ask the clients to open it even if another sequence is open, as for
+            a sequence the user just asked the assistant for
+    """
+    data = sequence if isinstance(sequence, dict) else sequence.to_dict()
+    if focus:
+        data = {**data, 'focus': True}
+    socketio.emit('sequence_created', data, room=user_room(data['user_id']))
+
+
+def publish_draft_step(user_id, generation_id, title, index, step):
+    """
+    Show one step of a sequence that is still being generated
+
+    The draft has no id yet. Its steps are keyed by generation_id and index, and
+    the `sequence_created` event carrying the same generation_id replaces it.
+    """
+    socketio.emit('sequence_draft_step', {
+        'generation_id': generation_id,
+        'title': title,
+        'index': index,
+        'step': step
+    }, room=user_room(user_id))
+
+
+def publish_draft_failed(user_id, generation_id, error):
+    """Tell the owner's clients to drop a draft whose generation failed"""
+    socketio.emit(
+        'sequence_draft_failed',
+        {'generation_id': generation_id, **error.to_dict()},
+        room=user_room(user_id)
+    )
+
+
+def publish_deleted(sequence_id, user_id):
+    socketio.emit(
+        'sequence_deleted',
+        {'sequence_id': sequence_id},
+        to=[sequence_room(sequence_id), user_room(user_id)]
+    )
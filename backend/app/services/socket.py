@@ -1,11 +1,21 @@
-from app import socketio
+from app import db, socketio
 from flask import request
 from flask_socketio import emit, join_room, leave_room
+from app.models.sequence import Sequence
+from app.services.database import init_db
+
+def user_room(user_id):
+    """Name of the room that receives events private to a user"""
+    return f'user_{user_id}'
 
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
     print('Client connected', request.sid)
+    
+    # Subscribe the client to its user's private events (e.g. streamed replies)
+    user = init_db()
+    join_room(user_room(user.id))
 
 @socketio.on('disconnect')
 def handle_disconnect():
@@ -19,6 +29,10 @@ def handle_join(data):
     if room:
         join_room(room)
         emit('room_update', {'message': 'A new user has joined the room'}, room=room)
+        
+        # New viewers of a sequence start from a full snapshot and then apply patches
+        if room.startswith('sequence_'):
+            send_snapshot(room[len('sequence_'):])
 
 @socketio.on('leave')
 def handle_leave(data):
@@ -35,3 +49,19 @@ def handle_editing(data):
     if sequence_id:
         room = f'sequence_{sequence_id}'
         emit('user_editing', data, room=room, include_self=False)
+
+@socketio.on('sync_sequence')
+def handle_sync(data):
+    """Send a full snapshot to a client whose copy of a sequence is stale (e.g. after a version gap)"""
+    sequence_id = data.get('sequence_id')
+    if sequence_id:
+        send_snapshot(sequence_id, known_version=data.get('version'))
+
+def send_snapshot(sequence_id, known_version=None):
+    """Emit a sequence's full state to the requesting client unless it is already current"""
+    try:
+        sequence = db.session.get(Sequence, int(sequence_id))
+    except ValueError:
+        return
+    if sequence and sequence.version != known_version:
+        emit('sequence_snapshot', sequence.to_dict())
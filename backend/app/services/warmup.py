@@ -0,0 +1,90 @@
+"""
+Worker warm-up, run once before a worker serves its first request
+
+`create_app()` only wires the app together. It opens no connections, does not
+touch the schema and does not import the Anthropic SDK, so it is fast and has no
+side effects. The work a first request would otherwise pay for happens here:
+
+- checking that the schema has every migration applied
+- opening database pool connections
+- creating the Anthropic client and its HTTPS connection
+
+The warm-up must run in the process that serves requests, after any fork,
+since pooled connections cannot be shared across processes. wsgi.py and
+run.py call it once the app is created, unless STARTUP_WARMUP is off. The
+timings are logged and reported under 'startup' in /api/metrics.
+"""
+import logging
+import time
+from sqlalchemy import text
+from app import db
+from app.migrations import unapplied_revisions
+from app.services.ai import ai_service
+
+logger = logging.getLogger(__name__)
+
+
+def open_db_pool(engine, count):
+    """Check out `count` pool connections at once and return them, so they stay open in the pool"""
+    connections = []
+    try:
+        for _ in range(count):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def warm_up(app, started_at=None):
+    """
+    Prepare a freshly created app to serve requests
+
+    Failures are logged and do not stop the worker; whatever was not warmed up
+    is created on first use instead.
+
+    Args:
+        app: The app from `create_app()`
+        started_at (float, optional): `time.perf_counter()` when the process began loading,
+            to report the worker's total startup time
+
+    Returns:
+        dict: Startup timings in milliseconds, and whether each phase succeeded
+    """
+    config = app.config
+    report = app.extensions.setdefault('startup', {})
+    start = time.perf_counter()
+
+    with app.app_context():
+        try:
+            with db.engine.connect() as conn:
+                missing = unapplied_revisions(conn)
+            if missing:
+                logger.warning(f"Database schema is missing migrations {missing}; run `python migrate.py`")
+            report['schema_current'] = not missing
+
+            opened = open_db_pool(db.engine, config['STARTUP_DB_CONNECTIONS'])
+            report['db_connections'] = opened
+        except Exception as e:
+            logger.error(f"Database warm-up failed: {str(e)}")
+            report['db_connections'] = 0
+        report['db_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+        ai_start = time.perf_counter()
+        report['ai_connected'] = ai_service.warm_up(timeout=config['STARTUP_AI_TIMEOUT'])
+        report['ai_ms'] = round((time.perf_counter() - ai_start) * 1000, 1)
+
+    done = time.perf_counter()
+    report['warm_up_ms'] = round((done - start) * 1000, 1)
+    if started_at is not None:
+        report['total_ms'] = round((done - started_at) * 1000, 1)
+
+    logger.info(
+        f"Worker ready in {report.get('total_ms', report['warm_up_ms'])}ms: "
+        f"app created in {report.get('create_app_ms')}ms, "
+        f"{report['db_connections']} database connections in {report['db_ms']}ms, "
+        f"Anthropic connection {'opened' if report['ai_connected'] else 'not opened'} in {report['ai_ms']}ms"
+    )
+    return report
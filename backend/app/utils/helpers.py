@@ -1,4 +1,6 @@
 from datetime import datetime
+from functools import lru_cache
+import base64
 import json
 
 def format_datetime(dt):
@@ -20,13 +22,18 @@ def serialize_model(model):
     
     # Generic serialization for models without to_dict method
     data = {}
-    for column in model.__table__.columns:
-        value = getattr(model, column.name)
+    for name in _column_names(type(model)):
+        value = getattr(model, name)
         if isinstance(value, datetime):
             value = format_datetime(value)
-        data[column.name] = value
+        data[name] = value
     return data
 
+@lru_cache(maxsize=None)
+def _column_names(model_class):
+    """Column names of a model's table, looked up once per class"""
+    return tuple(column.name for column in model_class.__table__.columns)
+
 def deserialize_to_model(data, model_class):
     """Deserialize dictionary to model instance"""
     # Filter out keys that don't exist as columns in the model
@@ -34,3 +41,62 @@ def deserialize_to_model(data, model_class):
     filtered_data = {k: v for k, v in data.items() if k in valid_columns}
     
     return model_class(**filtered_data)
+
+def encode_cursor(timestamp, row_id):
+    """Encode a (timestamp, id) keyset position as an opaque pagination cursor"""
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a pagination cursor back into its (timestamp, id) keyset position
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def parse_page_size(value, default, maximum):
+    """Parse a requested page size, falling back to the default and capping at the maximum"""
+    try:
+        size = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+def parse_step_number(value):
+    """
+    Parse a requested 1-based step position from a request body, which may send it as a string
+    
+    Returns:
+        int or None: The position, or None if none was given
+    
+    Raises:
+        ValueError: If the value is not a whole number
+    """
+    if value is None:
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid step number: {value!r}")
+    if isinstance(value, bool) or (isinstance(value, float) and number != value):
+        raise ValueError(f"Invalid step number: {value!r}")
+    return number
+
+def estimate_tokens(text):
+    """Estimate how many model tokens a text takes (about four characters per token for English)"""
+    if not text:
+        return 0
+    return (len(text) + 3) // 4
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list, or None if it is empty"""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(pct / 100 * len(sorted_values)))]
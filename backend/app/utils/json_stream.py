@@ -0,0 +1,109 @@
+"""
+Incremental parsing of a JSON object that arrives in fragments
+"""
+import json
+
+
+class ArrayItemStream:
+    """
+    Picks the items of one array field out of a JSON object as it streams in
+
+    Fragments are scanned once, so the cost is linear in the document size no
+    matter how it is split. Each item is parsed as soon as its closing bracket
+    arrives. Items must be objects or arrays; other values in the array are
+    skipped.
+
+    Example:
+        stream = ArrayItemStream('steps')
+        for fragment in fragments:
+            for step in stream.feed(fragment):
+                ...
+        document = stream.close()
+
+    Args:
+        key (str): Name of the array field on the top-level object
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.items = []
+        self._buffer = []
+        self._item = []  # characters of the item being read
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string = []  # characters of the current top-level string, a candidate key
+        self._last_string = None
+        self._current_key = None
+        self._array_depth = None  # depth inside the target array while reading it
+        self._array_closed = False
+
+    def feed(self, fragment):
+        """
+        Add the next fragment of the document
+
+        Returns:
+            list: The items completed by this fragment, in order
+        """
+        self._buffer.append(fragment)
+        completed = []
+
+        for char in fragment:
+            in_item = bool(self._item)
+            if in_item:
+                self._item.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = ''.join(self._string)
+                elif self._depth == 1:
+                    self._string.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._string = []
+            elif char == ':' and self._depth == 1:
+                self._current_key = self._last_string
+            elif char in '{[':
+                self._depth += 1
+                if char == '[' and self._depth == 2 and self._current_key == self.key \
+                        and not self._array_closed:
+                    self._array_depth = self._depth
+                elif self._array_depth is not None and self._depth == self._array_depth + 1 and not in_item:
+                    self._item = [char]
+            elif char in '}]':
+                self._depth -= 1
+                if self._array_depth is not None:
+                    if self._item and self._depth == self._array_depth:
+                        item = json.loads(''.join(self._item))
+                        self.items.append(item)
+                        completed.append(item)
+                        self._item = []
+                    elif self._depth < self._array_depth:
+                        # The array itself closed; later fields are not read for items
+                        self._array_depth = None
+                        self._array_closed = True
+            elif char == ',' and self._depth == 1:
+                self._current_key = None
+
+        return completed
+
+    def close(self):
+        """
+        Parse the whole document once it has all arrived
+
+        Returns:
+            The parsed document
+
+        Raises:
+            ValueError: If the document is not valid JSON, e.g. because it was cut short
+        """
+        return json.loads(''.join(self._buffer))
@@ -0,0 +1,282 @@
+"""
+Micro-benchmarks for the backend's hot paths
+
+Runs against a throwaway SQLite database with the AI service stubbed out, so
+nothing here waits on the network except the proxy hop, which goes over
+loopback:
+
+- process_ai_action_blocks on realistic assistant replies
+- Sequence.to_dict and Message.to_dict at 10, 100 and 1000 steps or messages
+- deleting a step, which renumbers the steps after it
+- GET /api/sequences with a long history, on the first page and a deep one
+- main.py's proxy in front of the backend, against calling the backend directly
+
+From the backend directory:
+
+    python -m pytest benchmarks/bench_hotpaths.py --bench-json benchmarks/results/new.json
+    python benchmarks/compare.py benchmarks/results/old.json benchmarks/results/new.json
+"""
+import importlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault('ANTHROPIC_API_KEY', 'benchmark-stub')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='helix-bench-'), 'bench.db')}"
+
+from app import create_app, db  # noqa: E402
+from app.migrations import migrate  # noqa: E402
+from app.models.message import Message  # noqa: E402
+from app.models.sequence import Sequence, SequenceStep  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.database import init_db  # noqa: E402
+from app.utils.helpers import encode_cursor  # noqa: E402
+
+# Sequences in the long history behind GET /api/sequences
+HISTORY_SEQUENCES = int(os.environ.get('BENCH_HISTORY_SEQUENCES', 2000))
+
+EMAIL = (
+    "Subject: Staff Backend Engineer at Acme\n\n"
+    "Hi {name},\n\n"
+    "I lead recruiting for Acme's payments platform. Your work on distributed ledgers at Initech stood out, "
+    "especially the migration you wrote about last spring. We're hiring a staff engineer to own settlement "
+    "reliability, and the team ships Go and Postgres to about 40 million accounts.\n\n"
+    "Would you be open to a 20 minute call next week?\n\nBest,\nSam"
+)
+
+REPLIES = {
+    'plain': (
+        "Happy to help. For a staff role, lead with the scope of the problem rather than the stack, "
+        "and keep the first email under 120 words. Want me to draft a sequence?"
+    ),
+    'create_sequence': (
+        "Here's a three step sequence for the role.\n\n"
+        "---ACTION: CREATE_SEQUENCE---\n"
+        '{"title": "Staff Backend Engineer at Acme", "steps": ['
+        '{"type": "email", "content": ' + json.dumps(EMAIL) + ', "step_number": 1}, '
+        '{"type": "message", "content": "Hi {name}, following up on my note about the staff role at Acme.", '
+        '"step_number": 2}, '
+        '{"type": "call", "content": "Intro, the settlement reliability charter, then ask about timing.", '
+        '"step_number": 3}]}\n'
+        "---END ACTION---\n\n"
+        "I created the sequence in your workspace. Want any changes?"
+    ),
+    'edit_steps': (
+        "Done, the follow-up is shorter now.\n\n"
+        "---ACTION: UPDATE_STEP---\n"
+        '{"step_number": 2, "type": "message", "content": "Hi {name}, any thoughts on the Acme role?"}\n'
+        "---END ACTION---\n\n"
+        "---ACTION: UPDATE_STEP---\n"
+        '{"step_number": 3, "type": "call", "content": "Short intro, then the two questions from step 1."}\n'
+        "---END ACTION---\n\n"
+        "Anything else?"
+    ),
+}
+
+
+def stub_ai():
+    """Replace every AI call with an instant canned answer"""
+    from app.services.ai import ai_service
+
+    ai_service.get_chat_response = lambda *args, **kwargs: REPLIES['plain']
+    ai_service.stream_chat_response = lambda *args, **kwargs: REPLIES['plain']
+    ai_service.summarize_conversation = lambda summary, messages, **kwargs: summary
+    ai_service.generate_outreach_sequence = lambda *args, **kwargs: [
+        {'type': 'email', 'content': EMAIL}, {'type': 'message', 'content': 'Following up'}
+    ]
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    stub_ai()
+    with app.app_context():
+        migrate(db.engine)
+        init_db()
+    return app
+
+
+@pytest.fixture(scope='session')
+def user_id(app):
+    """The default user, whom the routes act for"""
+    with app.app_context():
+        return init_db().id
+
+
+@pytest.fixture(scope='session')
+def other_user_id(app):
+    """A second user, so the sequences made by direct benchmarks stay out of the default user's pages"""
+    with app.app_context():
+        user = User(name='Benchmark User', email='bench@example.com')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture(scope='session')
+def client(app):
+    return app.test_client()
+
+
+def add_sequence(user_id, steps, created_at=None):
+    sequence = Sequence(user_id=user_id, title='Benchmark sequence', created_at=created_at or datetime.utcnow())
+    sequence.steps = [
+        SequenceStep(step_number=n, content=EMAIL, type='email') for n in range(1, steps + 1)
+    ]
+    db.session.add(sequence)
+    db.session.commit()
+    return sequence.id
+
+
+@pytest.fixture(scope='session')
+def history(app, user_id):
+    """A long sequence history; returns the cursor of a page deep in it"""
+    with app.app_context():
+        start = datetime(2024, 1, 1)
+        sequence_ids = db.session.scalars(
+            db.insert(Sequence).returning(Sequence.id, sort_by_parameter_order=True),
+            [
+                {'user_id': user_id, 'title': f'Role {i}', 'created_at': start + timedelta(hours=i), 'version': 1}
+                for i in range(HISTORY_SEQUENCES)
+            ]
+        ).all()
+        db.session.execute(db.insert(SequenceStep), [
+            {'sequence_id': sequence_id, 'step_number': n, 'content': EMAIL, 'type': 'email'}
+            for sequence_id in sequence_ids for n in range(1, 6)
+        ])
+        db.session.commit()
+
+        deep = db.session.get(Sequence, sequence_ids[len(sequence_ids) // 4])
+        return encode_cursor(deep.created_at, deep.id)
+
+
+@pytest.mark.benchmark(group='actions')
+@pytest.mark.parametrize('reply', list(REPLIES))
+def test_process_action_blocks(benchmark, app, other_user_id, reply):
+    from app.services.actions import process_ai_action_blocks
+
+    with app.app_context():
+        # Step edits apply to the newest sequence, so there must be one
+        add_sequence(other_user_id, 3)
+        text, performed = benchmark(process_ai_action_blocks, REPLIES[reply], other_user_id)
+
+    assert 'ACTION' not in text
+    assert performed == (reply != 'plain')
+
+
+@pytest.mark.benchmark(group='serialize')
+@pytest.mark.parametrize('size', [10, 100, 1000])
+def test_sequence_to_dict(benchmark, app, other_user_id, size):
+    with app.app_context():
+        sequence = db.session.get(Sequence, add_sequence(other_user_id, size))
+        sequence.steps  # loaded once, as a request's query options would
+
+        data = benchmark(sequence.to_dict)
+
+    assert len(data['steps']) == size
+
+
+@pytest.mark.benchmark(group='serialize')
+@pytest.mark.parametrize('size', [10, 100, 1000])
+def test_message_to_dict(benchmark, app, other_user_id, size):
+    with app.app_context():
+        start = datetime(2025, 1, 1)
+        messages = [
+            Message(user_id=other_user_id, content=EMAIL, role='user' if i % 2 == 0 else 'assistant',
+                    timestamp=start + timedelta(seconds=i))
+            for i in range(size)
+        ]
+        db.session.add_all(messages)
+        db.session.commit()
+        for message in messages:
+            db.session.refresh(message)
+
+        data = benchmark(lambda: [message.to_dict() for message in messages])
+
+    assert len(data) == size
+
+
+@pytest.mark.benchmark(group='delete_step')
+@pytest.mark.parametrize('size', [10, 100])
+def test_delete_first_step(benchmark, app, client, user_id, size):
+    from app.services.ordering import insert_step
+
+    with app.app_context():
+        # Older than the history, so it stays off the first page of GET /api/sequences
+        sequence_id = add_sequence(user_id, size, created_at=datetime(2000, 1, 1))
+
+    def setup():
+        # Put a step back at the front, so every delete renumbers the whole sequence
+        with app.app_context():
+            step = insert_step(sequence_id, EMAIL, step_number=1)
+            db.session.commit()
+            return (f'/api/steps/{step.id}',), {}
+
+    response = benchmark.pedantic(client.delete, setup=setup, rounds=50, warmup_rounds=2)
+    assert response.status_code == 200
+
+
+@pytest.mark.benchmark(group='get_sequences')
+@pytest.mark.parametrize('page', ['first', 'deep', 'summaries'])
+def test_get_sequences(benchmark, client, history, page):
+    query = {
+        'first': '',
+        'deep': f'?cursor={history}',
+        'summaries': '?include_steps=false&limit=100',
+    }[page]
+
+    response = benchmark(client.get, f'/api/sequences{query}')
+
+    assert response.status_code == 200
+    benchmark.extra_info['history_sequences'] = HISTORY_SEQUENCES
+
+
+def serve(wsgi_app):
+    """Serve a WSGI app on a loopback port in a background thread; returns its URL and server"""
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, wsgi_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+
+@pytest.fixture(scope='session')
+def servers(app):
+    """The backend, and main.py's proxy in front of it, both listening on loopback"""
+    backend_url, backend = serve(app)
+
+    os.environ['BACKEND_URL'] = backend_url
+    os.environ['BACKEND_WORKERS'] = '1'
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    main = importlib.import_module('main')
+    proxy_url, proxy = serve(main.app)
+
+    yield {'backend': backend_url, 'proxy': proxy_url}
+    proxy.shutdown()
+    backend.shutdown()
+
+
+@pytest.mark.benchmark(group='proxy')
+@pytest.mark.parametrize('via', ['backend', 'proxy'])
+def test_proxy_hop(benchmark, servers, via):
+    import requests
+
+    session = requests.Session()
+    session.trust_env = False
+    url = f"{servers[via]}/api/sequences?include_steps=false&limit=1"
+
+    response = benchmark(session.get, url)
+
+    assert response.status_code == 200
@@ -0,0 +1,110 @@
+"""
+Concurrent chat load against a running backend
+
+Each simulated user sends chat messages back to back over its own keep-alive
+connection while a pool of idle Socket.IO clients holds long-polls open, the
+way browser tabs do. Reports request throughput and latency percentiles.
+
+    python benchmarks/chat_load.py --url http://127.0.0.1:8100 --users 50 --duration 30 --idle-sockets 200
+
+See benchmarks/README.md for the setup used to compare serving modes.
+"""
+import argparse
+import json
+import threading
+import time
+import requests
+import socketio
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def open_idle_sockets(url, count, transport):
+    """Connect `count` Socket.IO clients that only listen"""
+    clients = []
+    for _ in range(count):
+        client = socketio.Client(reconnection=False)
+        client.connect(url, transports=[transport])
+        clients.append(client)
+    return clients
+
+
+def run_user(url, deadline, results, lock):
+    session = requests.Session()
+    n = 0
+    while time.monotonic() < deadline:
+        n += 1
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{url}/api/chat", json={'content': f"load test message {n}"}, timeout=120)
+            ok = response.status_code == 201
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            results.append((ok, elapsed))
+
+
+def run(url, users, duration, idle_sockets=0, transport='polling'):
+    """
+    Drive the load and summarize it
+
+    Returns:
+        dict: Request counts, throughput (requests/s) and latency percentiles (ms)
+    """
+    clients = open_idle_sockets(url, idle_sockets, transport)
+    results = []
+    lock = threading.Lock()
+    started = time.monotonic()
+    deadline = started + duration
+
+    threads = [threading.Thread(target=run_user, args=(url, deadline, results, lock)) for _ in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+
+    connected = sum(1 for client in clients if client.connected)
+    for client in clients:
+        client.disconnect()
+
+    latencies = [elapsed * 1000 for ok, elapsed in results if ok]
+    return {
+        'url': url,
+        'users': users,
+        'duration_s': round(wall, 2),
+        'idle_sockets': idle_sockets,
+        'idle_sockets_still_connected': connected,
+        'requests': len(results),
+        'errors': sum(1 for ok, _ in results if not ok),
+        'throughput_rps': round(len(latencies) / wall, 2),
+        'latency_ms': {
+            f'p{pct}': round(percentile(latencies, pct), 1) if latencies else None
+            for pct in (50, 95, 99)
+        }
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Concurrent chat load against a running backend")
+    parser.add_argument('--url', default='http://127.0.0.1:8100')
+    parser.add_argument('--users', type=int, default=50, help="concurrent users sending messages")
+    parser.add_argument('--duration', type=float, default=30, help="seconds to send for")
+    parser.add_argument('--idle-sockets', type=int, default=0, help="listening Socket.IO clients to hold open")
+    parser.add_argument('--transport', choices=['polling', 'websocket'], default='polling')
+    parser.add_argument('--output', help="also write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    summary = run(args.url, args.users, args.duration, args.idle_sockets, args.transport)
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
@@ -0,0 +1,65 @@
+"""
+Compare two benchmark result files and flag regressions
+
+Benchmarks are matched by name, and their medians are compared. The script
+exits with status 1 if any benchmark got slower by more than the threshold, so
+it can gate a CI job:
+
+    python benchmarks/compare.py benchmarks/results/main.json benchmarks/results/branch.json
+
+Works on files written by `--bench-json` and by pytest-benchmark's --benchmark-json.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return {bench['fullname']: bench for bench in report['benchmarks']}, report.get('commit_info') or {}
+
+
+def compare(old, new, threshold, stat='median'):
+    """
+    Compare matching benchmarks
+
+    Returns:
+        list: (name, old seconds, new seconds, change as a fraction, regressed) for each benchmark in both files
+    """
+    rows = []
+    for name in new:
+        if name not in old:
+            continue
+        before, after = old[name]['stats'][stat], new[name]['stats'][stat]
+        change = (after - before) / before if before else 0.0
+        rows.append((name, before, after, change, change > threshold))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument('old', help="baseline results")
+    parser.add_argument('new', help="results to check against the baseline")
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help="slowdown, as a fraction of the baseline, that counts as a regression")
+    parser.add_argument('--stat', default='median', choices=['min', 'median', 'mean'],
+                        help="statistic to compare")
+    args = parser.parse_args()
+
+    old, old_commit = load(args.old)
+    new, new_commit = load(args.new)
+    rows = compare(old, new, args.threshold, args.stat)
+
+    print(f"{(old_commit.get('id') or args.old)[:12]} -> {(new_commit.get('id') or args.new)[:12]}, {args.stat}")
+    print(f"{'benchmark':<64}{'old':>12}{'new':>12}{'change':>10}")
+    for name, before, after, change, regressed in rows:
+        flag = '  REGRESSED' if regressed else ''
+        short = name.split('::')[-1]
+        print(f"{short[:63]:<64}{before * 1e6:>10.1f}us{after * 1e6:>10.1f}us{change:>+10.1%}{flag}")
+
+    missing = sorted(set(old) ^ set(new))
+    if missing:
+        print(f"\nIn only one of the files: {', '.join(name.split('::')[-1] for name in missing)}")
+
+    sys.exit(1 if any(row[-1] for row in rows) else 0)
@@ -0,0 +1,196 @@
+"""
+A pytest-benchmark style `benchmark` fixture for the hot path suite
+
+Only bench_*.py files use it, and they are run explicitly, so the regular test
+run never loads the app from here:
+
+    python -m pytest benchmarks/bench_hotpaths.py --bench-json benchmarks/results/$(git rev-parse --short HEAD).json
+
+Each benchmarked call is warmed up once, then grouped into rounds of enough
+iterations to last BENCH_MIN_ROUND_TIME. Rounds repeat for BENCH_MAX_TIME and
+at least BENCH_MIN_ROUNDS times. Times are reported per call. The JSON file has
+the same layout as pytest-benchmark's --benchmark-json, so either tool's
+results can be compared with `benchmarks/compare.py`.
+"""
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+import pytest
+
+MIN_ROUND_TIME = float(os.environ.get('BENCH_MIN_ROUND_TIME', 0.001))  # seconds
+MAX_TIME = float(os.environ.get('BENCH_MAX_TIME', 1.0))  # seconds per benchmark
+MIN_ROUNDS = int(os.environ.get('BENCH_MIN_ROUNDS', 5))
+
+_results = []
+
+
+def pytest_addoption(parser):
+    parser.addoption('--bench-json', metavar='PATH', help="write benchmark results as JSON to this file")
+
+
+class Benchmark:
+    """Times a callable; call it like pytest-benchmark's fixture"""
+
+    def __init__(self, node):
+        self.name = node.name
+        self.fullname = node.nodeid
+        marker = node.get_closest_marker('benchmark')
+        self.group = marker.kwargs.get('group') if marker else None
+        self.params = getattr(node, 'callspec', None) and dict(node.callspec.params)
+        self.extra_info = {}
+        self.stats = None
+
+    def __call__(self, func, *args, **kwargs):
+        """Time func(*args, **kwargs) in calibrated rounds and return its result"""
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        once = max(time.perf_counter() - start, 1e-7)
+        iterations = max(1, math.ceil(MIN_ROUND_TIME / once))
+
+        timings = []
+        deadline = time.perf_counter() + MAX_TIME
+        while len(timings) < MIN_ROUNDS or time.perf_counter() < deadline:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                func(*args, **kwargs)
+            timings.append((time.perf_counter() - start) / iterations)
+
+        self._record(timings, iterations)
+        return result
+
+    def pedantic(self, target, args=(), kwargs=None, setup=None, rounds=1, iterations=1, warmup_rounds=0):
+        """
+        Time target with a fixed number of rounds, running untimed setup before each one
+
+        setup may return (args, kwargs) for that round's call, as in pytest-benchmark.
+        """
+        if setup is not None and iterations != 1:
+            raise ValueError("iterations must be 1 when a setup function is given")
+
+        def prepare():
+            prepared = setup() if setup is not None else None
+            return prepared if prepared is not None else (args, kwargs or {})
+
+        for _ in range(warmup_rounds):
+            call_args, call_kwargs = prepare()
+            target(*call_args, **call_kwargs)
+
+        timings = []
+        result = None
+        for _ in range(rounds):
+            call_args, call_kwargs = prepare()
+            start = time.perf_counter()
+            for _ in range(iterations):
+                result = target(*call_args, **call_kwargs)
+            timings.append((time.perf_counter() - start) / iterations)
+
+        self._record(timings, iterations)
+        return result
+
+    def _record(self, timings, iterations):
+        ordered = sorted(timings)
+        quartiles = statistics.quantiles(ordered, n=4) if len(ordered) > 1 else [ordered[0]] * 3
+        mean = statistics.fmean(ordered)
+        self.stats = {
+            'min': ordered[0],
+            'max': ordered[-1],
+            'mean': mean,
+            'stddev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+            'median': statistics.median(ordered),
+            'q1': quartiles[0],
+            'q3': quartiles[2],
+            'iqr': quartiles[2] - quartiles[0],
+            'rounds': len(ordered),
+            'iterations': iterations,
+            'ops': 1 / mean if mean else None,
+            'total': sum(ordered) * iterations
+        }
+
+
+@pytest.fixture
+def benchmark(request):
+    bench = Benchmark(request.node)
+    yield bench
+    if bench.stats is not None:
+        _results.append(bench)
+
+
+def _commit_info():
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], capture_output=True, text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    return {
+        'id': git('rev-parse', 'HEAD'),
+        'branch': git('rev-parse', '--abbrev-ref', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))
+    }
+
+
+def pytest_sessionfinish(session):
+    path = session.config.getoption('--bench-json', None)
+    if not path or not _results:
+        return
+
+    report = {
+        'machine_info': {
+            'node': platform.node(),
+            'processor': platform.processor(),
+            'machine': platform.machine(),
+            'python_implementation': platform.python_implementation(),
+            'python_version': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'system': platform.system(),
+            'release': platform.release()
+        },
+        'commit_info': _commit_info(),
+        'benchmarks': [
+            {
+                'group': bench.group,
+                'name': bench.name,
+                'fullname': bench.fullname,
+                'params': bench.params,
+                'stats': bench.stats,
+                'extra_info': bench.extra_info
+            }
+            for bench in _results
+        ],
+        'datetime': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'version': 'helix-bench-1'
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+
+    def fmt(seconds):
+        for unit, scale in (('s', 1), ('ms', 1e3), ('us', 1e6)):
+            if seconds * scale >= 1 or unit == 'us':
+                return f"{seconds * scale:.1f}{unit}"
+
+    terminalreporter.section('benchmarks')
+    terminalreporter.write_line(f"{'name':<60}{'min':>10}{'median':>10}{'mean':>10}{'rounds':>8}")
+    for bench in _results:
+        stats = bench.stats
+        terminalreporter.write_line(
+            f"{bench.name[:59]:<60}{fmt(stats['min']):>10}{fmt(stats['median']):>10}"
+            f"{fmt(stats['mean']):>10}{stats['rounds']:>8}"
+        )
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark(group): group related benchmarks in the results')
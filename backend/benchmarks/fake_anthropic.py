@@ -0,0 +1,414 @@
+"""
+A local stand-in for the Anthropic Messages API, for tests and load tests
+
+Serves POST /v1/messages, streaming and not, and GET /v1/models (the client's
+warm-up call). It only uses the standard library, so it runs anywhere the
+backend does. Point the backend at it with AI_BASE_URL; any API key works:
+
+    python benchmarks/fake_anthropic.py --port 8200 --ttft lognormal:0.6,0.5 --token-rate 80 \\
+        --errors 429=0.02,529=0.01 --cut-rate 0.01
+    AI_BASE_URL=http://127.0.0.1:8200 ANTHROPIC_API_KEY=fake python run.py
+
+Without a script, each request gets a canned reply that plays the assistant's
+part in the recruiter flow (see `canned_reply`): a follow-up question for a new
+sequence request, a CREATE_SEQUENCE action block once it is answered, an
+UPDATE_STEP block for step edits, and a save_sequence tool call for
+generations. Time to first token, token rate, error statuses and dropped
+streams are drawn from a `Profile`. GET /stats returns request counts.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STEPS = [
+    {'type': 'email', 'content': (
+        "Subject: {title}\n\nHi {{name}},\n\nI lead recruiting for the platform team. Your work on "
+        "distributed systems stood out, and we're hiring someone to own reliability for a service used by "
+        "millions of accounts.\n\nWould you be open to a 20 minute call next week?\n\nBest,\nSam"
+    )},
+    {'type': 'message', 'content': "Hi {{name}}, following up on my note about the {title} role. Any thoughts?"},
+    {'type': 'email', 'content': (
+        "Subject: Re: {title}\n\nHi {{name}},\n\nOne more note: the team ships weekly and on-call is shared "
+        "across twelve engineers. Happy to share the full scope if useful.\n\nBest,\nSam"
+    )},
+    {'type': 'call', 'content': "Intro, the reliability charter, then ask about timing and what they want next."},
+]
+
+REPLIES = {
+    'chat': (
+        "Happy to help. For a senior role, lead with the scope of the problem rather than the stack, and keep "
+        "the first email under 120 words. Personalize the opening line and end with one clear ask."
+    ),
+    'clarify': "Glad to. What skills or experience matter most for this role, and what tone should the outreach take?",
+    'create_sequence': (
+        "Here's a three step sequence for the role.\n\n"
+        "---ACTION: CREATE_SEQUENCE---\n"
+        + json.dumps({'title': 'Sequence from chat', 'steps': [
+            {**step, 'content': step['content'].format(title='the role'), 'step_number': n}
+            for n, step in enumerate(STEPS[:3], start=1)
+        ]}) + "\n"
+        "---END ACTION---\n\n"
+        "I created the sequence in your workspace. Want any changes?"
+    ),
+    'edit_step': (
+        "Done, the follow-up is shorter now.\n\n"
+        "---ACTION: UPDATE_STEP---\n"
+        '{"step_number": 2, "type": "message", "content": "Hi {name}, any thoughts on the role?"}\n'
+        "---END ACTION---\n\n"
+        "Anything else?"
+    ),
+    'summary': "The recruiter is building outreach for an engineering role and has one draft sequence.",
+}
+
+STEP_EDIT = re.compile(r'\b(add|delete|remove|update|change|edit|rewrite|shorten)\b.{0,40}\bsteps?\b', re.IGNORECASE)
+SEQUENCE_REQUEST = re.compile(r'\b(create|generate|make|draft|write)\b.{0,80}\b(sequence|outreach)\b', re.IGNORECASE)
+
+CHARS_PER_TOKEN = 4
+
+
+def text_of(content):
+    """The text of a message's content, which is a string or a list of blocks"""
+    if isinstance(content, str):
+        return content
+    return ''.join(block.get('text', '') for block in content if isinstance(block, dict))
+
+
+def canned_reply(body):
+    """
+    Pick a reply for a Messages API request body
+
+    Returns:
+        tuple: (kind, text), where kind is 'tool' for a tool call (text is its JSON input),
+            'summary', or the chat reply's name in REPLIES
+    """
+    if body.get('tools'):
+        title = 'the role'
+        match = re.search(r'sequence for an? (.+?) role at (.+?)\.', text_of(
+            body['messages'][-1]['content']))
+        if match:
+            title = f"{match.group(1)} at {match.group(2)}"
+        steps = [{**step, 'content': step['content'].format(title=title)} for step in STEPS]
+        return 'tool', json.dumps({'steps': steps})
+
+    # Summaries are the only calls made without the assistant's system prompt
+    if not body.get('system'):
+        return 'summary', REPLIES['summary']
+
+    messages = body['messages']
+    message = text_of(messages[-1]['content'])
+    last_reply = next((text_of(m['content']) for m in reversed(messages[:-1]) if m['role'] == 'assistant'), '')
+    if STEP_EDIT.search(message):
+        kind = 'edit_step'
+    elif SEQUENCE_REQUEST.search(message):
+        kind = 'clarify'
+    elif last_reply.rstrip().endswith('?'):
+        # Treat any other message after a question as the answer to the follow-up question
+        kind = 'create_sequence'
+    else:
+        kind = 'chat'
+    return kind, REPLIES[kind]
+
+
+def distribution(spec):
+    """
+    Parse a latency or rate distribution
+
+    Accepts a number (always that value), 'fixed:X', 'uniform:LOW,HIGH' or
+    'lognormal:MEDIAN,SIGMA'.
+
+    Returns:
+        callable: Takes a random.Random and returns one sample
+
+    Raises:
+        ValueError: If the spec is not one of the forms above
+    """
+    name, _, params = str(spec).partition(':')
+    if not params:
+        value = float(name)
+        return lambda rng: value
+    values = [float(value) for value in params.split(',')]
+    if name == 'fixed' and len(values) == 1:
+        return lambda rng: values[0]
+    if name == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(*values)
+    if name == 'lognormal' and len(values) == 2:
+        mu, sigma = math.log(values[0]), values[1]
+        return lambda rng: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Unknown distribution: {spec}")
+
+
+def parse_errors(text):
+    """Parse 'STATUS=RATE,...', e.g. '429=0.02,529=0.01', into {status: probability}"""
+    errors = {}
+    for pair in filter(None, (part.strip() for part in (text or '').split(','))):
+        status, _, rate = pair.partition('=')
+        errors[int(status)] = float(rate)
+    if sum(errors.values()) > 1:
+        raise ValueError("Error rates add up to more than 1")
+    return errors
+
+
+class Profile:
+    """
+    How the fake API behaves when it is not following a script
+
+    Args:
+        ttft: Seconds to the first token, as a distribution spec (see `distribution`)
+        token_rate: Output tokens per second, as a distribution spec
+        errors (dict): Probability of answering with each error status, e.g. {429: 0.02}
+        cut_rate (float): Probability of dropping a stream halfway through the reply
+        retry_after (float): Retry-After seconds sent with 429s
+        seed (int, optional): Seed for repeatable runs
+    """
+
+    def __init__(self, ttft=0.5, token_rate=80, errors=None, cut_rate=0.0, retry_after=1, seed=None):
+        self.ttft = distribution(ttft)
+        self.token_rate = distribution(token_rate)
+        self.errors = dict(errors or {})
+        self.cut_rate = cut_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def entry(self, body):
+        """Build a script entry for one request (see FakeMessagesAPI)"""
+        kind, text = canned_reply(body)
+        with self.lock:
+            roll = self.rng.random()
+            ttft = self.ttft(self.rng)
+            token_delay = 1 / max(self.token_rate(self.rng), 1e-3)
+            cut = self.rng.random() < self.cut_rate
+
+        for status, rate in self.errors.items():
+            if roll < rate:
+                headers = {'Retry-After': str(self.retry_after)} if status == 429 else {}
+                return {'kind': kind, 'status': status, 'delay': min(ttft, 0.2), 'headers': headers}
+            roll -= rate
+
+        entry = {'kind': kind, 'delay': ttft, 'token_delay': token_delay}
+        if kind == 'tool':
+            entry.update(tool_input=text, chunk=4 * CHARS_PER_TOKEN, chunk_delay=4 * token_delay)
+            size = math.ceil(len(text) / entry['chunk'])
+        else:
+            entry['text'] = text
+            size = len(text.split(' '))
+        if cut:
+            entry['cut_after'] = size // 2
+        if not body.get('stream'):
+            # A whole reply arrives at once, after it would have finished streaming
+            entry['delay'] = ttft + token_delay * len(text) / CHARS_PER_TOKEN
+        return entry
+
+
+class FakeMessagesAPI:
+    """
+    Serves POST /v1/messages on a loopback port, from a script or a Profile
+
+    Each script entry is a dict with any of: status (default 200), text, delay
+    (seconds before answering), headers, token_delay (streaming: seconds between
+    text deltas), and cut_after (streaming: drop the connection after this many
+    deltas). An entry with tool_input streams that JSON string as a tool call,
+    in pieces of `chunk` characters sent `chunk_delay` seconds apart, ending
+    with `stop_reason`. Script entries are used one per request and the last
+    one repeats. Without a script, entries come from `profile`.
+
+    Args:
+        script (list, optional): Entries to answer with, in order
+        profile (Profile, optional): Used when there is no script; defaults to Profile()
+        host (str): Address to listen on
+        port (int): Port to listen on; 0 picks a free one
+    """
+
+    def __init__(self, script=None, profile=None, host='127.0.0.1', port=0):
+        self.script = list(script or [])
+        self.profile = profile or Profile()
+        self.requests = 0
+        self.counts = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                if path == '/v1/models':
+                    return self._json(200, {
+                        'data': [{'type': 'model', 'id': 'fake-model', 'display_name': 'Fake model',
+                                  'created_at': '2024-01-01T00:00:00Z'}],
+                        'has_more': False, 'first_id': 'fake-model', 'last_id': 'fake-model'
+                    })
+                if path == '/stats':
+                    return self._json(200, fake.stats())
+                self._json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': path}})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                entry = fake._next_entry(body)
+                fake._begin()
+                try:
+                    self._answer(body, entry)
+                finally:
+                    fake._end(entry)
+
+            def _answer(self, body, entry):
+                time.sleep(entry.get('delay', 0))
+
+                status = entry.get('status', 200)
+                if status != 200:
+                    error_type = 'rate_limit_error' if status == 429 else 'api_error'
+                    return self._json(status, {'type': 'error', 'error': {'type': error_type, 'message': 'fake'}},
+                                      entry.get('headers', {}))
+                if body.get('stream') and 'tool_input' in entry:
+                    return self._stream_tool(body, entry)
+                if body.get('stream'):
+                    return self._stream(body, entry)
+                text = entry.get('text', '')
+                self._json(200, {
+                    'id': 'msg_fake', 'type': 'message', 'role': 'assistant', 'model': body['model'],
+                    'content': [{'type': 'text', 'text': text}],
+                    'stop_reason': 'end_turn', 'stop_sequence': None,
+                    'usage': {'input_tokens': fake.input_tokens(body), 'output_tokens': fake.output_tokens(text)}
+                })
+
+            def _json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _start_stream(self, body):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                self._event('message_start', {'message': {
+                    'id': 'msg_fake', 'type': 'message', 'role': 'assistant', 'model': body.get('model', 'fake'),
+                    'content': [], 'stop_reason': None, 'stop_sequence': None,
+                    'usage': {'input_tokens': fake.input_tokens(body), 'output_tokens': 1}
+                }})
+
+            def _event(self, name, data):
+                chunk = f"event: {name}\ndata: {json.dumps({'type': name, **data})}\n\n".encode()
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+
+            def _end_stream(self, stop_reason, output_tokens):
+                self._event('content_block_stop', {'index': 0})
+                self._event('message_delta', {'delta': {'stop_reason': stop_reason, 'stop_sequence': None},
+                                              'usage': {'output_tokens': output_tokens}})
+                self._event('message_stop', {})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _stream(self, body, entry):
+                text, cut_after = entry.get('text', ''), entry.get('cut_after')
+                self._start_stream(body)
+                self._event('content_block_start', {'index': 0, 'content_block': {'type': 'text', 'text': ''}})
+                for i, word in enumerate(text.split(' ')):
+                    if cut_after is not None and i == cut_after:
+                        # Drop the connection mid-reply, without ending the chunked body
+                        self.close_connection = True
+                        return
+                    if i:
+                        time.sleep(entry.get('token_delay', 0))
+                    self._event('content_block_delta', {'index': 0, 'delta': {'type': 'text_delta', 'text': word + ' '}})
+                self._end_stream('end_turn', fake.output_tokens(text))
+
+            def _stream_tool(self, body, entry):
+                self._start_stream(body)
+                self._event('content_block_start', {'index': 0, 'content_block': {
+                    'type': 'tool_use', 'id': 'toolu_fake', 'name': body['tool_choice']['name'], 'input': {}
+                }})
+                text, size = entry['tool_input'], entry.get('chunk', 16)
+                for i, start in enumerate(range(0, len(text), size)):
+                    if entry.get('cut_after') is not None and i == entry['cut_after']:
+                        self.close_connection = True
+                        return
+                    time.sleep(entry.get('chunk_delay', 0))
+                    self._event('content_block_delta', {'index': 0, 'delta': {
+                        'type': 'input_json_delta', 'partial_json': text[start:start + size]
+                    }})
+                self._end_stream(entry.get('stop_reason', 'tool_use'), fake.output_tokens(text))
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 256
+
+        self.server = Server((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _next_entry(self, body):
+        with self._lock:
+            self.requests += 1
+            if self.script:
+                return self.script[min(self.requests, len(self.script)) - 1]
+        return self.profile.entry(body)
+
+    def _begin(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _end(self, entry):
+        key = f"{entry.get('kind', 'scripted')} {entry.get('status', 200)}"
+        if entry.get('cut_after') is not None:
+            key += ' cut'
+        with self._lock:
+            self.in_flight -= 1
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    @staticmethod
+    def input_tokens(body):
+        return len(json.dumps([body.get('system'), body.get('messages')])) // CHARS_PER_TOKEN
+
+    @staticmethod
+    def output_tokens(text):
+        return max(1, len(text) // CHARS_PER_TOKEN)
+
+    def stats(self):
+        """Requests answered so far, by reply kind and status, and the most answered at once"""
+        with self._lock:
+            return {'requests': self.requests, 'responses': dict(self.counts), 'max_in_flight': self.max_in_flight}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve a fake Anthropic Messages API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8200)
+    parser.add_argument('--ttft', default='lognormal:0.6,0.4',
+                        help="seconds to the first token: N, fixed:N, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA")
+    parser.add_argument('--token-rate', default='uniform:60,100', help="output tokens per second, same forms")
+    parser.add_argument('--errors', default='', help="error statuses and their rates, e.g. 429=0.02,529=0.01")
+    parser.add_argument('--cut-rate', type=float, default=0.0, help="share of streams dropped halfway through")
+    parser.add_argument('--retry-after', type=float, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    fake = FakeMessagesAPI(profile=Profile(
+        ttft=args.ttft, token_rate=args.token_rate, errors=parse_errors(args.errors), cut_rate=args.cut_rate,
+        retry_after=args.retry_after, seed=args.seed
+    ), host=args.host, port=args.port)
+    print(f"Fake Messages API on {fake.url}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fake.close()
@@ -0,0 +1,238 @@
+"""
+End-to-end load from simulated recruiters, through main.py's proxy
+
+Each recruiter holds a Socket.IO connection open and repeats the flow a
+recruiter follows in the app, over HTTP:
+
+1. asks the chat assistant for a sequence, then answers its follow-up question
+2. generates a sequence from a job title and company
+3. opens it, edits a step, adds one and deletes it
+4. asks the assistant to shorten a step
+5. reloads the sequence list
+
+Reports throughput and p50/p95/p99 latency per endpoint, the time from asking
+for a generation to its first step arriving over Socket.IO, and the events each
+socket received. Run it against `main.py` with the backend pointed at
+`benchmarks/fake_anthropic.py`; see benchmarks/README.md for the setup:
+
+    python benchmarks/recruiter_load.py --url http://127.0.0.1:5000 --recruiters 20 --duration 60
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import requests
+import socketio
+from chat_load import percentile
+
+FIRST_STEP = 'socket.io first draft step'
+CONNECT = 'socket.io connect'
+
+
+class Recorder:
+    """Collects request timings and socket events from every recruiter's thread"""
+
+    def __init__(self):
+        self.timings = {}  # endpoint -> [(status, seconds)]
+        self.events = {}
+        self.flows = 0
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, status, elapsed):
+        with self.lock:
+            self.timings.setdefault(endpoint, []).append((status, elapsed))
+
+    def event(self, name):
+        with self.lock:
+            self.events[name] = self.events.get(name, 0) + 1
+
+    def summary(self, wall):
+        endpoints = {}
+        for endpoint, timings in sorted(self.timings.items()):
+            latencies = [elapsed * 1000 for status, elapsed in timings if status and status < 400]
+            errors = {}
+            for status, _ in timings:
+                if not status or status >= 400:
+                    errors[str(status or 'failed')] = errors.get(str(status or 'failed'), 0) + 1
+            endpoints[endpoint] = {
+                'requests': len(timings),
+                'errors': errors,
+                'throughput_rps': round(len(latencies) / wall, 2),
+                'latency_ms': {
+                    f'p{pct}': round(percentile(latencies, pct), 1) if latencies else None
+                    for pct in (50, 95, 99)
+                }
+            }
+        return endpoints
+
+
+class Recruiter:
+    """One simulated recruiter: a Socket.IO client and an HTTP session, both through the proxy"""
+
+    def __init__(self, url, number, recorder, transport, chat_stream, think):
+        self.url = url
+        self.number = number
+        self.recorder = recorder
+        self.chat_stream = chat_stream
+        self.think = think
+        self.session = requests.Session()
+        self.session.trust_env = False
+        self.drafts = {}  # generation title -> time its first step arrived
+
+        http = requests.Session()
+        http.trust_env = False
+        self.socket = socketio.Client(reconnection=False, http_session=http)
+        self.socket.on('*', self._on_event)
+        start = time.perf_counter()
+        try:
+            self.socket.connect(url, transports=[transport])
+            status = 200
+        except socketio.exceptions.ConnectionError:
+            status = None
+        recorder.record(CONNECT, status, time.perf_counter() - start)
+
+    def _on_event(self, event, data=None):
+        self.recorder.event(event)
+        if event == 'sequence_draft_step' and data['title'] not in self.drafts:
+            self.drafts[data['title']] = time.perf_counter()
+
+    def request(self, method, path, endpoint, **kwargs):
+        """Send one request and record its latency under endpoint; returns the JSON body on success"""
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.url}{path}", timeout=180, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, None
+        self.recorder.record(endpoint, status, time.perf_counter() - start)
+        time.sleep(random.uniform(0, self.think))
+        if response is not None and status < 400:
+            return response.json()
+        return None
+
+    def chat(self, content):
+        return self.request('POST', '/api/chat', 'POST /api/chat', json={
+            'content': content, 'stream': self.chat_stream, 'background': False
+        })
+
+    def flow(self, iteration):
+        company = f"Company {self.number}-{iteration}"
+        self.chat(f"Create a sequence for a backend engineer at {company}")
+        self.chat("Mostly Go and Postgres, and keep the tone friendly")
+
+        title = f"Backend Engineer at {company}"
+        start = time.perf_counter()
+        sequence = self.request('POST', '/api/sequences/generate', 'POST /api/sequences/generate', json={
+            'job_title': 'Backend Engineer', 'company_name': company
+        })
+        if title in self.drafts:
+            self.recorder.record(FIRST_STEP, 200, self.drafts.pop(title) - start)
+
+        if sequence and sequence.get('steps'):
+            sequence_id, step = sequence['id'], sequence['steps'][0]
+            # Open the sequence, as the editor does, so its patches arrive over the socket
+            room = {'room': f"sequence_{sequence_id}"}
+            if self.socket.connected:
+                self.socket.emit('join', room)
+            self.request('PUT', f"/api/sequences/{sequence_id}/steps/{step['id']}",
+                         'PUT /api/sequences/<id>/steps/<id>',
+                         json={'content': step['content'] + '\n\nP.S. Remote is fine.'})
+            added = self.request('POST', f"/api/sequences/{sequence_id}/steps", 'POST /api/sequences/<id>/steps',
+                                 json={'type': 'message', 'content': 'Quick nudge on my last note.', 'step_number': 2})
+            if added:
+                self.request('DELETE', f"/api/steps/{added['id']}", 'DELETE /api/steps/<id>')
+            if self.socket.connected:
+                self.socket.emit('leave', room)
+
+        self.chat("Shorten step 2 please")
+        self.request('GET', '/api/sequences?include_steps=false&limit=20', 'GET /api/sequences')
+
+    def run(self, deadline):
+        iteration = 0
+        while time.monotonic() < deadline:
+            iteration += 1
+            self.flow(iteration)
+            with self.recorder.lock:
+                self.recorder.flows += 1
+
+    def close(self):
+        connected = self.socket.connected
+        if connected:
+            self.socket.disconnect()
+        return connected
+
+
+def run(url, recruiters, duration, transport='polling', chat_stream=False, think=0.5, ramp=5.0, fake_url=None):
+    """
+    Drive the load and summarize it
+
+    Returns:
+        dict: Flow counts, per-endpoint request counts, errors, throughput (requests/s) and
+            latency percentiles (ms), socket event counts, and the fake API's counts if fake_url is given
+    """
+    recorder = Recorder()
+    started = time.monotonic()
+    deadline = started + duration
+    clients = []
+    clients_lock = threading.Lock()
+
+    def recruiter(number):
+        # Spread the arrivals out, as recruiters do not all log in at the same instant
+        time.sleep(ramp * number / max(recruiters, 1))
+        client = Recruiter(url, number, recorder, transport, chat_stream, think)
+        with clients_lock:
+            clients.append(client)
+        client.run(deadline)
+
+    threads = [threading.Thread(target=recruiter, args=(n,)) for n in range(recruiters)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+
+    still_connected = sum(client.close() for client in clients)
+    summary = {
+        'url': url,
+        'recruiters': recruiters,
+        'duration_s': round(wall, 2),
+        'flows_completed': recorder.flows,
+        'sockets_still_connected': still_connected,
+        'endpoints': recorder.summary(wall),
+        'socket_events': dict(sorted(recorder.events.items()))
+    }
+    if fake_url:
+        summary['fake_api'] = requests.get(f"{fake_url}/stats", timeout=5).json()
+    return summary
+
+
+def print_table(summary):
+    print(f"{summary['recruiters']} recruiters, {summary['duration_s']}s, {summary['flows_completed']} flows, "
+          f"{summary['sockets_still_connected']} sockets still connected")
+    print(f"{'endpoint':<40}{'requests':>9}{'errors':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for endpoint, stats in summary['endpoints'].items():
+        latency = stats['latency_ms']
+        print(f"{endpoint:<40}{stats['requests']:>9}{sum(stats['errors'].values()):>8}{stats['throughput_rps']:>8}"
+              + ''.join(f"{latency[p] if latency[p] is not None else '-':>9}" for p in ('p50', 'p95', 'p99')))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="End-to-end recruiter load through main.py")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="main.py's address")
+    parser.add_argument('--recruiters', type=int, default=20, help="concurrent simulated recruiters")
+    parser.add_argument('--duration', type=float, default=60, help="seconds to start new flows for")
+    parser.add_argument('--transport', choices=['polling', 'websocket'], default='polling')
+    parser.add_argument('--chat-stream', action='store_true', help="stream chat replies over Socket.IO")
+    parser.add_argument('--think', type=float, default=0.5, help="longest pause after each request, in seconds")
+    parser.add_argument('--ramp', type=float, default=5, help="seconds over which recruiters arrive")
+    parser.add_argument('--fake-url', help="fake Messages API to include request counts from")
+    parser.add_argument('--output', help="also write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    summary = run(args.url, args.recruiters, args.duration, args.transport, args.chat_stream, args.think, args.ramp,
+                  args.fake_url)
+    print_table(summary)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
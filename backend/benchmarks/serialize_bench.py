@@ -0,0 +1,155 @@
+"""
+Per-row cost of the list endpoints' read and encode path
+
+Times one page of messages and one page of sequences (with their steps) through
+each stage combination, against a throwaway SQLite database:
+
+- orm + default: ORM objects, `to_dict()`, Flask's default JSON provider (the old path)
+- core + default: column tuples from a Core select, Flask's default JSON provider
+- core + orjson: column tuples, the orjson provider (the current path)
+
+Each figure is the best of several runs, divided by the rows on the page.
+
+    python benchmarks/serialize_bench.py --rows 200 --steps 5 --output serialize.json
+
+Run from the backend directory.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault('ANTHROPIC_API_KEY', 'benchmark-stub')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='helix-bench-'), 'bench.db')}"
+
+
+def best_of(func, repeat):
+    """Fastest of `repeat` timed calls, in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def seed(user_id, rows, steps):
+    from datetime import datetime, timedelta
+    from app import db
+    from app.models.message import Message
+    from app.models.sequence import Sequence, SequenceStep
+
+    start = datetime(2025, 1, 1)
+    content = "Thanks, that looks good. Can you make the second follow-up a bit shorter? " * 3
+    for i in range(rows):
+        db.session.add(Message(
+            user_id=user_id,
+            content=content,
+            role='user' if i % 2 == 0 else 'assistant',
+            timestamp=start + timedelta(minutes=i)
+        ))
+        sequence = Sequence(user_id=user_id, title=f'Senior Engineer {i}', created_at=start + timedelta(hours=i))
+        sequence.steps = [
+            SequenceStep(step_number=n, content=f"Subject: Step {n}\n\nHi {{name}},\n\n" + content, type='email')
+            for n in range(1, steps + 1)
+        ]
+        db.session.add(sequence)
+    db.session.commit()
+
+
+def run(rows, steps, repeat):
+    from flask.json.provider import DefaultJSONProvider
+    from app import create_app, db
+    from app.migrations import migrate
+    from app.models.message import Message
+    from app.models.sequence import Sequence
+    from app.services.database import init_db
+    from app.services.reads import (
+        select_messages, message_payload, select_sequences, select_steps, sequence_payload
+    )
+    from app.utils.json_provider import OrjsonProvider
+    from sqlalchemy.orm import selectinload
+
+    app = create_app()
+    app.debug = False
+
+    with app.app_context():
+        migrate(db.engine)
+        user_id = init_db().id
+        seed(user_id, rows, steps)
+
+    def orm_messages():
+        messages = Message.query.filter_by(user_id=user_id) \
+            .order_by(Message.timestamp.desc(), Message.id.desc()).limit(rows).all()
+        return [message.to_dict() for message in messages]
+
+    def core_messages():
+        found = select_messages(
+            Message.user_id == user_id,
+            order_by=(Message.timestamp.desc(), Message.id.desc()),
+            limit=rows
+        )
+        return [message_payload(row) for row in found]
+
+    def orm_sequences():
+        sequences = Sequence.query.filter_by(user_id=user_id).options(selectinload(Sequence.steps)) \
+            .order_by(Sequence.created_at.desc(), Sequence.id.desc()).limit(rows).all()
+        return [sequence.to_dict() for sequence in sequences]
+
+    def core_sequences():
+        found = select_sequences(
+            Sequence.user_id == user_id,
+            order_by=(Sequence.created_at.desc(), Sequence.id.desc()),
+            limit=rows
+        )
+        found_steps = select_steps([row.id for row in found])
+        return [sequence_payload(row, found_steps[row.id]) for row in found]
+
+    default, fast = DefaultJSONProvider(app), OrjsonProvider(app)
+    paths = {
+        'orm + default': (default, orm_messages, orm_sequences),
+        'core + default': (default, core_messages, core_sequences),
+        'core + orjson': (fast, core_messages, core_sequences),
+    }
+
+    results = {'rows': rows, 'steps_per_sequence': steps, 'us_per_row': {}}
+    with app.test_request_context():
+        for name, (provider, messages, sequences) in paths.items():
+            timings = {}
+            for kind, read in (('messages', messages), ('sequences', sequences)):
+                def page():
+                    # A fresh session per page, as each request gets
+                    db.session.remove()
+                    return provider.response(read()).get_data()
+
+                page()  # warm up
+                timings[kind] = round(best_of(page, repeat) / rows * 1e6, 1)
+            results['us_per_row'][name] = timings
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Per-row cost of the list endpoints' read and encode path")
+    parser.add_argument('--rows', type=int, default=200, help="rows per page")
+    parser.add_argument('--steps', type=int, default=5, help="steps per sequence")
+    parser.add_argument('--repeat', type=int, default=20, help="timed runs per path; the fastest counts")
+    parser.add_argument('--output', help="also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.steps, args.repeat)
+
+    print(f"{'path':<16}{'messages us/row':>18}{'sequences us/row':>18}")
+    for name, timings in results['us_per_row'].items():
+        print(f"{name:<16}{timings['messages']:>18}{timings['sequences']:>18}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,69 @@
+"""
+The backend with Anthropic calls replaced by a fixed-latency stub, for load tests
+
+Replies take BENCH_TTFT seconds to the first token, then stream BENCH_TOKENS
+tokens at BENCH_TOKEN_RATE tokens per second, sleeping the way a real call
+waits on the network. Compare the two serving modes on identical load with:
+
+    python benchmarks/stub_app.py --port 8100                                    # werkzeug dev server
+    gunicorn -c gunicorn.conf.py --bind 0.0.0.0:8101 benchmarks.stub_app:app     # gunicorn + gevent
+
+Both are run from the backend directory.
+"""
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault('ANTHROPIC_API_KEY', 'benchmark-stub')
+
+TTFT = float(os.environ.get('BENCH_TTFT', 0.5))  # seconds
+TOKENS = int(os.environ.get('BENCH_TOKENS', 60))
+TOKEN_RATE = float(os.environ.get('BENCH_TOKEN_RATE', 80))  # tokens per second
+
+REPLY_TOKEN = 'lorem '
+
+
+def stream_chat_response(user_message, chat_history=None, on_text=None, summary=None, user_id=None, model=None):
+    time.sleep(TTFT)
+    for _ in range(TOKENS):
+        time.sleep(1 / TOKEN_RATE)
+        if on_text:
+            on_text(REPLY_TOKEN)
+    return REPLY_TOKEN * TOKENS
+
+
+def get_chat_response(user_message, chat_history=None, summary=None, user_id=None, model=None):
+    time.sleep(TTFT + TOKENS / TOKEN_RATE)
+    return REPLY_TOKEN * TOKENS
+
+
+def summarize_conversation(summary, messages, max_tokens=500, user_id=None):
+    time.sleep(TTFT)
+    return f"{summary} {len(messages)} more turns.".strip()
+
+
+def install_stub():
+    from app.services.ai import ai_service
+    ai_service.stream_chat_response = stream_chat_response
+    ai_service.get_chat_response = get_chat_response
+    ai_service.summarize_conversation = summarize_conversation
+
+
+if __name__ == '__main__':
+    import argparse
+    from run import run_worker
+
+    parser = argparse.ArgumentParser(description="Serve the stubbed backend on the werkzeug dev server")
+    parser.add_argument('--port', type=int, default=8100)
+    args = parser.parse_args()
+
+    install_stub()
+    run_worker(args.port, debug=False)
+else:
+    # Loaded by gunicorn
+    from wsgi import app  # noqa: F401
+    install_stub()
@@ -0,0 +1,38 @@
+"""
+gunicorn settings for the backend (see wsgi.py)
+
+Each gunicorn instance runs a single worker process: Socket.IO keeps session
+state in the process that accepted the handshake, and gunicorn does not route
+a client's requests back to the same worker. Scale out with
+`run.py --server gunicorn --workers N`, which starts one instance per port,
+shares emits through the message queue and relies on main.py's sticky routing.
+"""
+import os
+
+# The Anthropic client's HTTP stack imports trio when it is installed, and trio
+# fails to import once gevent has patched `select` in the worker. Importing it
+# here, in the master before the workers fork and patch, avoids that.
+try:
+    import trio  # noqa: F401
+except ImportError:
+    pass
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+
+# One cooperative worker holds many idle sockets and in-flight LLM calls as greenlets
+workers = 1
+worker_class = 'gevent'
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Seconds an idle keep-alive connection from the proxy is held open
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# A gevent worker heartbeats from its event loop, so this only fires if the loop itself is blocked
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Seconds in-flight requests (e.g. a streaming chat reply) get to finish on restart or shutdown
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Set GUNICORN_ACCESS_LOG to an empty string to turn access logging off
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
@@ -0,0 +1,23 @@
+import argparse
+import logging
+from app import create_app, db
+from app.migrations import migrate, pending
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply database schema migrations')
+    parser.add_argument('--status', action='store_true', help='List pending migrations without applying them')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        if args.status:
+            for revision, module in pending(db.engine):
+                print(module.__name__.rsplit('.', 1)[-1])
+        else:
+            applied = migrate(db.engine)
+            logger.info(f"Applied {len(applied)} migration(s)")
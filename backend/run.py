@@ -1,23 +1,105 @@
 import os
-from app import create_app, socketio
+import sys
+import argparse
+import signal
+import subprocess
 import logging
+import time
+
+STARTED_AT = time.perf_counter()
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Create app instance
-app = create_app()
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
 
-if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 8000))
-    logger.info(f"Starting server on port {port}")
+def run_gunicorn(port):
+    """Replace this process with a gunicorn instance serving wsgi:app (see gunicorn.conf.py)"""
+    os.environ['PORT'] = str(port)
+    os.chdir(BACKEND_DIR)
+    logger.info(f"Starting gunicorn on port {port}")
+    os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'])
+
+def run_worker(port, debug=True):
+    """Serve the app in this process with the werkzeug development server"""
+    from app import create_app, socketio
+
+    # Create app instance
+    app = create_app()
     
+    # With the reloader on, only the child process it starts goes on to serve requests
+    if app.config['STARTUP_WARMUP'] and (not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        from app.services.warmup import warm_up
+        warm_up(app, started_at=STARTED_AT)
+
+    logger.info(f"Starting server on port {port}")
+
     # Run the socketio app
     socketio.run(
-        app, 
-        host='0.0.0.0', 
+        app,
+        host='0.0.0.0',
         port=port,
-        debug=True,
+        debug=debug,
+        use_reloader=debug,
         allow_unsafe_werkzeug=True  # For development only
     )
+
+def run_workers(port, workers, server='dev'):
+    """
+    Serve the app from several worker processes on consecutive ports
+
+    Worker i listens on port + i. A local message broker is started in this
+    process so an emit from any worker reaches clients on all of them, unless
+    SOCKETIO_MESSAGE_QUEUE already points at a shared queue. Socket.IO needs
+    sticky sessions, so the workers must sit behind a proxy that pins each
+    client to one port (main.py does this when BACKEND_WORKERS is set).
+    """
+    from app.services.message_queue import MessageBroker
+
+    env = dict(os.environ, BACKEND_WORKERS='1', BACKEND_WORKER_GROUP='1', BACKEND_SERVER=server)
+    broker = None
+    if not env.get('SOCKETIO_MESSAGE_QUEUE'):
+        broker = MessageBroker(port=int(os.environ.get('SOCKETIO_BROKER_PORT', 0))).start()
+        env['SOCKETIO_MESSAGE_QUEUE'] = broker.url
+
+    processes = []
+    for i in range(workers):
+        worker_env = dict(env, PORT=str(port + i))
+        processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=worker_env))
+    logger.info(f"Started {workers} workers on ports {port}-{port + workers - 1}")
+
+    def shutdown(signum, frame):
+        for process in processes:
+            process.terminate()
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    # Exit as soon as any worker dies, so the supervisor restarts the whole group
+    try:
+        os.wait()
+    except ChildProcessError:
+        pass
+    shutdown(None, None)
+    for process in processes:
+        process.wait()
+    if broker:
+        broker.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the backend server")
+    parser.add_argument('--server', choices=['dev', 'gunicorn'], default=os.environ.get('BACKEND_SERVER', 'dev'),
+                        help="werkzeug dev server, or gunicorn with a gevent worker for production "
+                             "(default: BACKEND_SERVER or dev)")
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('BACKEND_WORKERS', 1)),
+                        help="number of worker processes (default: BACKEND_WORKERS or 1)")
+    args = parser.parse_args()
+
+    port = int(os.environ.get('PORT', 8000))
+    if args.workers > 1:
+        run_workers(port, args.workers, args.server)
+    elif args.server == 'gunicorn':
+        run_gunicorn(port)
+    else:
+        # The reloader would restart a worker out from under its group
+        run_worker(port, debug='BACKEND_WORKER_GROUP' not in os.environ)
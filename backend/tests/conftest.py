@@ -0,0 +1,34 @@
+import os
+import tempfile
+import pytest
+
+# Point the app at a throwaway SQLite database before app.config is imported
+_db_dir = tempfile.mkdtemp(prefix='helix-test-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault('ANTHROPIC_API_KEY', 'test-key')
+
+from app import create_app, db
+from app.migrations import migrate
+from app.services.database import clear_db, init_db
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        migrate(db.engine)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user_id(app):
+    """ID of the default user, on an otherwise empty database"""
+    with app.app_context():
+        clear_db()
+        return init_db().id
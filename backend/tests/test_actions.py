@@ -0,0 +1,147 @@
+"""
+Action blocks in assistant replies: parsed in one pass, applied as one unit of work
+"""
+import pytest
+from app import db
+from app.models.sequence import Sequence, SequenceStep
+from app.services import actions, realtime
+from app.services.actions import parse_action_blocks, process_ai_action_blocks
+
+
+def block(action, body):
+    return f"---ACTION: {action}---\n{body}\n---END ACTION---"
+
+
+@pytest.fixture
+def events(monkeypatch):
+    """Realtime events published by the action engine, as (kind, sequence id, ops or whether to focus it)"""
+    published = []
+    monkeypatch.setattr(actions, 'publish_created',
+                        lambda sequence, focus=False: published.append(('created', _id(sequence), focus)))
+    monkeypatch.setattr(actions, 'publish_patch', lambda sequence, ops: published.append(('patch', sequence.id, ops)))
+    return published
+
+
+def _id(sequence):
+    return sequence['id'] if isinstance(sequence, dict) else sequence.id
+
+
+def _steps(sequence_id):
+    steps = SequenceStep.query.filter_by(sequence_id=sequence_id).order_by(SequenceStep.step_number).all()
+    return [(step.step_number, step.content) for step in steps]
+
+
+def test_parse_returns_every_block_in_order_and_the_stripped_text():
+    reply = "\n".join([
+        "Here you go.",
+        block('CREATE_SEQUENCE', '{"title": "T", "steps": []}'),
+        "Also:",
+        block('UPDATE_STEP', '{"step_number": 1, "content": "x"}'),
+        block('DELETE_STEP', 'not json'),
+        "Anything else?",
+    ])
+
+    parsed, text = parse_action_blocks(reply)
+
+    assert [action for action, _ in parsed] == ['CREATE_SEQUENCE', 'UPDATE_STEP']
+    assert parsed[1][1] == {'step_number': 1, 'content': 'x'}
+    assert 'ACTION' not in text
+    assert text.startswith("Here you go.") and text.endswith("Anything else?")
+
+
+def test_actions_after_create_apply_to_the_new_sequence(app, user_id, events):
+    reply = "Done. " + block(
+        'CREATE_SEQUENCE',
+        '{"title": "Backend", "steps": [{"content": "one", "step_number": 1}, {"content": "two", "step_number": 2}]}'
+    ) + block('UPDATE_STEP', '{"step_number": 2, "content": "second"}')
+
+    with app.app_context():
+        text, performed = process_ai_action_blocks(reply, user_id)
+
+        assert (text, performed) == ("Done.", True)
+        sequence = Sequence.query.filter_by(user_id=user_id).one()
+        assert _steps(sequence.id) == [(1, 'one'), (2, 'second')]
+        # The owner gets the finished sequence once, not a creation plus a patch, and it opens
+        assert events == [('created', sequence.id, True)]
+
+
+def test_edits_to_an_existing_sequence_are_one_commit_and_one_patch(app, user_id, events):
+    with app.app_context():
+        sequence = Sequence(user_id=user_id, title='Existing')
+        db.session.add(sequence)
+        db.session.flush()
+        db.session.add_all([
+            SequenceStep(sequence_id=sequence.id, step_number=i, content=f"step {i}") for i in (1, 2, 3)
+        ])
+        db.session.commit()
+        sequence_id, version = sequence.id, sequence.version
+
+        reply = (
+            block('ADD_STEP', '{"step_number": 1, "content": "intro"}')
+            + block('DELETE_STEP', '{"step_number": 3}')
+            + block('UPDATE_STEP', '{"step_number": 3, "type": "call", "content": "last"}')
+        )
+        _, performed = process_ai_action_blocks(reply, user_id)
+
+        assert performed
+        assert _steps(sequence_id) == [(1, 'intro'), (2, 'step 1'), (3, 'last')]
+        assert db.session.get(Sequence, sequence_id).version == version + 1
+
+        assert len(events) == 1
+        kind, patched_id, ops = events[0]
+        assert (kind, patched_id) == ('patch', sequence_id)
+        assert [op['op'] for op in ops] == ['step_added', 'step_removed', 'step_updated', 'steps_reordered']
+        assert len(ops[-1]['order']) == 3
+
+
+def test_a_failing_action_rolls_back_the_whole_reply(app, user_id, events, monkeypatch):
+    def fail(step):
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(actions, 'remove_step', fail)
+
+    reply = (
+        block('CREATE_SEQUENCE', '{"title": "T", "steps": [{"content": "a"}, {"content": "b"}]}')
+        + block('DELETE_STEP', '{"step_number": 1}')
+    )
+
+    with app.app_context():
+        text, performed = process_ai_action_blocks(reply, user_id)
+
+        assert (text, performed) == ("", False)
+        assert Sequence.query.filter_by(user_id=user_id).count() == 0
+        assert events == []
+
+
+def test_a_sequence_created_from_chat_asks_the_client_to_open_it(app, user_id, monkeypatch):
+    emitted = []
+    monkeypatch.setattr(realtime.socketio, 'emit', lambda event, data, **kwargs: emitted.append((event, data)))
+
+    with app.app_context():
+        # Another sequence is already open in the workspace
+        db.session.add(Sequence(user_id=user_id, title='Open'))
+        db.session.commit()
+
+        process_ai_action_blocks(block('CREATE_SEQUENCE', '{"title": "From chat", "steps": []}'), user_id)
+        realtime.publish_created(Sequence.query.filter_by(title='Open').one())
+
+    (_, chat_created), (_, other) = emitted
+    assert (chat_created['title'], chat_created['focus']) == ('From chat', True)
+    assert 'focus' not in other
+
+
+def test_step_numbers_sent_as_strings_or_null_do_not_fail_the_reply(app, user_id, events):
+    reply = (
+        block('CREATE_SEQUENCE', '{"title": "T", "steps": [{"content": "c", "step_number": "3"}, '
+                                 '{"content": "a", "step_number": null}, {"content": "b", "step_number": 2}]}')
+        + block('ADD_STEP', '{"step_number": "2", "content": "x"}')
+        + block('ADD_STEP', '{"step_number": "last", "content": "end"}')
+        + block('UPDATE_STEP', '{"step_number": "1", "content": "first"}')
+        + block('DELETE_STEP', '{"step_number": null}')
+    )
+
+    with app.app_context():
+        _, performed = process_ai_action_blocks(reply, user_id)
+
+        assert performed
+        sequence = Sequence.query.filter_by(user_id=user_id).one()
+        assert _steps(sequence.id) == [(1, 'first'), (2, 'x'), (3, 'b'), (4, 'c'), (5, 'end')]
@@ -0,0 +1,106 @@
+"""
+Admission control for AI calls: priority order, rate limits and load shedding
+"""
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from app.models.message import Message
+from app.services import ai
+from app.services.admission import AdmissionController, BULK, INTERACTIVE, STANDARD, TokenBucket, admission
+from app.services.llm_client import AIServiceError
+
+
+@pytest.fixture
+def shared_admission(app):
+    """The app's controller, restored to the configured limits afterwards"""
+    yield admission
+    admission.init_app(app)
+
+
+def test_token_bucket_refills_at_its_rate():
+    now = [0.0]
+    bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0])
+
+    assert bucket.try_take() == 0 and bucket.try_take() == 0
+    assert bucket.try_take() == pytest.approx(0.5)
+    now[0] = 0.5
+    assert bucket.try_take() == 0
+
+
+def test_waiting_calls_are_admitted_by_priority():
+    controller = AdmissionController()
+    controller.configure(max_concurrent=1)
+    order = []
+
+    def call(name, priority):
+        with controller.admit(priority=priority):
+            order.append(name)
+
+    controller.acquire()
+    threads = []
+    for name, priority in (('bulk', BULK), ('standard', STANDARD), ('chat', INTERACTIVE)):
+        thread = threading.Thread(target=call, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        while sum(controller.stats()['queue_depth'].values()) < len(threads):
+            time.sleep(0.005)
+
+    assert controller.stats()['queue_depth'] == {'interactive': 1, 'standard': 1, 'bulk': 1}
+    controller.release()
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ['chat', 'standard', 'bulk']
+    stats = controller.stats()
+    assert (stats['active'], stats['admitted']) == (0, 4)
+    assert stats['wait_ms']['max'] > 0
+
+
+def test_calls_are_shed_when_the_queue_wait_runs_out():
+    controller = AdmissionController()
+    controller.configure(max_concurrent=1, max_wait={BULK: 0.05})
+    controller.acquire()
+
+    start = time.monotonic()
+    with pytest.raises(AIServiceError) as raised:
+        controller.acquire(priority=BULK)
+
+    assert time.monotonic() - start < 1
+    assert (raised.value.kind, raised.value.http_status) == ('throttled', 429)
+    assert raised.value.retry_after >= 1
+    assert controller.stats()['rejected'] == {'queue_timeout': 1}
+    assert sum(controller.stats()['queue_depth'].values()) == 0
+
+
+def test_a_full_queue_sheds_new_calls():
+    controller = AdmissionController()
+    controller.configure(max_concurrent=1, max_queue=0)
+    controller.acquire()
+
+    with pytest.raises(AIServiceError):
+        controller.acquire()
+    assert controller.stats()['rejected'] == {'queue_full': 1}
+
+
+def test_a_user_over_their_rate_gets_429(app, client, user_id, shared_admission, monkeypatch):
+    reply = SimpleNamespace(
+        content=[SimpleNamespace(text='Sure.')],
+        usage=SimpleNamespace(input_tokens=1, output_tokens=1)
+    )
+    monkeypatch.setattr(ai.ai_service.resilient, 'call', lambda operation, timeout=None: reply)
+    shared_admission.configure(user_rate_per_minute=6, user_burst=1)
+
+    payload = {'content': 'Hello', 'stream': False, 'background': False}
+    assert client.post('/api/chat', json=payload).status_code == 201
+    response = client.post('/api/chat', json=payload)
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '10'
+    assert response.get_json()['error'] == 'throttled'
+    with app.app_context():
+        assert [message.role for message in Message.query.filter_by(user_id=user_id)] == ['user', 'assistant', 'user']
+
+    stats = client.get('/api/metrics').get_json()['ai_admission']
+    assert stats['rejected'] == {'user_rate': 1}
+    assert stats['tracked_users'] == 1
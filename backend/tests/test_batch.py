@@ -0,0 +1,51 @@
+"""
+Batch sequence generation: each item streams back its own NDJSON result, and a failing item does not stop the rest
+"""
+import json
+import uuid
+from app.models.sequence import Sequence
+from app.services import ai
+from app.services.llm_client import AIServiceError
+
+
+def test_failed_items_are_reported_and_the_rest_are_saved(app, client, user_id, monkeypatch):
+    def generate(job_title, company_name, details=None, **kwargs):
+        if job_title == 'Overloaded':
+            raise AIServiceError('overloaded', 'scripted', retryable=True)
+        if job_title == 'Broken':
+            raise RuntimeError('boom')
+        if job_title == 'Empty':
+            return []
+        return [{'type': 'email', 'content': f'Hi from {company_name}'}]
+    monkeypatch.setattr(ai.ai_service, 'generate_outreach_sequence', generate)
+
+    # The cache outlives each test's database reset, so the companies are new every run
+    company = f'Acme {uuid.uuid4().hex}'
+    items = [
+        {'job_title': 'Engineer', 'company_name': company},
+        {'job_title': 'Overloaded', 'company_name': company},
+        {'job_title': 'Designer'},
+        {'job_title': 'Broken', 'company_name': company},
+        'not an item',
+        {'job_title': 'Empty', 'company_name': company},
+        {'job_title': 'Recruiter', 'company_name': company},
+    ]
+
+    response = client.post('/api/sequences/generate/batch', json={'items': items})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    results = {record['index']: record for record in map(json.loads, response.get_data(as_text=True).splitlines())}
+    assert sorted(results) == list(range(len(items)))
+    assert {index for index, record in results.items() if record['status'] == 'ok'} == {0, 6}
+    assert results[1]['kind'] == 'overloaded'
+    assert results[2]['error'] == 'Job title and company name are required'
+    assert results[3]['error'] == 'boom'
+    assert results[4]['error'] == 'Job title and company name are required'
+    assert results[5]['error'] == 'Failed to generate sequence'
+    assert results[6]['sequence']['steps'][0]['content'] == f'Hi from {company}'
+
+    with app.app_context():
+        assert sorted(sequence.title for sequence in Sequence.query.filter_by(user_id=user_id)) == [
+            f'Engineer at {company}', f'Recruiter at {company}'
+        ]
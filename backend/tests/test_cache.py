@@ -0,0 +1,67 @@
+"""
+The generated-sequence cache: entries depend only on the request, so workspace writes leave them alone,
+while bypass and expiry regenerate them
+"""
+import uuid
+import pytest
+from app.routes import chat
+from app.services import ai
+
+
+@pytest.fixture
+def generations(monkeypatch):
+    """Calls to the model, each returning steps that name the call they came from"""
+    calls = []
+
+    def generate(job_title, company_name, details=None, on_step=None, **kwargs):
+        calls.append((job_title, company_name))
+        return [{'type': 'email', 'content': f'Generation {len(calls)}'}, {'type': 'call', 'content': 'Call'}]
+
+    monkeypatch.setattr(ai.ai_service, 'generate_outreach_sequence', generate)
+    return calls
+
+
+@pytest.fixture
+def request_body():
+    # The cache outlives each test's database reset, so every test asks for a company of its own
+    return {'job_title': 'Backend Engineer', 'company_name': f'Acme {uuid.uuid4().hex}'}
+
+
+def generate(client, body, **params):
+    response = client.post('/api/sequences/generate', json=body, query_string=params)
+    assert response.status_code == 201
+    return response.headers['X-Cache'], [step['content'] for step in response.get_json()['steps']]
+
+
+def test_workspace_writes_leave_the_cached_generation_alone(client, user_id, generations, request_body,
+                                                             monkeypatch):
+    assert generate(client, request_body) == ('MISS', ['Generation 1', 'Call'])
+
+    # Edit the sequence made from the generation, and chat about it
+    sequence = client.get('/api/sequences').get_json()[0]
+    first, second = sequence['steps']
+    assert client.put(f"/api/sequences/{sequence['id']}/steps/{first['id']}",
+                      json={'content': 'Edited'}).status_code == 200
+    assert client.delete(f"/api/steps/{second['id']}").status_code == 200
+    assert client.post(f"/api/sequences/{sequence['id']}/steps", json={'content': 'Added'}).status_code == 201
+    monkeypatch.setattr(ai.ai_service, 'get_chat_response', lambda content, chat_history=None, **kwargs: 'Sure.')
+    monkeypatch.setattr(chat, 'schedule_fold', lambda user_id, through_id: None)
+    assert client.post('/api/chat', json={'content': 'Shorten it', 'stream': False, 'background': False}).status_code == 201
+
+    assert generate(client, request_body) == ('HIT', ['Generation 1', 'Call'])
+    assert [step['content'] for step in client.get(f"/api/sequences/{sequence['id']}/steps").get_json()] == [
+        'Edited', 'Added'
+    ]
+    assert len(generations) == 1
+
+
+def test_bypass_and_expiry_replace_the_cached_generation(app, client, user_id, generations, request_body,
+                                                          monkeypatch):
+    generate(client, request_body)
+
+    assert generate(client, request_body, cache='bypass') == ('BYPASS', ['Generation 2', 'Call'])
+    assert generate(client, request_body) == ('HIT', ['Generation 2', 'Call'])
+
+    monkeypatch.setitem(app.config, 'SEQUENCE_CACHE_TTL', 0)
+    assert generate(client, request_body) == ('MISS', ['Generation 3', 'Call'])
+    assert len(generations) == 3
@@ -0,0 +1,111 @@
+"""
+Chat context: recent history within a token budget, older turns folded into a persisted summary
+"""
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.models.conversation_summary import ConversationSummary
+from app.models.message import Message
+from app.services import context
+from app.services.context import build_chat_context, fold_history, message_tokens
+
+
+@pytest.fixture
+def budget(app):
+    saved = {key: app.config[key] for key in ('CHAT_CONTEXT_TOKEN_BUDGET', 'CHAT_CONTEXT_MAX_MESSAGES')}
+    app.config.update(CHAT_CONTEXT_TOKEN_BUDGET=100, CHAT_CONTEXT_MAX_MESSAGES=50)
+    yield app.config
+    app.config.update(saved)
+
+
+def add_history(user_id, count, words=6):
+    """Alternating user/assistant turns of about 10 tokens each; returns their ids oldest first"""
+    start = datetime(2025, 1, 1)
+    messages = [
+        Message(
+            user_id=user_id,
+            content=' '.join([f'turn{i:03d}'] * words),
+            role='user' if i % 2 == 0 else 'assistant',
+            timestamp=start + timedelta(minutes=i)
+        )
+        for i in range(count)
+    ]
+    db.session.add_all(messages)
+    db.session.commit()
+    return [message.id for message in messages]
+
+
+def test_history_is_filled_newest_first_within_the_budget(app, user_id, budget):
+    with app.app_context():
+        ids = add_history(user_id, 40)
+        cost = message_tokens(db.session.get(Message, ids[0]))
+
+        summary, history, fold_through_id = build_chat_context(user_id, exclude_message_id=ids[-1])
+
+        assert summary is None
+        assert sum(cost for _ in history) <= 100
+        assert history[-1]['content'].startswith('turn038')
+        assert history[0]['role'] == 'user'
+        # Folding frees half the budget, so it stops at the newest turn outside that half
+        assert fold_through_id == ids[-2 - 50 // cost]
+
+
+def test_short_history_needs_no_fold(app, user_id, budget):
+    with app.app_context():
+        ids = add_history(user_id, 4)
+        _, history, fold_through_id = build_chat_context(user_id, exclude_message_id=ids[-1])
+
+        assert len(history) == 3
+        assert fold_through_id is None
+
+
+def test_turns_past_the_message_cap_are_folded_not_dropped(app, user_id, budget):
+    budget.update(CHAT_CONTEXT_TOKEN_BUDGET=6000, CHAT_CONTEXT_MAX_MESSAGES=20)
+    with app.app_context():
+        ids = add_history(user_id, 120, words=1)
+
+        _, history, fold_through_id = build_chat_context(user_id, exclude_message_id=ids[-1])
+
+        assert len(history) <= 20
+        # Folding frees half the message cap
+        assert fold_through_id == ids[-2 - 20 // 2]
+
+
+def test_missing_token_counts_are_filled_in_once(app, user_id, budget):
+    with app.app_context():
+        ids = add_history(user_id, 4)
+        db.session.execute(db.update(Message).values(token_count=None))
+        db.session.commit()
+
+        build_chat_context(user_id)
+
+        db.session.expire_all()
+        assert all(db.session.get(Message, message_id).token_count for message_id in ids)
+
+
+def test_folded_turns_are_replaced_by_the_summary(app, user_id, budget, monkeypatch):
+    folded = []
+
+    def summarize(summary, messages, max_tokens=500, user_id=None):
+        folded.append([message['content'][:7] for message in messages])
+        return (summary + ' ' if summary else '') + f'{len(messages)} turns'
+
+    monkeypatch.setattr(context.ai_service, 'summarize_conversation', summarize)
+
+    with app.app_context():
+        ids = add_history(user_id, 40)
+        _, _, fold_through_id = build_chat_context(user_id, exclude_message_id=ids[-1])
+
+        assert fold_history(user_id, fold_through_id)
+        covered = ids.index(fold_through_id) + 1
+        assert folded == [[f'turn{i:03d}' for i in range(covered)]]
+
+        stored = ConversationSummary.query.filter_by(user_id=user_id).one()
+        assert (stored.content, stored.covered_through_id) == (f'{covered} turns', fold_through_id)
+
+        # The next turn starts after the folded messages and leaves room for the summary
+        summary, history, _ = build_chat_context(user_id, exclude_message_id=ids[-1])
+        assert summary == f'{covered} turns'
+        assert int(history[0]['content'][4:7]) > covered - 1
+        # Already covered, so a repeated fold does nothing
+        assert not fold_history(user_id, fold_through_id)
@@ -0,0 +1,65 @@
+"""
+The fake Messages API used for load tests: canned replies for the recruiter flow, and injected errors
+"""
+import random
+import pytest
+from benchmarks.fake_anthropic import FakeMessagesAPI, Profile, distribution, parse_errors
+from app.services.ai import AnthropicAI
+from app.services.llm_client import AIServiceError
+
+
+@pytest.fixture
+def fake_service():
+    servers = []
+
+    def start(profile):
+        server = FakeMessagesAPI(profile=profile)
+        servers.append(server)
+        service = AnthropicAI()
+        service.configure(base_url=server.url, timeout=5, connect_timeout=1, max_attempts=1)
+        return server, service
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def test_canned_replies_play_the_assistant_in_the_recruiter_flow(fake_service):
+    server, service = fake_service(Profile(ttft=0.01, token_rate=5000, seed=1))
+    ask = 'Create a sequence for a backend engineer at Acme'
+
+    assert service.warm_up()
+    question = service.stream_chat_response(ask)
+    assert question.rstrip().endswith('?')
+    history = [{'role': 'user', 'content': ask}, {'role': 'assistant', 'content': question}]
+    assert '---ACTION: CREATE_SEQUENCE---' in service.get_chat_response('Go and Postgres', history)
+    assert '---ACTION: UPDATE_STEP---' in service.get_chat_response('Shorten step 2 please')
+
+    steps = service.generate_outreach_sequence('Backend Engineer', 'Acme', on_step=lambda index, step: None)
+    assert [step['type'] for step in steps] == ['email', 'message', 'email', 'call']
+    assert 'Backend Engineer at Acme' in steps[0]['content']
+    assert server.stats()['responses'] == {'clarify 200': 1, 'create_sequence 200': 1, 'edit_step 200': 1,
+                                           'tool 200': 1}
+
+
+def test_injected_errors_and_dropped_streams(fake_service):
+    server, service = fake_service(Profile(ttft=0.01, token_rate=5000, errors={429: 1.0}, retry_after=2))
+
+    with pytest.raises(AIServiceError) as raised:
+        service.get_chat_response('Hi')
+    assert raised.value.kind == 'rate_limited'
+
+    server.profile = Profile(ttft=0.01, token_rate=5000, cut_rate=1.0)
+    with pytest.raises(AIServiceError) as raised:
+        service.stream_chat_response('How do I keep candidates engaged?')
+    assert raised.value.partial
+
+
+def test_profile_settings_are_parsed():
+    assert distribution('0.5')(None) == 0.5
+    assert 1 <= distribution('uniform:1,2')(random.Random(0)) <= 2
+    assert parse_errors('429=0.02, 529=0.01') == {429: 0.02, 529: 0.01}
+    with pytest.raises(ValueError):
+        distribution('gamma:1,2')
+    with pytest.raises(ValueError):
+        parse_errors('500=0.8,529=0.5')
@@ -0,0 +1,69 @@
+"""
+Background jobs: the worker pool records each job's outcome, and clients read it back from the job status route
+"""
+import time
+import pytest
+from app.routes import chat
+from app.services import ai
+from app.services.jobs import JobRunner
+from app.services.llm_client import AIServiceError
+
+
+def wait_for(read_job, job_id):
+    deadline = time.monotonic() + 5
+    while True:
+        job = read_job(job_id)
+        if job['status'] in ('completed', 'failed'):
+            return job
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.01)
+
+
+def test_the_pool_records_results_and_failures(app):
+    runner = JobRunner()
+
+    def fail():
+        raise RuntimeError('boom')
+
+    with app.app_context():
+        done = runner.submit('sum', lambda a, b: a + b, 2, b=3)
+        failed = runner.submit('fail', fail)
+
+    job = wait_for(runner.get, done)
+    assert (job['kind'], job['status'], job['result'], job['error']) == ('sum', 'completed', 5, None)
+    job = wait_for(runner.get, failed)
+    assert (job['status'], job['result'], job['error']) == ('failed', None, 'boom')
+    assert job['finished_at'] is not None
+    assert runner.get('unknown') is None
+
+
+@pytest.fixture
+def read_job(client):
+    return lambda job_id: client.get(f'/api/chat/jobs/{job_id}').get_json()
+
+
+def test_a_background_reply_is_reported_by_the_job_route(client, user_id, read_job, monkeypatch):
+    monkeypatch.setattr(ai.ai_service, 'get_chat_response', lambda content, chat_history=None, **kwargs: 'Sure.')
+    monkeypatch.setattr(chat, 'schedule_fold', lambda user_id, through_id: None)
+
+    response = client.post('/api/chat', json={'content': 'Hello', 'stream': False, 'background': True})
+
+    assert response.status_code == 202
+    job = wait_for(read_job, response.get_json()['job_id'])
+    assert job['status'] == 'completed'
+    assert job['result']['role'] == 'assistant'
+    assert job['result']['content'] == 'Sure.'
+
+
+def test_a_failed_background_reply_is_marked_failed(client, user_id, read_job, monkeypatch):
+    def overloaded(*args, **kwargs):
+        raise AIServiceError('overloaded', 'scripted', retryable=True)
+    monkeypatch.setattr(ai.ai_service, 'get_chat_response', overloaded)
+
+    response = client.post('/api/chat', json={'content': 'Hello', 'stream': False, 'background': True})
+
+    job = wait_for(read_job, response.get_json()['job_id'])
+    assert job['status'] == 'failed'
+    assert job['result'] is None
+    assert job['error'] == 'scripted'
+    assert client.get('/api/chat/jobs/unknown').status_code == 404
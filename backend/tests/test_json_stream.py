@@ -0,0 +1,32 @@
+"""
+Incremental parsing of streamed tool input
+"""
+import json
+import random
+from app.utils.json_stream import ArrayItemStream
+
+
+def test_items_come_out_whole_however_the_document_is_split():
+    document = {
+        'title': 'not [the] "steps": [{}]',
+        'steps': [
+            {'type': 'email', 'content': 'Hi {name}, see ] and } and "quotes" \\ here\n'},
+            {'type': 'call', 'content': '[]{}', 'notes': {'nested': [1, {'a': 2}]}},
+            'skipped'
+        ],
+        'after': [{'ignored': True}]
+    }
+    text = json.dumps(document)
+    rng = random.Random(7)
+
+    for _ in range(50):
+        stream = ArrayItemStream('steps')
+        items = []
+        position = 0
+        while position < len(text):
+            size = rng.randint(1, 9)
+            items += stream.feed(text[position:position + size])
+            position += size
+
+        assert items == document['steps'][:2]
+        assert stream.close() == document
@@ -0,0 +1,188 @@
+"""
+The AI client's deadlines, retries, circuit breaker and structured errors, against a local fake Messages API
+"""
+import json
+import time
+import pytest
+from benchmarks.fake_anthropic import FakeMessagesAPI
+from app.models.message import Message
+from app.services import ai
+from app.services.ai import AnthropicAI
+from app.services.llm_client import AIServiceError, CircuitBreaker
+
+
+@pytest.fixture
+def fake_api():
+    servers = []
+
+    def start(*script, **settings):
+        server = FakeMessagesAPI(script)
+        servers.append(server)
+        service = AnthropicAI()
+        service.configure(**{
+            'base_url': server.url, 'timeout': 5, 'connect_timeout': 1, 'max_attempts': 3,
+            'retry_base_delay': 0.01, 'retry_max_delay': 0.05, 'breaker_threshold': 3, 'breaker_reset': 60,
+            **settings
+        })
+        return server, service
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def test_overloaded_responses_are_retried(fake_api):
+    server, service = fake_api({'status': 529}, {'status': 500}, {'text': 'Hello there'})
+
+    assert service.get_chat_response('Hi') == 'Hello there'
+    assert server.requests == 3
+    assert service.resilient.stats()['retries'] == 2
+
+
+def test_client_errors_are_not_retried_and_do_not_trip_the_breaker(fake_api):
+    server, service = fake_api({'status': 400})
+
+    with pytest.raises(AIServiceError) as raised:
+        service.get_chat_response('Hi')
+
+    assert (raised.value.kind, raised.value.status_code, server.requests) == ('bad_request', 400, 1)
+    assert service.resilient.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_a_slow_provider_fails_at_the_deadline(fake_api):
+    server, service = fake_api({'delay': 3, 'text': 'too late'}, timeout=0.5)
+
+    start = time.monotonic()
+    with pytest.raises(AIServiceError) as raised:
+        service.get_chat_response('Hi')
+
+    assert raised.value.kind == 'timeout'
+    assert raised.value.http_status == 504
+    assert time.monotonic() - start < 1.5
+
+
+def test_the_breaker_opens_after_repeated_failures_and_fails_fast(fake_api):
+    server, service = fake_api({'status': 503, 'headers': {'Retry-After': '0'}}, max_attempts=1)
+
+    for _ in range(3):
+        with pytest.raises(AIServiceError) as raised:
+            service.get_chat_response('Hi')
+        assert raised.value.kind == 'server_error'
+
+    with pytest.raises(AIServiceError) as raised:
+        service.get_chat_response('Hi')
+
+    assert raised.value.kind == 'circuit_open'
+    assert raised.value.retry_after > 0
+    assert server.requests == 3
+    assert service.resilient.stats()['circuit']['state'] == CircuitBreaker.OPEN
+
+
+def test_a_local_failure_during_a_probe_does_not_close_the_breaker(fake_api):
+    server, service = fake_api({'status': 503}, {'text': 'one two three'}, max_attempts=1, breaker_threshold=1,
+                               breaker_reset=0.05)
+    with pytest.raises(AIServiceError):
+        service.get_chat_response('Hi')
+    time.sleep(0.1)
+
+    def on_text(text):
+        raise RuntimeError('emit failed')
+
+    with pytest.raises(AIServiceError) as raised:
+        service.stream_chat_response('Hi', on_text=on_text)
+
+    assert raised.value.kind == 'error'
+    assert service.resilient.breaker.state == CircuitBreaker.HALF_OPEN
+    # The next call is let through as the probe, and its answer closes the breaker
+    assert service.get_chat_response('Hi').split() == ['one', 'two', 'three']
+    assert service.resilient.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_the_breaker_closes_after_a_successful_probe():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    with pytest.raises(AIServiceError):
+        breaker.before_call()
+
+    now[0] = 11
+    breaker.before_call()  # the probe
+    with pytest.raises(AIServiceError):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_streams_deliver_fragments_and_keep_partial_text_when_cut(fake_api):
+    server, service = fake_api({'text': 'one two three'}, {'text': 'alpha beta gamma', 'cut_after': 2})
+
+    fragments = []
+    assert service.stream_chat_response('Hi', on_text=fragments.append).split() == ['one', 'two', 'three']
+    assert len(fragments) == 3
+
+    with pytest.raises(AIServiceError) as raised:
+        service.stream_chat_response('Hi')
+
+    # Text was already shown, so the call is not repeated
+    assert raised.value.partial.split() == ['alpha', 'beta']
+    assert server.requests == 2
+
+
+def test_a_failed_reply_is_reported_and_not_saved(app, client, user_id, monkeypatch):
+    def overloaded(*args, **kwargs):
+        raise AIServiceError('overloaded', 'scripted', retryable=True, retry_after=2.5)
+    monkeypatch.setattr(ai.ai_service, 'get_chat_response', overloaded)
+
+    response = client.post('/api/chat', json={'content': 'Hello', 'stream': False, 'background': False})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '3'
+    assert response.get_json()['error'] == 'overloaded'
+    with app.app_context():
+        assert [message.role for message in Message.query.filter_by(user_id=user_id)] == ['user']
+
+
+STEPS = [
+    {'type': 'email', 'content': 'Subject: Hello\n\nHi {name}, the role pays [DOE] and uses C++ {templates}.'},
+    {'type': 'message', 'content': 'Following up on my note ]'},
+    {'type': 'call', 'content': 'Call script'},
+]
+
+
+def test_sequence_steps_stream_in_as_each_one_closes(fake_api):
+    server, service = fake_api({'tool_input': json.dumps({'steps': STEPS}), 'chunk': 8, 'chunk_delay': 0.005})
+
+    shown = []
+    steps = service.generate_outreach_sequence(
+        'Engineer', 'Acme', on_step=lambda index, step: shown.append((index, step, time.monotonic()))
+    )
+    finished = time.monotonic()
+
+    # Brackets inside step content no longer cut the sequence short
+    assert steps == STEPS
+    assert [(index, step) for index, step, _ in shown] == list(enumerate(STEPS))
+    assert finished - shown[0][2] > 0.05
+    assert service.router.stats()['routes']['full']['first_token_ms']['p50'] is not None
+
+
+def test_a_sequence_cut_off_after_steps_were_shown_is_not_regenerated(fake_api):
+    server, service = fake_api({'tool_input': json.dumps({'steps': STEPS}), 'chunk': 8, 'cut_after': 18})
+
+    shown = []
+    with pytest.raises(AIServiceError) as raised:
+        service.generate_outreach_sequence('Engineer', 'Acme', on_step=lambda index, step: shown.append(step))
+
+    assert shown == STEPS[:1]
+    assert json.loads(raised.value.partial) == STEPS[:1]
+    assert server.requests == 1
+
+
+def test_a_truncated_sequence_is_a_bad_response(fake_api):
+    server, service = fake_api({'tool_input': json.dumps({'steps': STEPS})[:-10], 'stop_reason': 'max_tokens'})
+
+    with pytest.raises(AIServiceError) as raised:
+        service.generate_outreach_sequence('Engineer', 'Acme')
+
+    assert raised.value.kind == 'bad_response'
+    assert 'token limit' in str(raised.value)
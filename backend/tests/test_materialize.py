@@ -0,0 +1,33 @@
+"""
+Generated sequences are saved with one bulk insert per table, and their payload needs no read-back
+"""
+from sqlalchemy import event
+from app import db
+from app.models.sequence import Sequence
+from app.services.materialize import materialize_sequences
+
+
+def test_payload_matches_the_saved_rows_without_reading_them_back(app, user_id):
+    drafts = [
+        (f"Role {n}", [{'content': f"step {i}", 'type': 'email' if i % 2 else 'call'} for i in range(1, 4)])
+        for n in range(3)
+    ]
+
+    with app.app_context():
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement.split()[0])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            payloads = materialize_sequences(user_id, drafts)
+            db.session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        # All the steps go in one statement; on PostgreSQL the sequences do too, while
+        # SQLite cannot order RETURNING rows for a multi-row insert and uses one per sequence
+        sequence_inserts = 1 if db.engine.dialect.name == 'postgresql' else len(drafts)
+        assert statements == ['INSERT'] * (sequence_inserts + 1)
+
+        db.session.expire_all()
+        for payload in payloads:
+            assert payload == db.session.get(Sequence, payload['id']).to_dict()
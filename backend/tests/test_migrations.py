@@ -0,0 +1,37 @@
+"""
+Migrations on a fresh database: the initial one builds the frozen baseline, and the rest bring it up to the models
+"""
+from sqlalchemy import create_engine, inspect
+from app import db
+from app.migrations import migrate
+from app.migrations import m0001_initial_schema
+
+
+def columns(engine):
+    inspector = inspect(engine)
+    return {
+        table: {column['name'] for column in inspector.get_columns(table)}
+        for table in inspector.get_table_names() if table != 'schema_migrations'
+    }
+
+
+def test_the_initial_migration_does_not_follow_the_models(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'initial.db'}")
+    with engine.begin() as conn:
+        m0001_initial_schema.upgrade(conn)
+
+    tables = columns(engine)
+    assert set(tables) == {'users', 'messages', 'sequences', 'sequence_steps', 'generation_cache'}
+    assert 'version' not in tables['sequences']
+    assert 'token_count' not in tables['messages']
+
+
+def test_all_migrations_build_the_model_schema(app, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    migrate(engine)
+
+    assert columns(engine) == {
+        table.name: {column.name for column in table.columns} for table in db.metadata.sorted_tables
+    }
+    indexes = {index['name'] for index in inspect(engine).get_indexes('sequence_steps')}
+    assert 'uq_sequence_steps_sequence_step' in indexes
@@ -0,0 +1,78 @@
+"""
+Model routing: cheap chat turns to the fast model, generations to the full one, with per-route stats
+"""
+import os
+from types import SimpleNamespace
+import pytest
+from anthropic.resources.messages.messages import DEPRECATED_MODELS
+from app.config import Config
+from app.services import ai
+from app.services.model_router import DEFAULT_MODELS, FAST, FULL, ModelRouter, chat_kind, parse_rules
+
+
+@pytest.mark.parametrize('message, history, kind', [
+    ('Create a sequence for a backend engineer at Stripe', [], 'clarify'),
+    ('Can you update step 2 to sound less formal?', [], 'step_edit'),
+    ('Delete the last step', [{'role': 'assistant', 'content': 'Done, the sequence is saved.'}], 'step_edit'),
+    ('5 years of Go, and add a call step', [
+        {'role': 'user', 'content': 'Create a sequence for a backend engineer at Stripe'},
+        {'role': 'assistant', 'content': 'What skills matter most for this role?'}
+    ], 'chat'),
+    ('Mostly Go and distributed systems', [
+        {'role': 'user', 'content': 'Create a sequence for a backend engineer at Stripe'},
+        {'role': 'assistant', 'content': 'What skills matter most for this role?'}
+    ], 'chat'),
+    ('How do I keep candidates engaged?', [], 'chat'),
+])
+def test_chat_turns_are_classified(message, history, kind):
+    assert chat_kind(message, history) == kind
+
+
+def test_the_default_fast_model_is_not_retired():
+    # The SDK lists models that are retired or have a retirement date
+    assert DEFAULT_MODELS[FAST] not in DEPRECATED_MODELS
+    if 'AI_FAST_MODEL' not in os.environ:
+        assert Config.AI_FAST_MODEL == DEFAULT_MODELS[FAST]
+
+
+def test_rules_and_overrides():
+    router = ModelRouter()
+    router.configure(models={FAST: 'small-model'}, rules=parse_rules('summary=full, chat=fast'))
+
+    assert router.route('summary') == (FULL, 'claude-3-5-sonnet-20241022', 'summary')
+    assert router.route('chat').model == 'small-model'
+    assert router.route('clarify', override='full').name == FULL
+    assert router.route('sequence', override='small-model').name == FAST
+    with pytest.raises(ValueError):
+        router.route('chat', override='some-other-model')
+    with pytest.raises(ValueError):
+        router.configure(rules={'chat': 'medium'})
+    with pytest.raises(ValueError):
+        parse_rules('chat')
+
+
+def test_chat_calls_use_the_routed_model_and_are_counted(app, client, user_id, monkeypatch):
+    sent = []
+
+    def call(operation, timeout=None):
+        def create(**kwargs):
+            sent.append(kwargs['model'])
+            return SimpleNamespace(
+                content=[SimpleNamespace(text='What skills matter most?')],
+                usage=SimpleNamespace(input_tokens=100, output_tokens=8)
+            )
+        return operation(SimpleNamespace(messages=SimpleNamespace(create=create)), timeout)
+
+    monkeypatch.setattr(ai.ai_service.resilient, 'call', call)
+    before = ai.ai_service.router.stats()['routes'][FAST]['calls']
+
+    payload = {'content': 'Create a sequence for a designer at Figma', 'stream': False, 'background': False}
+    assert client.post('/api/chat', json=payload).status_code == 201
+    assert client.post('/api/chat', json={**payload, 'content': 'UX research', 'model': 'fast'}).status_code == 201
+    assert client.post('/api/chat', json={**payload, 'model': 'gpt-9'}).status_code == 400
+
+    assert sent == [ai.ai_service.router.models[FAST]] * 2
+    stats = client.get('/api/metrics').get_json()['ai_routing']['routes'][FAST]
+    assert stats['calls'] == before + 2
+    assert stats['kinds']['clarify'] >= 1
+    assert stats['latency_ms']['p50'] is not None
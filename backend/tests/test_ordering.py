@@ -0,0 +1,28 @@
+"""
+Step positions sent to the step routes: inserts and moves renumber the sequence, bad positions are rejected
+"""
+
+
+def step_contents(client, sequence_id):
+    return [step['content'] for step in client.get(f'/api/sequences/{sequence_id}/steps').get_json()]
+
+
+def test_step_numbers_sent_as_strings_are_accepted_and_bad_ones_rejected(client, user_id):
+    sequence_id = client.post('/api/sequences', json={'title': 'Ordering'}).get_json()['id']
+    for content in ('a', 'b', 'c'):
+        assert client.post(f'/api/sequences/{sequence_id}/steps', json={'content': content}).status_code == 201
+
+    response = client.post(f'/api/sequences/{sequence_id}/steps', json={'content': 'x', 'step_number': '2'})
+    assert response.status_code == 201
+    assert step_contents(client, sequence_id) == ['a', 'x', 'b', 'c']
+
+    step_id = response.get_json()['id']
+    assert client.put(f'/api/sequences/{sequence_id}/steps/{step_id}', json={'step_number': '4'}).status_code == 200
+    assert step_contents(client, sequence_id) == ['a', 'b', 'c', 'x']
+
+    for bad in ('two', 2.5, [2]):
+        assert client.post(f'/api/sequences/{sequence_id}/steps',
+                           json={'content': 'y', 'step_number': bad}).status_code == 400
+        assert client.put(f'/api/sequences/{sequence_id}/steps/{step_id}',
+                          json={'content': 'y', 'step_number': bad}).status_code == 400
+    assert step_contents(client, sequence_id) == ['a', 'b', 'c', 'x']
@@ -0,0 +1,112 @@
+"""
+Query-plan checks for the hot routes
+
+Every SELECT a hot route issues is run through EXPLAIN QUERY PLAN and the test
+fails if any of them reads a hot table with a full scan instead of an index search.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.message import Message
+from app.models.sequence import Sequence, SequenceStep
+from app.routes import chat
+from app.services.ai import ai_service
+from app.utils.helpers import encode_cursor
+
+HOT_TABLES = ('messages', 'sequences', 'sequence_steps')
+
+
+@pytest.fixture
+def history(app, user_id):
+    """A user with a realistic amount of chat and sequence history"""
+    start = datetime(2025, 1, 1)
+    with app.app_context():
+        for i in range(200):
+            db.session.add(Message(
+                user_id=user_id,
+                content=f'message {i}',
+                role='user' if i % 2 == 0 else 'assistant',
+                timestamp=start + timedelta(minutes=i)
+            ))
+        for i in range(300):
+            sequence = Sequence(user_id=user_id, title=f'Sequence {i}', created_at=start + timedelta(hours=i))
+            sequence.steps = [
+                SequenceStep(step_number=n, content=f'Step {n}', type='email')
+                for n in range(1, 6)
+            ]
+            db.session.add(sequence)
+        db.session.commit()
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        return {
+            'sequence_id': Sequence.query.first().id,
+            'message_cursor': encode_cursor(start + timedelta(minutes=100), 101),
+            'sequence_cursor': encode_cursor(start + timedelta(hours=150), 151)
+        }
+
+
+@contextmanager
+def captured_selects(app):
+    """Collect every SELECT statement (with parameters) run while the block executes"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def full_scans(app, statements):
+    """Get the EXPLAIN QUERY PLAN lines that scan a hot table end to end"""
+    scans = []
+    with app.app_context():
+        connection = db.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            for statement, parameters in statements:
+                for row in cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters):
+                    detail = row[-1]
+                    if any(detail.startswith(f'SCAN {table}') for table in HOT_TABLES):
+                        scans.append(f'{detail}  <-  {" ".join(statement.split())}')
+        finally:
+            connection.close()
+    return scans
+
+
+@pytest.mark.parametrize('path', [
+    '/api/chat',
+    '/api/chat?before={message_cursor}',
+    '/api/chat?after={message_cursor}',
+    '/api/sequences',
+    '/api/sequences?include_steps=false',
+    '/api/sequences?cursor={sequence_cursor}',
+    '/api/sequences/{sequence_id}',
+    '/api/sequences/{sequence_id}/steps',
+])
+def test_read_routes_use_indexes(app, client, history, path):
+    with captured_selects(app) as statements:
+        response = client.get(path.format(**history))
+
+    assert response.status_code == 200
+    assert statements
+    assert full_scans(app, statements) == []
+
+
+def test_send_message_history_read_uses_indexes(app, client, history, monkeypatch):
+    monkeypatch.setattr(ai_service, 'get_chat_response', lambda content, chat_history=None, **kwargs: 'Sure.')
+    monkeypatch.setattr(chat, 'schedule_fold', lambda user_id, through_id: None)
+
+    with captured_selects(app) as statements:
+        response = client.post('/api/chat', json={'content': 'Hello', 'stream': False, 'background': False})
+
+    assert response.status_code == 201
+    assert full_scans(app, statements) == []
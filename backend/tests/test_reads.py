@@ -0,0 +1,65 @@
+"""
+The column-tuple list endpoints and the orjson provider return what the ORM and Flask's default provider did
+"""
+from datetime import datetime, timedelta
+import pytest
+from flask.json.provider import DefaultJSONProvider
+from app import db
+from app.models.message import Message
+from app.models.sequence import Sequence, SequenceStep
+from app.utils.json_provider import OrjsonProvider, orjson
+
+
+@pytest.fixture
+def workspace(app, user_id):
+    start = datetime(2025, 1, 1, 9, 30, 15, 250000)
+    with app.app_context():
+        for i in range(6):
+            db.session.add(Message(
+                user_id=user_id,
+                content=f'message {i} — café',
+                role='user' if i % 2 == 0 else 'assistant',
+                timestamp=start + timedelta(minutes=i)
+            ))
+        for i in range(4):
+            sequence = Sequence(user_id=user_id, title=f'Sequence {i}', created_at=start + timedelta(hours=i))
+            sequence.steps = [SequenceStep(step_number=n, content=f'Step {n}', type='call') for n in range(1, i + 1)]
+            db.session.add(sequence)
+        db.session.commit()
+
+
+def test_list_endpoints_match_to_dict(app, client, user_id, workspace):
+    with app.app_context():
+        messages = Message.query.order_by(Message.timestamp, Message.id).all()
+        sequences = Sequence.query.order_by(Sequence.created_at.desc(), Sequence.id.desc()).all()
+
+        assert client.get('/api/chat').get_json() == [message.to_dict() for message in messages]
+        assert client.get('/api/sequences').get_json() == [sequence.to_dict() for sequence in sequences]
+        assert client.get('/api/sequences?include_steps=false').get_json() == [
+            sequence.to_dict(include_steps=False) for sequence in sequences
+        ]
+        assert client.get(f'/api/sequences/{sequences[0].id}/steps').get_json() == [
+            step.to_dict() for step in sequences[0].steps
+        ]
+
+    page = client.get('/api/sequences?limit=3')
+    rest = client.get(f"/api/sequences?cursor={page.headers['X-Next-Cursor']}").get_json()
+    assert [s['id'] for s in page.get_json() + rest] == [s.id for s in sequences]
+
+
+@pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+@pytest.mark.parametrize('debug', [False, True])
+def test_orjson_provider_matches_the_default_provider(app, debug):
+    payload = {'b': [1, 2.5, None, True], 'a': {'when': datetime(2025, 1, 1), 'text': 'café "quoted"'}, 'ids': {3: 'x', 1: 'y'}}
+
+    with app.test_request_context():
+        default, fast = DefaultJSONProvider(app), OrjsonProvider(app)
+        saved, app.debug = app.debug, debug
+        try:
+            assert fast.loads(fast.response(payload).get_data()) == default.loads(default.response(payload).get_data())
+        finally:
+            app.debug = saved
+        assert fast.loads(fast.dumps(payload)) == default.loads(default.dumps(payload))
+
+    with pytest.raises(ValueError):
+        fast.loads('{not json')
@@ -0,0 +1,40 @@
+"""
+Startup: creating the app has no side effects, and the explicit warm-up opens connections and reports timings
+"""
+import os
+import subprocess
+import sys
+from app.services import warmup
+from app.services.warmup import warm_up
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_app_is_created_without_an_api_key_or_the_sdk(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k != 'ANTHROPIC_API_KEY'}
+    env['DATABASE_URL'] = f"sqlite:///{tmp_path / 'startup.db'}"
+    script = (
+        "import sys\n"
+        "from app import create_app\n"
+        "app = create_app()\n"
+        "assert 'anthropic' not in sys.modules, 'the Anthropic SDK was imported'\n"
+        "assert app.extensions['startup']['create_app_ms'] > 0\n"
+    )
+
+    result = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    # Nothing was created: not even the SQLite file
+    assert not (tmp_path / 'startup.db').exists()
+
+
+def test_warm_up_opens_the_pool_and_reports_timings(app, client, monkeypatch):
+    monkeypatch.setattr(warmup.ai_service, 'warm_up', lambda timeout=5: True)
+
+    report = warm_up(app, started_at=0)
+
+    assert report['schema_current']
+    assert report['db_connections'] == app.config['STARTUP_DB_CONNECTIONS']
+    assert report['ai_connected']
+    assert report['total_ms'] >= report['warm_up_ms'] >= report['db_ms']
+    assert client.get('/api/metrics').get_json()['startup'] == report
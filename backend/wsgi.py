@@ -0,0 +1,36 @@
+"""
+WSGI entry point for serving the backend under gunicorn's gevent worker
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The gevent worker monkey-patches the standard library before this module is
+loaded, so every long-poll, WebSocket and in-flight Anthropic call is a
+greenlet rather than an OS thread. Socket.IO is switched to its gevent async
+mode to match, and psycopg2 is made cooperative so a slow query yields to
+other requests instead of blocking the whole worker.
+"""
+import os
+import logging
+import time
+
+STARTED_AT = time.perf_counter()
+
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'gevent')
+
+logger = logging.getLogger(__name__)
+
+try:
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+except ImportError:
+    # Only PostgreSQL needs it; SQLite calls are short and local
+    logger.warning("psycogreen/psycopg2 not available, database calls will block the gevent worker")
+
+from app import create_app
+
+app = create_app()
+
+# gunicorn loads this module in the worker after forking, so pooled connections stay in it
+if app.config['STARTUP_WARMUP']:
+    from app.services.warmup import warm_up
+    warm_up(app, started_at=STARTED_AT)
@@ -1,4 +1,5 @@
 import React, { createContext, useContext, useState, ReactNode, useCallback } from 'react';
+import axios from 'axios';
 import { ChatState, Message, ChatContextType } from '../types/chat';
 import { chatService } from '../services/chatService';
 import { useSocket } from '../hooks/useSocket';
@@ -19,16 +20,59 @@ export const ChatProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
   React.useEffect(() => {
     if (!socket) return;
 
-    socket.on('message', (message: Message) => {
+    socket.on('message', (message: Message & { provisional_id?: string }) => {
+      setChatState((prev) => {
+        // Replace the streamed placeholder with the saved message
+        const { provisional_id, ...saved } = message;
+        const hasPlaceholder =
+          provisional_id && prev.messages.some((m) => m.provisionalId === provisional_id);
+        return {
+          ...prev,
+          messages: hasPlaceholder
+            ? prev.messages.map((m) => (m.provisionalId === provisional_id ? saved : m))
+            : [...prev.messages, saved],
+          isLoading: false,
+        };
+      });
+    });
+
+    socket.on('message_start', ({ id, role }: { id: string; role: Message['role'] }) => {
+      setChatState((prev) => ({
+        ...prev,
+        messages: [...prev.messages, { provisionalId: id, role, content: '', timestamp: new Date() }],
+      }));
+    });
+
+    socket.on('message_delta', ({ id, delta }: { id: string; delta: string }) => {
       setChatState((prev) => ({
         ...prev,
-        messages: [...prev.messages, message],
+        messages: prev.messages.map((m) =>
+          m.provisionalId === id ? { ...m, content: m.content + delta } : m
+        ),
         isLoading: false,
       }));
     });
 
+    // No reply could be produced: drop the streamed placeholder and show why
+    socket.on(
+      'message_error',
+      ({ provisional_id, message }: { provisional_id?: string; error: string; message: string }) => {
+        setChatState((prev) => ({
+          ...prev,
+          messages: provisional_id
+            ? prev.messages.filter((m) => m.provisionalId !== provisional_id)
+            : prev.messages,
+          isLoading: false,
+          error: message,
+        }));
+      }
+    );
+
     return () => {
       socket.off('message');
+      socket.off('message_start');
+      socket.off('message_delta');
+      socket.off('message_error');
     };
   }, [socket]);
 
@@ -60,7 +104,10 @@ export const ChatProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
       setChatState((prev) => ({
         ...prev,
         isLoading: false,
-        error: error instanceof Error ? error.message : 'Failed to send message',
+        // Prefer the server's explanation (e.g. the assistant being unavailable) over the HTTP status
+        error:
+          (axios.isAxiosError(error) && error.response?.data?.message) ||
+          (error instanceof Error ? error.message : 'Failed to send message'),
       }));
     }
   }, []);
@@ -1,5 +1,12 @@
 import React, { createContext, useContext, useState, ReactNode, useCallback } from 'react';
-import { SequenceState, Sequence, SequenceStep, SequenceContextType } from '../types/sequence';
+import {
+  SequenceState,
+  Sequence,
+  SequenceStep,
+  SequenceContextType,
+  SequencePatch,
+  SequenceDraftStep,
+} from '../types/sequence';
 import { sequenceService } from '../services/sequenceService';
 import { useSocket } from '../hooks/useSocket';
 
@@ -12,41 +19,167 @@ const initialSequenceState: SequenceState = {
 
 const SequenceContext = createContext<SequenceContextType | undefined>(undefined);
 
+// Apply a versioned patch from the server to a sequence
+const applySequencePatch = (sequence: Sequence, patch: SequencePatch): Sequence => {
+  let steps = sequence.steps;
+  let updated: Sequence = sequence;
+
+  patch.ops.forEach((op) => {
+    switch (op.op) {
+      case 'step_added':
+        steps = [...steps, op.step];
+        break;
+      case 'step_updated':
+        steps = steps.map((s) => (s.id === op.step.id ? { ...s, ...op.step } : s));
+        break;
+      case 'step_removed':
+        steps = steps.filter((s) => s.id !== op.step_id);
+        break;
+      case 'steps_reordered':
+        steps = op.order
+          .map((id, index) => {
+            const step = steps.find((s) => s.id === id);
+            return step ? { ...step, stepNumber: index + 1 } : undefined;
+          })
+          .filter((s): s is SequenceStep => s !== undefined);
+        break;
+      case 'sequence_updated':
+        updated = { ...updated, ...op.sequence };
+        break;
+    }
+  });
+
+  return { ...updated, steps, version: patch.version };
+};
+
+// Add a sequence to the list unless it is already there (the REST response and the socket event both bring it)
+const withSequence = (sequences: Sequence[], sequence: Sequence, atStart = false): Sequence[] => {
+  if (sequences.some((s) => s.id === sequence.id)) return sequences;
+  return atStart ? [sequence, ...sequences] : [...sequences, sequence];
+};
+
 export const SequenceProvider: React.FC<{ children: ReactNode }> = ({ children }) => {
   const [sequenceState, setSequenceState] = useState<SequenceState>(initialSequenceState);
   const socket = useSocket();
 
-  // Listen for sequence updates from the socket
+  // Listen for sequence events from the socket
   React.useEffect(() => {
     if (!socket) return;
 
-    socket.on('sequence_update', (sequence: Sequence) => {
-      setSequenceState((prev) => {
-        // Update the sequences list
-        const updatedSequences = prev.sequences.map((s) =>
-          s.id === sequence.id ? sequence : s
-        );
-
-        // If this is the current sequence, update it too
-        const updatedCurrentSequence =
+    const replaceSequence = (sequence: Sequence) => {
+      setSequenceState((prev) => ({
+        ...prev,
+        sequences: prev.sequences.map((s) => (s.id === sequence.id ? sequence : s)),
+        currentSequence:
           prev.currentSequence && prev.currentSequence.id === sequence.id
             ? sequence
-            : prev.currentSequence;
+            : prev.currentSequence,
+        isLoading: false,
+      }));
+    };
 
+    type SequenceCreated = Sequence & { generation_id?: string; focus?: boolean };
+    socket.on('sequence_created', ({ focus: requested, ...data }: SequenceCreated) => {
+      const sequence: Sequence = { ...data, generationId: data.generation_id };
+      setSequenceState((prev) => {
+        const current = prev.currentSequence;
+        // Open one the user just asked the assistant for, replace the draft being shown, or fill an
+        // empty workspace; sequences saved by batch or background jobs must not take over a sequence
+        // that is already open
+        const focus =
+          requested === true ||
+          !current ||
+          (sequence.generationId !== undefined &&
+            current.generationId === sequence.generationId &&
+            current.id === undefined);
         return {
           ...prev,
-          sequences: updatedSequences,
-          currentSequence: updatedCurrentSequence,
+          sequences: withSequence(prev.sequences, sequence, true),
+          currentSequence: focus ? sequence : current,
           isLoading: false,
         };
       });
     });
 
+    // Steps of a generated sequence, shown as they stream in until the saved sequence replaces the draft
+    socket.on('sequence_draft_step', ({ generation_id, title, index, step }: SequenceDraftStep) => {
+      setSequenceState((prev) => {
+        const current = prev.currentSequence;
+        // The saved sequence may already have arrived
+        if (current?.generationId === generation_id && current.id !== undefined) return prev;
+
+        const draft: Sequence =
+          current?.generationId === generation_id
+            ? current
+            : { title, createdAt: new Date(), steps: [], generationId: generation_id };
+        const steps = [...draft.steps];
+        steps[index] = { ...step, stepNumber: index + 1 };
+        return { ...prev, currentSequence: { ...draft, steps } };
+      });
+    });
+
+    socket.on('sequence_draft_failed', ({ generation_id, message }: { generation_id: string; message: string }) => {
+      setSequenceState((prev) =>
+        prev.currentSequence?.generationId === generation_id && prev.currentSequence.id === undefined
+          ? { ...prev, currentSequence: null, error: message }
+          : prev
+      );
+    });
+
+    // Full state, sent when joining a sequence's room or after a version gap
+    socket.on('sequence_snapshot', replaceSequence);
+
+    socket.on('sequence_patch', (patch: SequencePatch) => {
+      setSequenceState((prev) => {
+        const current = prev.currentSequence;
+        if (!current || current.id !== patch.sequence_id) return prev;
+
+        // Missed an update: ask for a snapshot instead of applying out of order
+        if (current.version !== undefined && patch.version !== current.version + 1) {
+          socket.emit('sync_sequence', { sequence_id: patch.sequence_id, version: current.version });
+          return prev;
+        }
+
+        const patched = applySequencePatch(current, patch);
+        return {
+          ...prev,
+          sequences: prev.sequences.map((s) => (s.id === patched.id ? patched : s)),
+          currentSequence: patched,
+        };
+      });
+    });
+
+    socket.on('sequence_deleted', ({ sequence_id }: { sequence_id: number }) => {
+      setSequenceState((prev) => ({
+        ...prev,
+        sequences: prev.sequences.filter((s) => s.id !== sequence_id),
+        currentSequence: prev.currentSequence?.id === sequence_id ? null : prev.currentSequence,
+      }));
+    });
+
     return () => {
-      socket.off('sequence_update');
+      socket.off('sequence_created');
+      socket.off('sequence_draft_step');
+      socket.off('sequence_draft_failed');
+      socket.off('sequence_snapshot');
+      socket.off('sequence_patch');
+      socket.off('sequence_deleted');
     };
   }, [socket]);
 
+  // Only the sequence being viewed receives patches
+  const currentSequenceId = sequenceState.currentSequence?.id;
+  React.useEffect(() => {
+    if (!socket || currentSequenceId === undefined) return;
+
+    const room = `sequence_${currentSequenceId}`;
+    socket.emit('join', { room });
+
+    return () => {
+      socket.emit('leave', { room });
+    };
+  }, [socket, currentSequenceId]);
+
   const createSequence = useCallback(async (title: string) => {
     try {
       setSequenceState((prev) => ({
@@ -59,7 +192,7 @@ export const SequenceProvider: React.FC<{ children: ReactNode }> = ({ children }
       
       setSequenceState((prev) => ({
         ...prev,
-        sequences: [...prev.sequences, newSequence],
+        sequences: withSequence(prev.sequences, newSequence),
         currentSequence: newSequence,
         isLoading: false,
       }));
@@ -1,5 +1,6 @@
 export interface Message {
   id?: number;
+  provisionalId?: string;
   userId?: number;
   content: string;
   role: 'user' | 'assistant' | 'system';
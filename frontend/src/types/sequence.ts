@@ -11,7 +11,30 @@ export interface Sequence {
   userId?: number;
   title: string;
   createdAt: Date;
+  version?: number;
   steps: SequenceStep[];
+  // Set while a generated sequence is still streaming in, and on the saved sequence that replaces it
+  generationId?: string;
+}
+
+export interface SequenceDraftStep {
+  generation_id: string;
+  title: string;
+  index: number;
+  step: Pick<SequenceStep, 'type' | 'content'>;
+}
+
+export type SequencePatchOp =
+  | { op: 'step_added'; step: SequenceStep }
+  | { op: 'step_updated'; step: Partial<SequenceStep> & { id: number } }
+  | { op: 'step_removed'; step_id: number }
+  | { op: 'steps_reordered'; order: number[] }
+  | { op: 'sequence_updated'; sequence: Partial<Sequence> };
+
+export interface SequencePatch {
+  sequence_id: number;
+  version: number;
+  ops: SequencePatchOp[];
 }
 
 export interface SequenceState {
@@ -1,11 +1,17 @@
-from flask import Flask, send_from_directory, render_template, jsonify, request
+from flask import Flask, send_from_directory, render_template, jsonify, request, Response
 import os
+import selectors
+import socket
 import subprocess
 import signal
 import sys
 import logging
 import time
 import threading
+import zlib
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,6 +26,50 @@ app.secret_key = os.environ.get("SESSION_SECRET", "helix-dev-secret-key")
 # Variable to store backend server process
 backend_process = None
 
+# Backend proxy settings
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://localhost:8000")
+# backend/run.py serves BACKEND_WORKERS processes on consecutive ports from BACKEND_URL's port
+BACKEND_WORKERS = int(os.environ.get("BACKEND_WORKERS", 1))
+PROXY_CONNECT_TIMEOUT = float(os.environ.get("PROXY_CONNECT_TIMEOUT", 3.05))  # seconds
+PROXY_READ_TIMEOUT = float(os.environ.get("PROXY_READ_TIMEOUT", 120))  # seconds
+PROXY_POOL_SIZE = int(os.environ.get("PROXY_POOL_SIZE", 32))
+PROXY_CHUNK_SIZE = 64 * 1024
+WEBSOCKET_IDLE_TIMEOUT = float(os.environ.get("WEBSOCKET_IDLE_TIMEOUT", 120))  # seconds
+
+# Headers that describe a single connection and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'transfer-encoding', 'upgrade', 'host'
+}
+
+# Shared keep-alive connection pool to the backend
+def backend_urls():
+    """Get the URL of every backend worker"""
+    base = urlsplit(BACKEND_URL)
+    port = base.port or 80
+    return [base._replace(netloc=f"{base.hostname}:{port + i}").geturl() for i in range(BACKEND_WORKERS)]
+
+BACKEND_URLS = backend_urls()
+
+def pick_backend():
+    """
+    Choose the backend worker for the current request
+
+    Socket.IO sessions live in the worker that created them, so every request
+    from a client must reach the same one. Clients are pinned by address with a
+    stable hash, which gives the same answer in every proxy worker process.
+    """
+    if len(BACKEND_URLS) == 1:
+        return BACKEND_URLS[0]
+    forwarded = request.headers.get('X-Forwarded-For', '')
+    client = forwarded.split(',')[0].strip() or request.remote_addr or ''
+    return BACKEND_URLS[zlib.crc32(client.encode('utf-8')) % len(BACKEND_URLS)]
+
+backend_session = requests.Session()
+backend_session.trust_env = False
+backend_session.mount('http://', HTTPAdapter(pool_connections=len(BACKEND_URLS), pool_maxsize=PROXY_POOL_SIZE, pool_block=False))
+backend_session.mount('https://', HTTPAdapter(pool_connections=len(BACKEND_URLS), pool_maxsize=PROXY_POOL_SIZE, pool_block=False))
+
 def start_backend_server():
     """Start the backend server process"""
     global backend_process
@@ -31,6 +81,9 @@ def start_backend_server():
             except:
                 pass
         
+        # Apply schema migrations before the backend starts serving
+        subprocess.run(["python", "backend/migrate.py"], cwd=os.getcwd(), check=True)
+        
         # Start backend server
         cmd = ["python", "backend/run.py"]
         backend_process = subprocess.Popen(
@@ -60,48 +113,174 @@ def index():
     """Serve static HTML"""
     return send_from_directory('static', 'index.html')
 
-@app.route('/api/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
+@app.route('/api/<path:path>', methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'HEAD'])
 def proxy_api(path):
     """Proxy API requests to the backend server"""
-    import requests
+    return forward_to_backend(f"/api/{path}")
+
+class StreamedBody:
+    """File-like request body with a known length, so it is forwarded without buffering"""
+
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+def forward_to_backend(path):
+    """
+    Stream the current request to the backend and stream its response back unchanged
+
+    Bodies are passed through byte-for-byte in both directions over a pooled
+    keep-alive connection. The time spent in the proxy itself (excluding the
+    backend's own processing) is reported in the X-Proxy-Overhead-Ms header.
+    """
+    start = time.perf_counter()
+
+    url = f"{pick_backend()}{path}"
+    if request.query_string:
+        url = f"{url}?{request.query_string.decode('latin-1')}"
+
+    headers = {
+        key: value for key, value in request.headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS
+    }
+    headers['X-Forwarded-For'] = request.remote_addr or ''
+    headers['X-Forwarded-Host'] = request.host
+    headers['X-Forwarded-Proto'] = request.scheme
+
+    # Stream the body through; requests sets Content-Length or chunked encoding to match
+    headers.pop('Content-Length', None)
+    if request.content_length:
+        body = StreamedBody(request.stream, request.content_length)
+    elif request.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+        body = iter(lambda: request.stream.read(PROXY_CHUNK_SIZE), b'')
+    else:
+        body = None
+
     try:
-        # Forward the request to the backend server
-        url = f"http://localhost:8000/api/{path}"
-        
-        # Get the method and data
-        method = request.method
-        data = request.get_json() if request.is_json else {}
-        
-        # Forward the request
-        if method == 'GET':
-            resp = requests.get(url, params=request.args)
-        elif method == 'POST':
-            resp = requests.post(url, json=data)
-        elif method == 'PUT':
-            resp = requests.put(url, json=data)
-        elif method == 'DELETE':
-            resp = requests.delete(url)
-        else:
-            return jsonify({"error": "Method not supported"}), 405
-        
-        # Return the response from the backend
-        return jsonify(resp.json()), resp.status_code
-        
-    except Exception as e:
+        upstream = backend_session.request(
+            request.method,
+            url,
+            headers=headers,
+            data=body,
+            stream=True,
+            allow_redirects=False,
+            timeout=(PROXY_CONNECT_TIMEOUT, PROXY_READ_TIMEOUT)
+        )
+    except requests.exceptions.Timeout:
+        logger.error(f"Timed out forwarding {request.method} {path} to backend")
+        return jsonify({"error": "Backend timed out"}), 504
+    except requests.exceptions.RequestException as e:
         logger.error(f"Error forwarding request to backend: {str(e)}")
-        return jsonify({"error": "Failed to forward request to backend"}), 500
+        return jsonify({"error": "Failed to forward request to backend"}), 502
+
+    response_headers = [
+        (key, value) for key, value in upstream.raw.headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS
+    ]
+    overhead_ms = (time.perf_counter() - start - upstream.elapsed.total_seconds()) * 1000
+    response_headers.append(('X-Proxy-Overhead-Ms', f"{max(overhead_ms, 0):.2f}"))
 
-@app.route('/socket.io/')
+    response = Response(
+        upstream.raw.stream(PROXY_CHUNK_SIZE, decode_content=False),
+        status=upstream.status_code,
+        headers=response_headers,
+        direct_passthrough=True
+    )
+    response.call_on_close(upstream.close)
+    return response
+
+@app.route('/socket.io/', methods=['GET', 'POST'])
 def proxy_socket():
-    """Handle Socket.IO connections"""
-    import requests
+    """Proxy Socket.IO long-polling requests to the backend server"""
+    return forward_to_backend(request.path)
+
+@app.route('/socket.io/', endpoint='proxy_socket_upgrade', websocket=True)
+def proxy_socket_upgrade():
+    """Tunnel Socket.IO WebSocket upgrades to the backend server"""
+    return tunnel_websocket(request.path)
+
+class TunnelClosedResponse(Response):
+    """Tells the WSGI server the connection was taken over, so it writes nothing more"""
+
+    def __call__(self, environ, start_response):
+        if 'gunicorn.socket' in environ:
+            raise StopIteration()
+        raise ConnectionError()
+
+def tunnel_websocket(path):
+    """
+    Hand a WebSocket upgrade to the backend and relay raw bytes in both directions
+
+    The client socket is taken over from the WSGI server for the lifetime of the
+    tunnel. Under the gevent worker each tunnel is a greenlet waiting on a
+    selector, so idle sockets do not cost an OS thread each.
+    """
+    client = request.environ.get('gunicorn.socket') or request.environ.get('werkzeug.socket')
+    if client is None:
+        # Socket.IO clients fall back to long-polling when the upgrade fails
+        return jsonify({"error": "WebSocket upgrades are not supported by this server"}), 400
+
+    backend = urlsplit(pick_backend())
     try:
-        # This is just a placeholder - real Socket.IO connections use
-        # WebSockets and can't be simply proxied in this way
-        return jsonify({"message": "Socket.IO endpoint"}), 200
-    except Exception as e:
-        logger.error(f"Error handling Socket.IO connection: {str(e)}")
-        return jsonify({"error": "Socket.IO connection failed"}), 500
+        upstream = socket.create_connection(
+            (backend.hostname, backend.port or 80),
+            timeout=PROXY_CONNECT_TIMEOUT
+        )
+    except OSError as e:
+        logger.error(f"Error opening WebSocket tunnel to backend: {str(e)}")
+        return jsonify({"error": "Failed to connect to backend"}), 502
+
+    # Replay the upgrade request to the backend; its 101 response goes straight back to the client
+    target = path
+    if request.query_string:
+        target = f"{path}?{request.query_string.decode('latin-1')}"
+    lines = [f"GET {target} HTTP/1.1", f"Host: {backend.netloc}"]
+    lines += [f"{key}: {value}" for key, value in request.headers.items() if key.lower() != 'host']
+    lines += [
+        f"X-Forwarded-For: {request.remote_addr or ''}",
+        f"X-Forwarded-Host: {request.host}",
+        f"X-Forwarded-Proto: {request.scheme}"
+    ]
+
+    try:
+        upstream.sendall(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        upstream.settimeout(None)
+        client.settimeout(None)
+        relay(client, upstream)
+    except OSError as e:
+        logger.debug(f"WebSocket tunnel closed: {str(e)}")
+    finally:
+        upstream.close()
+        try:
+            client.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    return TunnelClosedResponse()
+
+def relay(client, upstream):
+    """Copy bytes between two sockets until either side closes or the tunnel goes idle"""
+    selector = selectors.DefaultSelector()
+    selector.register(client, selectors.EVENT_READ, upstream)
+    selector.register(upstream, selectors.EVENT_READ, client)
+    try:
+        while True:
+            events = selector.select(timeout=WEBSOCKET_IDLE_TIMEOUT)
+            if not events:
+                return
+            for key, _ in events:
+                data = key.fileobj.recv(PROXY_CHUNK_SIZE)
+                if not data:
+                    return
+                key.data.sendall(data)
+    finally:
+        selector.close()
 
 @app.route('/health')
 def health_check():